@@ -1,110 +1,657 @@
-from flask import Flask, render_template, request, jsonify, send_file
+from flask import Flask, g, render_template, request, jsonify, send_file
+from modules.coin import (SIDES, InvalidConfig, coin_key, expand_catalogue, options, preload_assets, read_config,
+                          read_sides, render_coin, side_key)
+from modules.rendercache import RenderCache
+from modules.jobs import Busy, JobManager, side_file
+from modules.registry import registry
+from modules.store import RenderStore
 import modules.elements as elements
+import modules.compression as compression
+import modules.export as export
+import modules.uploads as uploads
+import modules.metrics as metrics
+import asyncio
+import collections
+import json
+import math
 import os
+import sys
+import time
 
-common_options = {
-    "crowns": [
-        {"value": "none", "img": "static/none.svg", "alt": "None"},
-        {"value": "static/crown1.svg", "img": "static/crown1.svg", "alt": "Crown 1", "checked": True},
-        {"value": "static/crown2.svg", "img": "static/crown2.svg", "alt": "Crown 2"},
-        {"value": "static/crown3.svg", "img": "static/crown3.svg", "alt": "Crown 3"},
-    ],
-    "shields": [
-        {"value": "static/shield1.svg", "img": "static/shield1.svg", "alt": "Shield 1"},
-        {"value": "static/shield2.svg", "img": "static/shield2.svg", "alt": "Shield 2", "checked": True},
-        {"value": "static/shield3.svg", "img": "static/shield3.svg", "alt": "Shield 3"},
-    ],
-    "icons": [
-        {"value": "static/icon1.svg", "img": "static/icon1.svg", "alt": "Lego brick", "checked": True},
-        {"value": "static/icon2.svg", "img": "static/icon2.svg", "alt": "Diamond"},
-        {"value": "static/icon3.svg", "img": "static/icon3.svg", "alt": "Speeding truck"},
-        {"value": "static/icon4-2.svg", "img": "static/icon4-2.svg", "alt": "Horse"},
-        {"value": "static/icon5.svg", "img": "static/icon5.svg", "alt": "Truck"},
-        {"value": "static/icon6.svg", "img": "static/icon6.svg", "alt": "Turned Lego brick"},
-        {"value": "static/icon11.svg", "img": "static/icon11.svg", "alt": "Lion"},
-        {"value": "static/icon12.svg", "img": "static/icon12.svg", "alt": "Sword and Axe"},
-    ],
-    "icons_alternate": [
-        {"value": "static/icon7.svg", "img": "static/icon7.svg", "alt": "3D printer 1"},
-        {"value": "static/icon8.svg", "img": "static/icon8.svg", "alt": "3D printer 2"},
-        {"value": "static/icon9.svg", "img": "static/icon9.svg", "alt": "Skull 1", "checked": True},
-        {"value": "static/icon10.svg", "img": "static/icon10.svg", "alt": "Skull 2"},
-    ],
-}
-
-options = {
-    "crown-heads": common_options["crowns"],
-    "crown-tails": common_options["crowns"],
-    "icon-heads": common_options["icons_alternate"],
-    "shield-tails": common_options["shields"],
-    "upperleft-tails": common_options["icons"],
-    "upperright-tails": common_options["icons"],
-    "downleft-tails": common_options["icons"],
-    "downright-tails": common_options["icons"],
-}
+# Modules slow to import (numpy, multiprocessing, defusedxml) are imported where first used:
+# the geometry stage by elements.compose_coin, the STL export and the render pool below.
 
 app = Flask(__name__)
+# Compression level per content coding, e.g. FLASK_COMPRESSION_LEVELS__gzip=9
+app.config["COMPRESSION_LEVELS"] = dict(compression.DEFAULT_LEVELS)
+# Stage timings, Server-Timing headers and /metrics, FLASK_METRICS=false turns them off
+app.config["METRICS"] = True
+# Worker processes rendering coins, 0 renders on the job threads of this process
+app.config["RENDER_PROCESSES"] = 0
+# Renders queued or running above which /generate answers 503
+app.config["MAX_PENDING_RENDERS"] = 64
+# Seconds /generate waits for a render before answering 504
+app.config["RENDER_TIMEOUT"] = 30
+# Requests asgi.py answers at once, most of them only waiting for renders
+app.config["SERVER_THREADS"] = 32
+# Persistent store of rendered coins, shared by every process serving the app, and its size cap
+app.config["RENDER_STORE_DIR"] = "output"
+app.config["RENDER_STORE_BYTES"] = 512 * 1024 * 1024
+# Coins a single /export archive may hold
+app.config["EXPORT_MAX_COINS"] = 100000
+# Highest STL resolution, a mesh at 800 is about 100 MB
+app.config["STL_MAX_RESOLUTION"] = 800
+# Uploaded assets, content-addressed, and the limits their parser enforces
+app.config["UPLOAD_DIR"] = "uploads"
+app.config["UPLOAD_MAX_BYTES"] = 16 * 1024 * 1024
+app.config["UPLOAD_MAX_ELEMENTS"] = 200000
+app.config["UPLOAD_MAX_DEPTH"] = 64
+# Assets precompiled by build_assets.py, loaded in one read instead of parsed one by one
+app.config["ASSET_BUNDLE"] = "assets.bundle"
+app.config.from_prefixed_env()
+metrics.enabled = app.config["METRICS"]
+
+# Load every selectable SVG once at startup, uploads are loaded on first use
+preload_assets(app.config["ASSET_BUNDLE"])
+registry.add_directory(app.config["UPLOAD_DIR"])
+
+# Created before the server starts any thread, the workers are forked from this process
+render_pool = None
+if app.config["RENDER_PROCESSES"]:
+    from modules.workers import RenderPool
+    render_pool = RenderPool(app.config["RENDER_PROCESSES"], app.config["RENDER_TIMEOUT"])
+
+REQUEST_SECONDS = metrics.Histogram("coin_request_duration_seconds", "Time to answer a request.",
+                                    metrics.LATENCY_BUCKETS, ("endpoint", "status"))
+RESPONSE_BYTES = metrics.Histogram("coin_response_bytes", "Size of response bodies as sent.",
+                                   metrics.SIZE_BUCKETS, ("endpoint", "encoding"))
+SVG_BYTES = metrics.Histogram("coin_svg_bytes", "Size of rendered SVG sides.", metrics.SIZE_BUCKETS, ("side",))
+
+@app.before_request
+def start_timings():
+    """Starts collecting the stage timings of the request."""
+    if metrics.enabled:
+        g.started = time.time()
+        g.timings, g.timings_token = metrics.start()
+
+@app.after_request
+def report_timings(response):
+    """Adds the Server-Timing header and records request metrics."""
+    if not metrics.enabled or "timings" not in g:
+        return response
+    elapsed = time.time() - g.started
+    response.headers["Server-Timing"] = metrics.server_timing(dict(g.timings, total=elapsed))
+    endpoint = request.endpoint or "unknown"
+    REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, status=response.status_code)
+    if response.content_length is not None:
+        RESPONSE_BYTES.observe(response.content_length, endpoint=endpoint, encoding=response.content_encoding or "identity")
+    return response
+
+@app.teardown_request
+def stop_timings(exception):
+    """Stops collecting the stage timings of the request."""
+    token = g.pop("timings_token", None)
+    if token is not None:
+        metrics.stop(token)
 
 @app.route("/")
 def index():
     """Render the main page."""
-    return render_template("index.html", options=options)
+    return render_template("index.html", options=options())
+
+@app.errorhandler(InvalidConfig)
+def invalid_config(error):
+    """Answer a form referring to an unknown asset, or STL parameters out of range."""
+    return jsonify({"error": str(error)}), 400
+
+@app.route("/assets")
+def list_assets():
+    """Route listing the registered assets, by ID, with their metadata."""
+    return jsonify({asset_id: registry.get(asset_id).to_dict() for asset_id in registry.ids()})
+
+@app.errorhandler(uploads.InvalidUpload)
+def invalid_upload(error):
+    """Answer an upload that is not a usable SVG (400) or goes past a limit (413)."""
+    return jsonify({"error": str(error)}), 413 if isinstance(error, uploads.UploadTooLarge) else 400
+
+@app.route("/assets", methods=["POST"])
+def upload_asset():
+    """
+    Route to upload an SVG asset (form fields: file, category).
+
+    The asset gets an ID made from its content, usable in forms and catalogues like the
+    IDs of the built-in assets of its category.
+    """
+    # Refused before the form is read, a little room is left for the other fields
+    request.max_content_length = app.config["UPLOAD_MAX_BYTES"] + 64 * 1024
+    file = request.files.get("file")
+    if file is None:
+        return jsonify({"error": "No file uploaded"}), 400
+    asset = uploads.upload(file.stream, request.form.get("category", "icon"), app.config["UPLOAD_DIR"],
+                           app.config["UPLOAD_MAX_BYTES"], app.config["UPLOAD_MAX_ELEMENTS"],
+                           app.config["UPLOAD_MAX_DEPTH"])
+    return jsonify(asset.to_dict()), 201
+
+def render_cached(config):
+    """
+    Renders both sides of a coin, reusing previous renders of each side.
+
+    Sides are cached separately, so changing one side of a coin never renders the other again.
+
+    Args:
+        config (dict): Configuration returned by read_config.
+
+    Returns:
+        dict: The "heads" and "tails" SVG documents.
+    """
+    coin = {}
+    missing = []
+    for side in SIDES:
+        cached = render_cache.get(side_key(config, side))
+        if cached is None:
+            missing.append(side)
+        else:
+            coin.update(cached)
+    if missing:
+        render = render_pool.render if render_pool is not None else render_coin
+        rendered = render(config, tuple(missing))
+        for side, svg in rendered.items():
+            render_cache.put(side_key(config, side), {side: svg})
+            if metrics.enabled:
+                SVG_BYTES.observe(len(svg.encode("utf-8")), side=side)
+        coin.update(rendered)
+    return coin
+
+async def wait_for(job):
+    """
+    Waits for a job to finish, without blocking the event loop.
+
+    Its stage timings are added to the request's when the job was started by this request,
+    a job reused from an earlier request cost nothing.
+
+    Args:
+        job (Job): The job to wait for.
+
+    Raises:
+        TimeoutError: If the job is not done after RENDER_TIMEOUT seconds. It goes on in the
+            background, and the next request for the same configuration picks it up.
+    """
+    # Shielded, the job is shared with other requests and must not be cancelled with this one
+    try:
+        await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(job.future)), app.config["RENDER_TIMEOUT"])
+    except asyncio.CancelledError:
+        # Superseded by a newer request of the same client, answered by failed_response
+        if not job.future.cancelled():
+            raise
+        # Its status is set right after the cancel, under the job manager lock
+        job.done.wait()
+        return
+    if job.created >= g.get("started", float("inf")):
+        metrics.merge(job.timings)
+
+def busy_response(error):
+    """
+    Answers a request refused because too many renders are pending.
+
+    Args:
+        error (Busy): The refusal.
+
+    Returns:
+        Response: 503 with a Retry-After header.
+    """
+    response = jsonify({"error": str(error)})
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
+
+def failed_response(job):
+    """
+    Answers a request whose render failed or was cancelled.
+
+    Args:
+        job (Job): The failed or cancelled job.
+
+    Returns:
+        Response: 409 if a newer request of the same client superseded it, 504 if the
+            render timed out on a worker, 500 otherwise.
+    """
+    if job.status == "cancelled":
+        return jsonify({"error": "Superseded by a newer request", "job_id": job.id}), 409
+    status = 504 if isinstance(job.exception, TimeoutError) else 500
+    return jsonify({"error": job.error, "job_id": job.id}), status
+
+def client_id():
+    """
+    Returns the identifier the client sends in X-Client-Id, so its newer renders supersede older ones.
+
+    Returns:
+        str | None: The identifier, None if the client sends none.
+    """
+    return request.headers.get("X-Client-Id", type=lambda value: value[:64] or None)
+
+def path_cache_stats():
+    """
+    Returns the statistics of the baked path cache of the geometry stage.
+
+    Scraping the metrics does not import the geometry stage, it reports zeros until a
+    minified render has loaded it.
+
+    Returns:
+        dict: Cache hits and misses.
+    """
+    geometry = sys.modules.get("modules.geometry")
+    if geometry is None:
+        return {"hits": 0, "misses": 0}
+    info = geometry.cache_info()
+    return {"hits": info.hits, "misses": info.misses}
+
+# Rendered sides keyed by side hash
+render_cache = RenderCache()
+# Renders running at once, on threads that hand them to the render pool if there is one
+RENDER_THREADS = max(4, app.config["RENDER_PROCESSES"])
+# Rendered coins, their response bodies and exports, under output/<key[:2]>/<key>/
+store = RenderStore(app.config["RENDER_STORE_DIR"], app.config["RENDER_STORE_BYTES"])
+# Renders run on a worker pool and write to the store, job ids being coin keys
+jobs = JobManager(store, max_workers=RENDER_THREADS,
+                  max_pending=app.config["MAX_PENDING_RENDERS"])
+
+metrics.Callback("coin_render_cache_hits_total", "counter", "Render cache lookups that found the side.",
+                 lambda: render_cache.stats()["hits"])
+metrics.Callback("coin_render_cache_misses_total", "counter", "Render cache lookups that had to render the side.",
+                 lambda: render_cache.stats()["misses"])
+metrics.Callback("coin_render_cache_evictions_total", "counter", "Sides evicted from the render cache.",
+                 lambda: render_cache.stats()["evictions"])
+metrics.Callback("coin_render_cache_hit_ratio", "gauge", "Share of render cache lookups that were hits.",
+                 lambda: (lambda stats: stats["hits"] / max(1, stats["hits"] + stats["misses"]))(render_cache.stats()))
+metrics.Callback("coin_render_cache_bytes", "gauge", "Size of the (compressed) sides in the render cache.",
+                 lambda: render_cache.stats()["bytes"])
+metrics.Callback("coin_path_cache_hits_total", "counter", "Baked path data served from the geometry cache.",
+                 lambda: path_cache_stats()["hits"])
+metrics.Callback("coin_path_cache_misses_total", "counter", "Path data baked by the geometry stage.",
+                 lambda: path_cache_stats()["misses"])
+metrics.Callback("coin_render_store_bytes", "gauge", "Size of the render store as of its last sweep and writes.",
+                 lambda: store.stats()["bytes"])
+metrics.Callback("coin_render_store_evictions_total", "counter", "Coins evicted from the render store by this process.",
+                 lambda: store.stats()["evictions"])
+metrics.Callback("coin_fragment_cache_hits_total", "counter", "Coin fragments reused already minified and serialized.",
+                 lambda: elements.cache_info().hits)
+metrics.Callback("coin_fragment_cache_misses_total", "counter", "Coin fragments built, minified and serialized.",
+                 lambda: elements.cache_info().misses)
+metrics.Callback("coin_renders_in_flight", "gauge", "Renders running on the worker pool.",
+                 lambda: jobs.stats()["running"])
+metrics.Callback("coin_renders_queued", "gauge", "Renders waiting for a worker.",
+                 lambda: jobs.stats()["queued"])
+metrics.Callback("coin_renders_rejected_total", "counter", "Renders refused because too many were pending.",
+                 lambda: jobs.stats()["rejected"])
+metrics.Callback("coin_renders_coalesced_total", "counter", "Requests that shared a render already pending.",
+                 lambda: jobs.stats()["coalesced"])
+metrics.Callback("coin_renders_superseded_total", "counter", "Queued renders cancelled by a newer request of their client.",
+                 lambda: jobs.stats()["superseded"])
+
+def encoded_etag(etag, encoding):
+    """
+    Returns the ETag of a body sent with a content coding.
+
+    Args:
+        etag (str): ETag of the uncompressed body.
+        encoding (str | None): "br" or "gzip", None for the uncompressed body.
+
+    Returns:
+        str: The ETag, followed by the coding and its level, which change the bytes sent.
+    """
+    if encoding is None:
+        return etag
+    return f"{etag}-{encoding}{app.config['COMPRESSION_LEVELS'].get(encoding, compression.DEFAULT_LEVELS[encoding])}"
+
+def send_precompressed(path, mimetype, etag, download_name=None):
+    """
+    Sends a file, or its cached compressed copy if the client accepts one.
+
+    Args:
+        path (str): Path to the uncompressed file.
+        mimetype (str): Content type of the uncompressed file.
+        etag (str): ETag of the uncompressed file, the coding and its level are appended to it.
+        download_name (str, optional): Sent as an attachment under this name if given.
+
+    Returns:
+        Response: The response, with X-Uncompressed-Length and X-Compressed-Length headers.
+    """
+    size = compressed_size = os.path.getsize(path)
+    encoding = compression.negotiate(request.accept_encodings)
+    if encoding is not None:
+        path = compression.precompressed(path, encoding, app.config["COMPRESSION_LEVELS"].get(encoding))
+        compressed_size = os.path.getsize(path)
+        etag = encoded_etag(etag, encoding)
+    # The file is opened here, the response is sent even if the store removes it afterwards
+    response = send_file(os.path.abspath(path), mimetype=mimetype, as_attachment=download_name is not None,
+                         download_name=download_name, etag=etag)
+    if encoding is not None:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    response.headers["X-Uncompressed-Length"] = str(size)
+    response.headers["X-Compressed-Length"] = str(compressed_size)
+    return response
+
+def send_stored(key, name, build, mimetype, etag, download_name=None):
+    """
+    Sends a file kept in the store with a coin (see send_precompressed), building it if missing.
+
+    The coin is marked as recently used, so the store evicts the coins requested the
+    least. The store may sweep it between the build and the send: the file is then built
+    again and sent once more.
+
+    Args:
+        key (str): Coin key.
+        name (str): File name.
+        build (callable): Called without arguments to write the file to the store.
+        mimetype (str): Content type of the file.
+        etag (str): ETag of the file.
+        download_name (str, optional): Sent as an attachment under this name if given.
+
+    Returns:
+        Response: The response.
+
+    Raises:
+        FileNotFoundError: If the file was removed again before it could be sent.
+    """
+    path = store.path(key, name)
+    for attempt in range(2):
+        if not os.path.exists(path):
+            build()
+        store.touch(key)
+        try:
+            return send_precompressed(path, mimetype, etag, download_name)
+        except FileNotFoundError:
+            if attempt:
+                raise
 
 @app.route("/generate", methods=["POST"])
-def generate():
+async def generate():
     """Generate coat of arms and coin based on selection in UI."""
-    heads_crown_path = request.form["crown-heads"]
-    heads_icon_path = request.form["icon-heads"]
-    heads_laurels_path = request.form["sides-heads"]
-    heads_text_left = request.form["text-heads-line1"]
-    heads_text_right = request.form["text-heads-line2"]
-    tails_crown_path = request.form["crown-tails"]
-    tails_shield_path = request.form["shield-tails"]
-    tails_laurels_path = request.form["sides-tails"]
-    tails_text_left = request.form["text-tails-line1"]
-    tails_text_right = request.form["text-tails-line2"]
-    tails_upperleft_path = request.form["upperleft-tails"]
-    tails_upperright_path = request.form["upperright-tails"]
-    tails_downleft_path = request.form["downleft-tails"]
-    tails_downright_path = request.form["downright-tails"]
-
-    debug = request.form.get("debug", False)
-    is_debug = debug == "on"
-
-
-    # Paths for output files
-    heads_svg = "output/coin-heads.svg"
-    tails_svg = "output/coin-tails.svg"
-    coat_of_arms_path = "output/coat_of_arms.svg"
-
-    # Heads always have a single SVG as "head"
-    elements.create_coin(heads_svg, heads_icon_path, heads_crown_path, heads_laurels_path, heads_text_left, heads_text_right, False, is_debug, True)
-    # Tails always have a coat_of_arms (which is already scaled)
-    elements.create_coat_of_arms(coat_of_arms_path, tails_shield_path, tails_upperleft_path, tails_upperright_path, tails_downleft_path, tails_downright_path)
-    elements.create_coin(tails_svg, coat_of_arms_path, tails_crown_path, tails_laurels_path, tails_text_left, tails_text_right, True, is_debug, True)
-
-    with open(heads_svg, "r") as f:
-        heads_svg_content = f.read()
-
-    with open(tails_svg, "r") as f:
-        tails_svg_content = f.read()
-
-    return jsonify({
-        "heads": heads_svg_content,
-        "tails": tails_svg_content
-    })
-
-@app.route("/download/<filename>")
-def download(filename):
-    """Route to download SVG files."""
-    base_dir = os.path.abspath(os.path.dirname(__file__))
-    filepath = os.path.join(base_dir, "output", filename)
-    files_in_output = os.listdir(os.path.join(base_dir, "output"))
-    app.logger.debug(f"Files in output directory: {files_in_output}")
-    if os.path.exists(filepath):
-        return send_file(filepath, as_attachment=True)
+    config = read_config(request.form)
+    key = coin_key(config)
+
+    # The client already has this exact render
+    encoding = compression.negotiate(request.accept_encodings)
+    etag = encoded_etag(key, encoding)
+    if request.if_none_match.contains(etag):
+        store.touch(key)
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+        response.vary.add("Accept-Encoding")
+        return response
+
+    try:
+        job = jobs.submit(render_cached, config, key, client_id())
+        await wait_for(job)
+    except Busy as e:
+        return busy_response(e)
+    except TimeoutError:
+        return jsonify({"error": "Render still running", "job_id": job.id}), 504
+    if job.status in ("failed", "cancelled"):
+        return failed_response(job)
+
+    # The body is the same for every request of this coin, it is built once and kept
+    # with the SVGs in the store, along with its compressed copies
+    def build():
+        coin = jobs.result(job)
+        store.write(key, "generate.json", app.json.dumps({
+            "heads": coin["heads"],
+            "tails": coin["tails"],
+            "job_id": job.id,
+        }))
+    return send_stored(key, "generate.json", build, "application/json", key)
+
+@app.route("/generate/changes", methods=["POST"])
+async def generate_changes():
+    """
+    Generate only the sides of the coin that differ from the ones the client shows.
+
+    The client posts the form along with the keys of its current sides (known-heads,
+    known-tails) and gets back the job id, the new keys and the sides that changed.
+    """
+    config = read_config(request.form)
+    key = coin_key(config)
+    keys = {side: side_key(config, side) for side in SIDES}
+    changed = [side for side in SIDES if request.form.get(f"known-{side}") != keys[side]]
+
+    try:
+        job = jobs.submit(render_cached, config, key, client_id())
+        await wait_for(job)
+    except Busy as e:
+        return busy_response(e)
+    except TimeoutError:
+        return jsonify({"error": "Render still running", "job_id": job.id}), 504
+    if job.status in ("failed", "cancelled"):
+        return failed_response(job)
+
+    # One body per set of changed sides, kept in the store like the full one
+    name = "-".join(changed) or "none"
+
+    def build():
+        coin = jobs.result(job)
+        store.write(key, f"changes-{name}.json", app.json.dumps({
+            "job_id": job.id,
+            "keys": keys,
+            **{side: coin[side] for side in changed},
+        }))
+    return send_stored(key, f"changes-{name}.json", build, "application/json", f"{key}-{name}")
+
+@app.route("/jobs", methods=["POST"])
+def submit_job():
+    """Queue a coin render and return its job id without waiting for it."""
+    config = read_config(request.form)
+    try:
+        job = jobs.submit(render_cached, config, coin_key(config))
+    except Busy as e:
+        return busy_response(e)
+    return jsonify(job.to_dict()), 202
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    """Return the status and progress of a render job."""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+    return jsonify(job.to_dict())
+
+@app.route("/download/<job_id>/<side>")
+def download(job_id, side):
+    """Route to download one side of a rendered coin."""
+    job = jobs.get(job_id)
+    if job is None or side not in SIDES:
+        return jsonify({"error": f"No {side} render for job {job_id}"}), 404
+    if job.status != "done":
+        return jsonify(job.to_dict()), 409
+    if not jobs.ensure_files(job):
+        return jsonify({"error": f"Render of job {job_id} is no longer stored"}), 404
+    return send_stored(job.key, side_file(side), lambda: jobs.ensure_files(job), "image/svg+xml", f"{job.key}-{side}",
+                       f"coin-{side}.svg")
+
+@app.route("/download/<job_id>/<side>.stl")
+def download_stl(job_id, side):
+    """Route to download one side of a rendered coin as a binary STL relief."""
+    job = jobs.get(job_id)
+    if job is None or side not in SIDES:
+        return jsonify({"error": f"No {side} render for job {job_id}"}), 404
+    if job.status != "done":
+        return jsonify(job.to_dict()), 409
+
+    options = stl_options(request.args)
+    try:
+        name, _ = build_stl(job, side, **options)
+        return send_stored(job.key, name, lambda: build_stl(job, side, **options), "model/stl", f"{job.key}-{name}",
+                           f"coin-{side}.stl")
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+
+# Default and range in mm of the STL dimensions, values outside are clamped
+STL_DIMENSIONS = {
+    "diameter": (40.0, 10.0, 200.0),
+    "relief": (1.0, 0.1, 10.0),
+    "base": (2.0, 0.2, 20.0),
+}
+# Steps the STL parameters are rounded to, so that close values share one stored mesh
+STL_RESOLUTION_STEP = 50
+STL_DIMENSION_STEP = 0.1
+
+def _positive_number(args, name, default):
+    """Reads a query argument that has to be a finite, positive number, raising InvalidConfig otherwise."""
+    raw = args.get(name)
+    if raw is None:
+        return default
+    try:
+        value = float(raw)
+    except ValueError:
+        value = math.nan
+    if not (math.isfinite(value) and value > 0):
+        raise InvalidConfig(f"{name} must be a positive number, got {raw!r}")
+    return value
+
+def stl_options(args):
+    """
+    Reads the STL relief parameters of a request.
+
+    The resolution is rounded to STL_RESOLUTION_STEP and clamped to 50..STL_MAX_RESOLUTION,
+    the dimensions rounded to STL_DIMENSION_STEP mm and clamped to STL_DIMENSIONS.
+
+    Args:
+        args (MultiDict): Query arguments.
+
+    Returns:
+        dict: resolution, diameter, relief and base, as taken by build_stl.
+
+    Raises:
+        InvalidConfig: If a parameter is not a finite, positive number.
+    """
+    resolution = round(_positive_number(args, "resolution", 400) / STL_RESOLUTION_STEP) * STL_RESOLUTION_STEP
+    options = {"resolution": int(min(max(resolution, 50), app.config["STL_MAX_RESOLUTION"]))}
+    for name, (default, low, high) in STL_DIMENSIONS.items():
+        value = round(_positive_number(args, name, default) / STL_DIMENSION_STEP) * STL_DIMENSION_STEP
+        # Rounded again, the product above is not an exact multiple of the step
+        options[name] = round(min(max(value, low), high), 1)
+    return options
+
+def build_stl(job, side, resolution, diameter, relief, base):
+    """
+    Returns the STL relief of one side of a finished job, built on first use and kept in the store with the coin.
+
+    Args:
+        job (Job): A job whose status is "done".
+        side (str): "heads" or "tails".
+        resolution (int): Samples across the coin.
+        diameter (float): Coin diameter in mm.
+        relief (float): Relief height in mm.
+        base (float): Base thickness in mm.
+
+    Returns:
+        tuple: (file name, path) of the mesh.
+
+    Raises:
+        LookupError: If the coin was evicted from the store and cannot be rendered again.
+    """
+    name = f"coin-{side}-r{resolution}-d{diameter:g}-h{relief:g}-b{base:g}.stl"
+    path = os.path.join(job.output_dir, name)
+    if not os.path.exists(path):
+        coin = jobs.result(job)
+        if coin is None:
+            raise LookupError(f"Render of job {job.id} is no longer stored")
+        svg = coin[side]
+        from defusedxml.ElementTree import fromstring as safe_fromstring
+        import modules.stl as stl
+        with metrics.stage("stl"), store.open(job.key, name) as f:
+            stl.coin_to_stl(safe_fromstring(svg), f, resolution, diameter, relief, base)
+    return name, path
+
+def export_members(configs, sides, mesh=None):
+    """
+    Renders coins and lists the members of their archive, a few renders ahead of the archive.
+
+    Args:
+        configs (iterable): Configurations returned by read_config.
+        sides (tuple): Sides to export.
+        mesh (dict, optional): STL parameters (see stl_options) of a mesh to build and export
+            for each side, no mesh is exported otherwise.
+
+    Yields:
+        tuple: (name, bytes or path) of each member, for export.stream_zip.
+    """
+    configs = iter(configs)
+    upcoming = next(configs, None)
+    pending = collections.deque()
+    # Keys of the exported coins, a few dozen bytes per coin for the whole export
+    exported = set()
+    while upcoming is not None or pending:
+        # Queued ahead while the archive is written, within the pending renders limit
+        while upcoming is not None and len(pending) < RENDER_THREADS:
+            try:
+                pending.append((upcoming, jobs.submit(render_cached, upcoming, coin_key(upcoming))))
+            except Busy:
+                if pending:
+                    break
+                time.sleep(0.1)
+                continue
+            upcoming = next(configs, None)
+
+        config, job = pending.popleft()
+        # Configurations rendering the same coin (e.g. text hidden by laurels) are exported once
+        if job.key in exported:
+            continue
+        exported.add(job.key)
+        yield f"{job.key}/config.json", json.dumps(config, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        if not job.done.wait(app.config["RENDER_TIMEOUT"]):
+            yield f"{job.key}/error.txt", b"Render still running"
+            continue
+        if job.status != "done":
+            yield f"{job.key}/error.txt", str(job.error).encode("utf-8")
+            continue
+        # Copied from the store, jobs do not keep the coins they rendered in memory
+        if not jobs.ensure_files(job):
+            yield f"{job.key}/error.txt", b"Render no longer stored"
+            continue
+        for side in sides:
+            yield f"{job.key}/coin-{side}.svg", job.path(side)
+        if mesh is not None:
+            for side in sides:
+                name, path = build_stl(job, side, **mesh)
+                yield f"{job.key}/{name}", path
+
+@app.route("/export", methods=["POST"])
+def export_coins():
+    """
+    Stream a ZIP archive of rendered coins, written as each coin is rendered.
+
+    The body is either the form of one coin, as posted to /generate, or a JSON catalogue
+    (see batch.py). Each coin is a folder named after its key, holding its configuration
+    and the SVG of its sides. With stl=1, it also holds a mesh of each side, built with the
+    parameters of /download/<job_id>/<side>.stl.
+    """
+    if request.is_json:
+        catalogue = request.get_json()
+        if isinstance(catalogue, list):
+            catalogue = {"configs": catalogue}
+        if not isinstance(catalogue, dict):
+            return jsonify({"error": "Expected a catalogue object or a list of configurations"}), 400
+        sides = read_sides(catalogue.get("sides", SIDES))
+        count, configs = expand_catalogue(catalogue)
     else:
-        return jsonify({"error": f"File {filename} not found in output directory: {files_in_output}"}), 404
+        sides, count, configs = SIDES, 1, [read_config(request.form)]
+    if count > app.config["EXPORT_MAX_COINS"]:
+        return jsonify({"error": f"{count} coins requested, at most {app.config['EXPORT_MAX_COINS']} per export"}), 413
+    mesh = stl_options(request.args) if request.args.get("stl") in ("1", "on", "true") else None
+
+    level = app.config["COMPRESSION_LEVELS"].get("gzip")
+    response = app.response_class(export.stream_zip(export_members(configs, sides, mesh), level),
+                                  mimetype="application/zip")
+    response.headers["Content-Disposition"] = "attachment; filename=coins.zip"
+    return response
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Expose latency, size, cache and render metrics in Prometheus text format."""
+    if not metrics.enabled:
+        return jsonify({"error": "Metrics are disabled"}), 404
+    return app.response_class(metrics.expose(), mimetype="text/plain; version=0.0.4")
 
 if __name__ == "__main__":
     app.run(debug=False)
@@ -0,0 +1,134 @@
+"""
+ASGI entry point.
+
+Serves the app from an event loop and renders coins on a pool of worker processes
+(one per core unless FLASK_RENDER_PROCESSES says otherwise), pre-warmed with the assets.
+Requests run on FLASK_SERVER_THREADS threads, so several of them are in flight at once,
+and the /generate routes wait for renders on the event loop without holding a thread
+busy rendering. Admission is bounded by FLASK_MAX_PENDING_RENDERS (503 beyond) and
+waiting by FLASK_RENDER_TIMEOUT (504 beyond).
+
+Usage: uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+os.environ.setdefault("FLASK_RENDER_PROCESSES", str(os.cpu_count()))
+
+from asgiref.sync import async_to_sync, sync_to_async
+from app import app
+
+def wsgi_environ(scope, body):
+    """
+    Builds the WSGI environ of an ASGI HTTP request.
+
+    Args:
+        scope (dict): ASGI connection scope.
+        body (file): Binary file object holding the request body.
+
+    Returns:
+        dict: The environ.
+    """
+    script_name = scope.get("root_path", "").encode("utf-8").decode("latin-1")
+    path_info = scope["path"].encode("utf-8").decode("latin-1")
+    if path_info.startswith(script_name):
+        path_info = path_info[len(script_name):]
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": script_name,
+        "PATH_INFO": path_info,
+        "QUERY_STRING": scope["query_string"].decode("ascii"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope['http_version']}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": body,
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+    for name, value in scope["headers"]:
+        name = name.decode("latin-1").upper().replace("-", "_")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = "HTTP_" + name
+        value = value.decode("latin-1")
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+class ThreadedWsgiToAsgi:
+    """
+    ASGI application running a WSGI app on a pool of threads, several requests at once.
+
+    asgiref's WsgiToAsgi runs every request on its single thread-sensitive thread, one
+    after the other. Flask is thread-safe, so requests get a pool of their own instead.
+    The threads are started by sync_to_async, so the coroutines of async views run on the
+    event loop of the server.
+    """
+
+    def __init__(self, wsgi_application, threads):
+        """
+        Args:
+            wsgi_application (callable): WSGI application.
+            threads (int): Requests answered at once.
+        """
+        self.wsgi_application = wsgi_application
+        executor = ThreadPoolExecutor(threads, thread_name_prefix="request")
+        self._run = sync_to_async(self._run_wsgi, thread_sensitive=False, executor=executor)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                await send({"type": f"{message['type']}.complete"})
+                if message["type"] == "lifespan.shutdown":
+                    return
+        if scope["type"] != "http":
+            raise ValueError(f"Unsupported ASGI scope {scope['type']!r}")
+        with SpooledTemporaryFile(max_size=65536) as body:
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    return
+                body.write(message.get("body", b""))
+                if not message.get("more_body"):
+                    break
+            body.seek(0)
+            await self._run(wsgi_environ(scope, body), async_to_sync(send))
+
+    def _run_wsgi(self, environ, send):
+        """Runs the WSGI app on a request thread, sending its response through the event loop."""
+        start = []
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info is not None and start and start[0] is None:
+                raise exc_info[1].with_traceback(exc_info[2])
+            start[:] = [{
+                "type": "http.response.start",
+                "status": int(status.split(" ", 1)[0]),
+                "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+            }]
+
+        response = self.wsgi_application(environ, start_response)
+        try:
+            for chunk in response:
+                if chunk:
+                    # Headers go with the first chunk, until then an error may replace them
+                    if start[0] is not None:
+                        send(start[0])
+                        start[0] = None
+                    send({"type": "http.response.body", "body": chunk, "more_body": True})
+            if start[0] is not None:
+                send(start[0])
+            send({"type": "http.response.body", "body": b""})
+        finally:
+            if hasattr(response, "close"):
+                response.close()
+
+application = ThreadedWsgiToAsgi(app, app.config["SERVER_THREADS"])
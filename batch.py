@@ -0,0 +1,146 @@
+"""
+Headless batch renderer for coin catalogues.
+
+Renders a list or a matrix of configurations across a multiprocessing pool.
+The catalogue file is JSON or YAML, either a list of configurations or a mapping:
+
+    base:           # optional, overrides the UI defaults for every coin
+      sides-tails: "none"
+    sides: [tails]  # optional, a side or a list of sides to render (default: both)
+    matrix:         # optional, cartesian product of field values, "*" is every UI value
+      crown-tails: "*"
+      shield-tails: "*"
+      upperleft-tails: ["icon1", "icon2"]     # asset IDs, the file names in static/
+    configs:        # optional, explicit configurations (merged over base)
+      - {crown-tails: "none"}
+
+Each coin is written to <output>/<config hash>/, already rendered coins are skipped
+so an interrupted run can be resumed. An invalid catalogue is reported entry by entry,
+before rendering anything, with exit status 2.
+
+Usage: python batch.py catalogue.yaml -o catalogue/ -j 8
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from modules.coin import SIDES, InvalidConfig, coin_key, expand_catalogue, preload_assets, read_sides, render_coin
+
+def load_catalogue(path):
+    """
+    Reads a catalogue file.
+
+    Args:
+        path (str): Path to a .json, .yaml or .yml file.
+
+    Returns:
+        dict: Catalogue with "base", "sides", "matrix" and "configs" keys.
+
+    Raises:
+        InvalidConfig: If the file is not valid JSON or YAML.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            import yaml
+            try:
+                catalogue = yaml.safe_load(f)
+            except yaml.YAMLError as e:
+                raise InvalidConfig(f"Invalid YAML: {e}") from None
+        else:
+            try:
+                catalogue = json.load(f)
+            except json.JSONDecodeError as e:
+                raise InvalidConfig(f"Invalid JSON: {e}") from None
+    if isinstance(catalogue, list):
+        catalogue = {"configs": catalogue}
+    return catalogue
+
+def render_one(task):
+    """
+    Renders one coin into its own directory, unless it is already there.
+
+    Args:
+        task (tuple): (configuration, sides, output directory).
+
+    Returns:
+        str: "rendered", "skipped" or "failed: <reason>".
+    """
+    config, sides, output_dir = task
+    coin_dir = os.path.join(output_dir, coin_key(config))
+    paths = {side: os.path.join(coin_dir, f"coin-{side}.svg") for side in sides}
+    if all(os.path.exists(path) for path in paths.values()):
+        return "skipped"
+    try:
+        coin = render_coin(config, sides)
+        os.makedirs(coin_dir, exist_ok=True)
+        with open(os.path.join(coin_dir, "config.json"), "w", encoding="utf-8") as f:
+            json.dump(config, f, ensure_ascii=False, sort_keys=True)
+        # Write then rename, so a killed run never leaves a truncated coin behind
+        for side, path in paths.items():
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(coin[side])
+            os.replace(path + ".tmp", path)
+    except Exception as e:
+        return f"failed: {e}"
+    return "rendered"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render a catalogue of coins to SVG.")
+    parser.add_argument("catalogue", help="JSON or YAML catalogue file")
+    parser.add_argument("-o", "--output", default="catalogue", help="output directory (default: catalogue)")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="worker processes (default: one per core)")
+    parser.add_argument("--chunksize", type=int, default=16, help="configurations sent to a worker at once")
+    args = parser.parse_args(argv)
+
+    try:
+        catalogue = load_catalogue(args.catalogue)
+        if not isinstance(catalogue, dict):
+            raise InvalidConfig("Expected a list of configurations or a mapping")
+        sides = read_sides(catalogue.get("sides", SIDES))
+        total, configs = expand_catalogue(catalogue)
+    except InvalidConfig as e:
+        for line in str(e).splitlines():
+            print(f"{args.catalogue}: {line}", file=sys.stderr)
+        return 2
+    tasks = ((config, sides, args.output) for config in configs)
+    os.makedirs(args.output, exist_ok=True)
+
+    # Load assets before the workers fork, so they share them copy-on-write
+    preload_assets()
+    if "fork" in multiprocessing.get_all_start_methods():
+        context, initializer = multiprocessing.get_context("fork"), None
+    else:
+        context, initializer = multiprocessing.get_context(), preload_assets
+
+    counts = {"rendered": 0, "skipped": 0, "failed": 0}
+    start = last_report = time.perf_counter()
+    with context.Pool(args.jobs, initializer=initializer) as pool:
+        for done, status in enumerate(pool.imap_unordered(render_one, tasks, args.chunksize), 1):
+            if status.startswith("failed"):
+                counts["failed"] += 1
+                print(status, file=sys.stderr)
+            else:
+                counts[status] += 1
+            now = time.perf_counter()
+            if now - last_report >= 1 or done == total:
+                last_report = now
+                rate = counts["rendered"] / (now - start)
+                print(f"\r{done}/{total} ({done * 100 / max(total, 1):.1f}%) {rate:.1f} coins/s", end="", file=sys.stderr)
+    print(file=sys.stderr)
+
+    elapsed = time.perf_counter() - start
+    rate = counts["rendered"] / elapsed if elapsed else 0.0
+    print(json.dumps({
+        "total": total,
+        **counts,
+        "workers": args.jobs,
+        "elapsed_s": round(elapsed, 3),
+        "coins_per_s": round(rate, 2),
+        "coins_per_s_per_core": round(rate / args.jobs, 2),
+    }, indent=2))
+    return 1 if counts["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+Measures /generate throughput through the ASGI entry point, by number of render processes
+and of concurrent requests, for asgi.application and for a plain asgiref WsgiToAsgi.
+
+Requests are sent to the ASGI application in-process, without a server or a network in
+between, each for a coin never rendered before. Each setting runs in a fresh interpreter,
+as the render pool is created when the app is imported. --delay adds a fixed time to
+every render on the workers, standing in for more cores than the machine has: with it,
+throughput follows the number of processes as long as requests overlap.
+
+Run from the repository root: python benchmarks/bench_concurrency.py [--requests 32] [--delay 0.2]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in the child interpreter, prints requests per second and the statuses as JSON
+CHILD = """
+import asyncio, json, os, sys, time, urllib.parse
+sys.path.insert(0, os.environ["ROOT"])
+delay = float(os.environ["DELAY"])
+if delay:
+    import modules.coin, modules.workers
+    render = modules.coin.render_coin
+    def slow_render(*args, **kwargs):
+        time.sleep(delay)
+        return render(*args, **kwargs)
+    # Patched before the workers are forked, and before app imports it for thread renders
+    modules.coin.render_coin = modules.workers.render_coin = slow_render
+import asgi
+from asgiref.wsgi import WsgiToAsgi
+from modules.coin import default_config
+application = asgi.application if os.environ["ADAPTER"] == "threaded" else WsgiToAsgi(asgi.app)
+
+async def generate(index):
+    body = urllib.parse.urlencode(dict(default_config(), **{"text-tails-line2": f"N{index} {time.time()}"})).encode()
+    scope = {"type": "http", "http_version": "1.1", "method": "POST", "scheme": "http", "path": "/generate",
+             "root_path": "", "query_string": b"", "server": ("localhost", 80), "client": ("127.0.0.1", 1),
+             "headers": [(b"content-type", b"application/x-www-form-urlencoded"),
+                         (b"content-length", str(len(body)).encode()), (b"x-client-id", str(index).encode())]}
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    status = []
+    async def receive():
+        return messages.pop() if messages else {"type": "http.disconnect"}
+    async def send(message):
+        if message["type"] == "http.response.start":
+            status.append(message["status"])
+    await application(scope, receive, send)
+    return status[0]
+
+async def main(requests, concurrency):
+    limit = asyncio.Semaphore(concurrency)
+    async def limited(index):
+        async with limit:
+            return await generate(index)
+    await generate(-1)
+    start = time.perf_counter()
+    statuses = await asyncio.gather(*(limited(index) for index in range(requests)))
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"rps": requests / elapsed, "statuses": sorted(set(statuses))}))
+
+asyncio.run(main(int(os.environ["REQUESTS"]), int(os.environ["CONCURRENCY"])))
+"""
+
+def run_child(adapter, processes, concurrency, requests, delay):
+    """Serves requests in a new interpreter, returns its requests per second and statuses."""
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, ROOT=ROOT, ADAPTER=adapter, REQUESTS=str(requests), CONCURRENCY=str(concurrency),
+                   DELAY=str(delay), FLASK_RENDER_PROCESSES=str(processes), FLASK_METRICS="false",
+                   FLASK_RENDER_STORE_DIR=os.path.join(directory, "output"))
+        result = subprocess.run([sys.executable, "-c", CHILD], cwd=ROOT, env=env, capture_output=True, text=True,
+                                check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=32, help="requests per setting")
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds added to every render")
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4, 8], help="render processes")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32], help="concurrent requests")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} cores, {args.requests} requests per setting, {args.delay:g} s added per render")
+    print(f"{'adapter':>10} {'processes':>10}" + "".join(f" {f'c={c} req/s':>12}" for c in args.concurrency))
+    for adapter in ("plain", "threaded"):
+        for processes in args.processes:
+            results = [run_child(adapter, processes, concurrency, args.requests, args.delay)
+                       for concurrency in args.concurrency]
+            line = f"{adapter:>10} {processes:>10}" + "".join(f" {result['rps']:>12.1f}" for result in results)
+            statuses = sorted({status for result in results for status in result["statuses"]})
+            print(line + ("" if statuses == [200] else f"  statuses {statuses}"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Reports the size of rendered coins before and after the geometry stage
+(modules/geometry.py), for a few precisions, with the time the stage takes.
+
+Run from the repository root: python benchmarks/bench_geometry.py [iterations]
+"""
+import os
+import sys
+import time
+from defusedxml.ElementTree import fromstring
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import modules.geometry as geometry
+from modules.coin import SIDES, default_config, read_config, render_coin
+
+def configurations():
+    """Returns a few representative coins: defaults, laurels on tails, no symbols."""
+    base = default_config()
+    return {
+        "default": read_config(base),
+        "laurels tails": read_config(dict(base, **{"sides-tails": "laurels1", "upperleft-tails": "icon11", "downright-tails": "icon12"})),
+        "no symbols": read_config(dict(base, symbols="off")),
+    }
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    precisions = (0, 1, 2, 3)
+    totals = {"raw": 0, **{precision: 0 for precision in precisions}}
+
+    print(f"{'coin':>22} {'raw':>9}" + "".join(f" {f'p={precision}':>16}" for precision in precisions))
+    for name, config in configurations().items():
+        raw = render_coin(dict(config, minify=False))
+        for side in SIDES:
+            size = len(raw[side].encode("utf-8"))
+            totals["raw"] += size
+            line = f"{name + ' ' + side:>22} {size:>9}"
+            for precision in precisions:
+                svg = render_coin(dict(config, minify=True, precision=precision), (side,))[side]
+                minified = len(svg.encode("utf-8"))
+                totals[precision] += minified
+                line += f" {minified:>8} ({minified * 100 / size:3.0f}%)"
+            print(line)
+
+    line = f"{'total':>22} {totals['raw']:>9}"
+    for precision in precisions:
+        line += f" {totals[precision]:>8} ({totals[precision] * 100 / totals['raw']:3.0f}%)"
+    print(line)
+
+    # Time of the geometry stage alone, on already composed trees, without and with
+    # the baked path cache filled by previous renders
+    documents = [svg for config in configurations().values() for svg in render_coin(dict(config, minify=False)).values()]
+    for label, clear in (("cold", True), ("warm", False)):
+        elapsed = 0.0
+        for _ in range(iterations):
+            if clear:
+                geometry._bake_path_data.cache_clear()
+                geometry._transform_attribute.cache_clear()
+            for document in documents:
+                root = fromstring(document)
+                start = time.perf_counter()
+                geometry.minify(root, 1)
+                elapsed += time.perf_counter() - start
+        print(f"geometry stage ({label}): {elapsed * 1000 / (iterations * len(documents)):.2f} ms/side")
+
+if __name__ == "__main__":
+    main()
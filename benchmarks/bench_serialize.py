@@ -0,0 +1,60 @@
+"""
+Compares the old two-pass serialization (ET.tostring + lxml namespace stripping)
+with the single-pass utils.to_clean_svg on laurel-heavy coins.
+
+Run from the repository root: python benchmarks/bench_serialize.py [iterations]
+"""
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import modules.elements as elements
+import modules.utils as utils
+
+def legacy_clean_svg(tree):
+    """Serialization as done before: ElementTree, then an lxml parse and a second serialization."""
+    from lxml import etree
+    rough_string = ET.tostring(tree.getroot(), encoding="unicode")
+    root = etree.fromstring(rough_string.encode("utf-8"))
+    for elem in root.iter():
+        elem.tag = etree.QName(elem).localname
+    etree.cleanup_namespaces(root)
+    return etree.tostring(root, encoding="unicode")
+
+def measure(serializer, trees, iterations):
+    """Returns (seconds, bytes produced) for serializing every tree `iterations` times."""
+    produced = 0
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for tree in trees:
+            produced += len(serializer(tree).encode("utf-8"))
+    return time.perf_counter() - start, produced
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    laurels = "static/laurels1.svg"
+    coat_of_arms = elements.create_coat_of_arms("static/shield2.svg", "static/icon1.svg", "static/icon4-2.svg", "static/icon11.svg", "static/icon12.svg")
+    trees = [
+        elements.create_coin("static/icon9.svg", "static/crown1.svg", laurels),
+        elements.create_coin(coat_of_arms, "static/crown2.svg", laurels, already_scaled=True),
+    ]
+
+    serializers = [("single pass", utils.to_clean_svg)]
+    try:
+        import lxml  # noqa: F401
+        serializers.insert(0, ("ET + lxml", legacy_clean_svg))
+    except ImportError:
+        print("lxml not installed, skipping the legacy serializer")
+
+    results = {}
+    for name, serializer in serializers:
+        seconds, produced = measure(serializer, trees, iterations)
+        results[name] = produced / seconds
+        print(f"{name:>12}: {produced / seconds / 1e6:8.2f} MB/s ({seconds * 1000 / (iterations * len(trees)):.3f} ms/coin)")
+    if len(results) == 2:
+        print(f"     speedup: {results['single pass'] / results['ET + lxml']:.2f}x")
+
+if __name__ == "__main__":
+    main()
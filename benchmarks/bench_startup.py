@@ -0,0 +1,83 @@
+"""
+Reports the cold start of the app: time to import it, then to answer its first requests,
+with and without the asset bundle built by build_assets.py. Each measurement runs in a
+fresh interpreter, as a new container would.
+
+Run from the repository root: python benchmarks/bench_startup.py [runs]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in the child interpreter, prints the timings as JSON
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from app import app
+from modules.coin import default_config
+imported = time.perf_counter()
+client = app.test_client()
+client.get("/")
+index = time.perf_counter()
+client.post("/generate", data=default_config())
+generated = time.perf_counter()
+print(json.dumps({"import": imported - start, "index": index - imported, "generate": generated - index,
+                  "modules": len(sys.modules)}))
+"""
+
+def run_child(bundle, output_dir):
+    """Starts the app in a new interpreter, returns its timings."""
+    env = dict(os.environ, FLASK_ASSET_BUNDLE=bundle)
+    result = subprocess.run([sys.executable, "-c", CHILD], cwd=output_dir, env=env,
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+def imports(code):
+    """Returns the modules imported by code as {name: (cumulative seconds, depth)}, from python -X importtime."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Nesting is shown by indentation, two spaces per level
+        modules[name.strip()] = (int(cumulative) / 1e6, (len(name) - len(name.lstrip()) - 1) // 2)
+    return modules
+
+def slowest_imports(count=10):
+    """Returns the direct imports of app.py taking the longest, leaving out those of the bare interpreter."""
+    interpreter = imports("pass")
+    direct = [(seconds, name) for name, (seconds, depth) in imports("import app").items()
+              if depth == 1 and name not in interpreter]
+    return sorted(direct, reverse=True)[:count]
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    bundle = os.path.join(ROOT, "assets.bundle")
+    subprocess.run([sys.executable, "build_assets.py", "-o", bundle], cwd=ROOT, check=True, capture_output=True)
+
+    print(f"{'':>14} {'import':>9} {'GET /':>9} {'1st render':>11} {'total':>9} {'modules':>8}")
+    for label, path in (("no bundle", ""), ("bundle", bundle)):
+        # The app writes its jobs under output/, kept out of the repository
+        with tempfile.TemporaryDirectory() as output_dir:
+            os.symlink(os.path.join(ROOT, "app.py"), os.path.join(output_dir, "app.py"))
+            for name in ("modules", "static", "templates"):
+                os.symlink(os.path.join(ROOT, name), os.path.join(output_dir, name))
+            samples = [run_child(path, output_dir) for _ in range(runs)]
+        median = {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+        total = median["import"] + median["index"] + median["generate"]
+        print(f"{label:>14} {median['import'] * 1000:>7.1f}ms {median['index'] * 1000:>7.1f}ms"
+              f" {median['generate'] * 1000:>9.1f}ms {total * 1000:>7.1f}ms {median['modules']:>8.0f}")
+
+    print("\nslowest imports of app.py:")
+    for seconds, name in slowest_imports():
+        print(f"{seconds * 1000:>8.1f}ms  {name}")
+
+if __name__ == "__main__":
+    main()
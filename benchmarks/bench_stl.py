@@ -0,0 +1,35 @@
+"""
+Measures the SVG to STL conversion (rasterization, then meshing and writing) at several resolutions.
+
+Run from the repository root: python benchmarks/bench_stl.py [resolution ...]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import modules.elements as elements
+import modules.stl as stl
+
+def main():
+    resolutions = [int(r) for r in sys.argv[1:]] or [200, 400, 800, 1200]
+    coat_of_arms = elements.create_coat_of_arms("static/shield2.svg", "static/icon1.svg", "static/icon4-2.svg", "static/icon11.svg", "static/icon12.svg")
+    coins = {
+        "heads": elements.create_coin("static/icon9.svg", "static/crown1.svg", "static/laurels1.svg"),
+        "tails": elements.create_coin(coat_of_arms, "static/crown2.svg", "static/laurels1.svg", already_scaled=True),
+    }
+
+    print(f"{'side':>6} {'res':>5} {'raster ms':>10} {'mesh ms':>8} {'facets':>9} {'MB':>7}")
+    for resolution in resolutions:
+        for side, coin in coins.items():
+            start = time.perf_counter()
+            luminance = stl.rasterize(coin, resolution)
+            rasterized = time.perf_counter()
+            with open(os.devnull, "wb") as out:
+                facets = stl.write_stl(out, stl.heightmap(luminance))
+            meshed = time.perf_counter()
+            print(f"{side:>6} {resolution:>5} {(rasterized - start) * 1000:>10.1f} {(meshed - rasterized) * 1000:>8.1f} "
+                  f"{facets:>9} {(84 + 50 * facets) / 1e6:>7.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""
+Reproducible benchmark suite for the rendering hot paths.
+
+Runs microbenchmarks of the building blocks (viewBox handling, parsing of every static
+asset, serialization, coat of arms and coin composition), an end-to-end /generate test
+through Flask's test client at several concurrency levels, and peak memory measurements
+with tracemalloc. Results are saved as JSON and can be compared to flag regressions.
+
+Run from the repository root:
+
+    python benchmarks/run.py -o results.json                    # run the suite
+    python benchmarks/run.py -o new.json --compare results.json # run, then compare
+    python benchmarks/run.py compare results.json new.json      # compare two runs
+
+Comparisons exit with status 1 when a metric got worse by more than the threshold
+(--threshold, 10% by default), so the suite can gate dependency upgrades.
+"""
+import argparse
+import copy
+import datetime
+import glob
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+from defusedxml.ElementTree import parse as safe_parse
+import modules.elements as elements
+import modules.outline as outline
+import modules.utils as utils
+from modules.assets import cache as asset_cache
+from modules.coin import default_config
+from modules.svgbuilder import SVGBuilder
+
+SHIELD = "static/shield2.svg"
+ICONS = ("static/icon1.svg", "static/icon4-2.svg", "static/icon11.svg", "static/icon12.svg")
+LAURELS = "static/laurels1.svg"
+
+def measure(function, rounds=7, min_time=0.05):
+    """
+    Times a function, timeit style: calls are batched so each round lasts at least min_time.
+
+    Args:
+        function (callable): Function called without arguments.
+        rounds (int, optional): Number of timed rounds (default: 7).
+        min_time (float, optional): Minimum duration of a round in seconds (default: 0.05).
+
+    Returns:
+        dict: Median and minimum time per call in seconds, with the round settings.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - start) / number)
+    return {
+        "value": statistics.median(timings),
+        "min": min(timings),
+        "unit": "s",
+        "better": "lower",
+        "rounds": rounds,
+        "number": number,
+    }
+
+def coins():
+    """Returns the composed trees used by several benchmarks: (coat of arms, heads, tails)."""
+    coat_of_arms = elements.create_coat_of_arms(SHIELD, *ICONS)
+    heads = elements.create_coin("static/icon9.svg", "static/crown1.svg", LAURELS)
+    tails = elements.create_coin(copy.deepcopy(coat_of_arms), "static/crown2.svg", "none", "DARK ▾ VADA", "VADA ▾ COIN", already_scaled=True)
+    return coat_of_arms, heads, tails
+
+def micro_benchmarks(rounds):
+    """
+    Times the building blocks of a render.
+
+    Args:
+        rounds (int): Number of timed rounds per benchmark.
+
+    Returns:
+        dict: Results keyed by benchmark name.
+    """
+    results = {}
+    # Assets are parsed once at startup and then come from the cache
+    asset_cache.clear()
+    asset_cache.preload([SHIELD, *ICONS, LAURELS, "static/icon9.svg", "static/crown1.svg", "static/crown2.svg"])
+
+    for path in sorted(glob.glob("static/*.svg")):
+        results[f"micro.safe_parse[{os.path.basename(path)}]"] = measure(lambda: safe_parse(path), rounds)
+
+    shield = safe_parse(SHIELD).getroot()
+    no_viewbox = safe_parse(LAURELS).getroot()
+    no_viewbox.attrib.pop("viewBox", None)
+    results["micro.ensure_viewbox"] = measure(lambda: utils.ensure_viewbox(shield), rounds)
+    results["micro.ensure_viewbox[missing]"] = measure(
+        lambda: (no_viewbox.attrib.pop("viewBox", None), utils.ensure_viewbox(no_viewbox)), rounds)
+    results["micro.scale_svg"] = measure(lambda: utils.scale_svg(shield, (512, 512)), rounds)
+
+    coat_of_arms, heads, tails = coins()
+    rough_string = ET.tostring(heads.getroot(), encoding="unicode")
+    results["micro.remove_namespace"] = measure(lambda: SVGBuilder.remove_namespace(rough_string), rounds)
+    with tempfile.TemporaryDirectory() as directory:
+        output_file = os.path.join(directory, "coin.svg")
+        results["micro.write_clean_svg[heads]"] = measure(lambda: utils.write_clean_svg(heads, output_file), rounds)
+        results["micro.write_clean_svg[tails]"] = measure(lambda: utils.write_clean_svg(tails, output_file), rounds)
+
+    results["micro.create_coat_of_arms"] = measure(lambda: elements.create_coat_of_arms(SHIELD, *ICONS), rounds)
+    results["micro.create_coin[heads]"] = measure(
+        lambda: elements.create_coin("static/icon9.svg", "static/crown1.svg", LAURELS), rounds)
+    results["micro.create_coin[tails]"] = measure(
+        lambda: elements.create_coin(elements.create_coat_of_arms(SHIELD, *ICONS), "static/crown2.svg", "none",
+                                     "DARK ▾ VADA", "VADA ▾ COIN", already_scaled=True), rounds)
+
+    # Whole minified tails from fragments: all built again, or only the text (new at each call)
+    texts = itertools.count()
+    compose_tails = lambda text: elements.compose_coin((SHIELD, *ICONS), "static/crown2.svg", "none", text, "VADA ▾ COIN",
+                                                       symbols=True, outline=True, precision=1)
+    results["micro.compose_coin[tails,cold]"] = measure(
+        lambda: (elements.cache_clear(), compose_tails("DARK ▾ VADA")), rounds)
+    results["micro.compose_coin[tails,new text]"] = measure(lambda: compose_tails(f"DARK {next(texts)}"), rounds)
+
+    # Text as glyph outlines, with the glyph and layout caches emptied first or already filled
+    outline_text = lambda: SVGBuilder.add_outlined_text_on_circle(ET.Element("svg"), 315, 425, 57.75, "DARK ▾ VADA")
+    results["micro.outline_text[cold]"] = measure(
+        lambda: (outline.glyph.cache_clear(), outline.layout_on_circle.cache_clear(), outline_text()), rounds)
+    results["micro.outline_text[warm]"] = measure(outline_text, rounds)
+    return results
+
+def generate_forms(prefix, count):
+    """
+    Builds /generate forms that all render differently (distinct texts on both sides).
+
+    Args:
+        prefix (str): Makes texts unique across calls.
+        count (int): Number of forms.
+
+    Returns:
+        list[dict]: The forms.
+    """
+    base = dict(default_config(), **{"sides-heads": "none", "sides-tails": "none"})
+    return [dict(base, **{
+        "text-heads-line1": f"{prefix} {index}",
+        "text-tails-line1": f"{prefix} {index}",
+    }) for index in range(count)]
+
+def load_test(client_factory, forms, concurrency):
+    """
+    Posts forms to /generate from several threads at once.
+
+    Args:
+        client_factory (callable): Returns a Flask test client.
+        forms (list[dict]): Forms to post, spread over the threads.
+        concurrency (int): Number of threads.
+
+    Returns:
+        tuple: (latencies in seconds, wall time in seconds, number of failed requests).
+    """
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+
+    def worker(chunk):
+        client = client_factory()
+        for form in chunk:
+            start = time.perf_counter()
+            response = client.post("/generate", data=form)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+                if response.status_code != 200:
+                    failures.append(response.status_code)
+
+    threads = [threading.Thread(target=worker, args=(forms[index::concurrency],)) for index in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - start, len(failures)
+
+def percentile(values, fraction):
+    """Returns the value below which a fraction of the sorted values fall (nearest rank)."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+def end_to_end(requests_per_level, levels):
+    """
+    Measures /generate latency and throughput, on new configurations and on cached ones.
+
+    Args:
+        requests_per_level (int): Requests sent at each concurrency level.
+        levels (list[int]): Concurrency levels.
+
+    Returns:
+        dict: Results keyed by metric name.
+    """
+    import app as application
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        application.store.root = directory
+        application.render_cache.clear()
+        client_factory = application.app.test_client
+        warm_forms = generate_forms("WARM", 4)
+        load_test(client_factory, warm_forms, 1)
+
+        for concurrency in levels:
+            for scenario, forms in (("cold", generate_forms(f"C{concurrency}", requests_per_level)),
+                                    ("cached", warm_forms * (requests_per_level // len(warm_forms)))):
+                latencies, wall, failed = load_test(client_factory, forms, concurrency)
+                name = f"e2e.generate[{scenario},c={concurrency}]"
+                for label, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+                    results[f"{name}.{label}"] = {"value": percentile(latencies, fraction), "unit": "s", "better": "lower"}
+                results[f"{name}.throughput"] = {"value": len(latencies) / wall, "unit": "req/s", "better": "higher"}
+                results[f"{name}.failed"] = {"value": failed, "unit": "requests", "better": "lower"}
+    return results
+
+def peak_memory(function):
+    """
+    Returns the peak memory allocated while a function runs.
+
+    Args:
+        function (callable): Function called without arguments.
+
+    Returns:
+        dict: Peak traced allocation in bytes.
+    """
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"value": peak, "unit": "B", "better": "lower"}
+
+def memory_benchmarks():
+    """
+    Measures peak memory of the composition steps and of one uncached /generate request.
+
+    Returns:
+        dict: Results keyed by benchmark name.
+    """
+    import app as application
+    results = {
+        "memory.create_coat_of_arms": peak_memory(lambda: elements.create_coat_of_arms(SHIELD, *ICONS)),
+        "memory.create_coin[heads]": peak_memory(
+            lambda: elements.create_coin("static/icon9.svg", "static/crown1.svg", LAURELS)),
+    }
+    heads = coins()[1]
+    results["memory.to_clean_svg[heads]"] = peak_memory(lambda: utils.to_clean_svg(heads))
+    with tempfile.TemporaryDirectory() as directory:
+        application.store.root = directory
+        client = application.app.test_client()
+        form = generate_forms("MEMORY", 1)[0]
+        results["memory.generate"] = peak_memory(lambda: client.post("/generate", data=form))
+    return results
+
+def metadata():
+    """Describes the environment a run happened in."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+def compare(baseline, current, threshold):
+    """
+    Prints the change of every metric between two runs.
+
+    Args:
+        baseline (dict): Results of the reference run.
+        current (dict): Results of the new run.
+        threshold (float): Relative change (e.g. 0.1 for 10%) above which a worse metric is a regression.
+
+    Returns:
+        list[str]: Names of the regressed metrics.
+    """
+    regressions = []
+    print(f"{'metric':<52} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, result in current["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            print(f"{name:<52} {'-':>12} {result['value']:>12.6g} {'new':>8}")
+            continue
+        before, after = reference["value"], result["value"]
+        change = (after - before) / before if before else (0.0 if after == before else float("inf"))
+        worse = change > threshold if result["better"] == "lower" else change < -threshold
+        flag = "  REGRESSION" if worse else ""
+        if worse:
+            regressions.append(name)
+        print(f"{name:<52} {before:>12.6g} {after:>12.6g} {change * 100:>+7.1f}%{flag}")
+    for name in baseline["results"].keys() - current["results"].keys():
+        print(f"{name:<52} {baseline['results'][name]['value']:>12.6g} {'-':>12} {'gone':>8}")
+    print(f"{len(regressions)} regression(s) above {threshold * 100:g}%", file=sys.stderr)
+    return regressions
+
+def load_results(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["compare"]:
+        parser = argparse.ArgumentParser(prog="run.py compare", description="Compare two benchmark runs.")
+        parser.add_argument("baseline", help="JSON results of the reference run")
+        parser.add_argument("current", help="JSON results of the new run")
+        parser.add_argument("--threshold", type=float, default=10, help="regression threshold in percent (default: 10)")
+        args = parser.parse_args(argv[1:])
+        return 1 if compare(load_results(args.baseline), load_results(args.current), args.threshold / 100) else 0
+
+    parser = argparse.ArgumentParser(description="Run the rendering benchmark suite.")
+    parser.add_argument("-o", "--output", default="benchmark-results.json", help="JSON results file (default: benchmark-results.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="compare the results to a previous run")
+    parser.add_argument("--threshold", type=float, default=10, help="regression threshold in percent (default: 10)")
+    parser.add_argument("--rounds", type=int, default=7, help="timed rounds per microbenchmark (default: 7)")
+    parser.add_argument("--requests", type=int, default=64, help="requests per concurrency level (default: 64)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8], help="concurrency levels (default: 1 2 4 8)")
+    parser.add_argument("--skip", choices=["micro", "e2e", "memory"], nargs="+", default=[], help="parts of the suite to skip")
+    args = parser.parse_args(argv)
+
+    results = {}
+    if "micro" not in args.skip:
+        print("microbenchmarks...", file=sys.stderr)
+        results.update(micro_benchmarks(args.rounds))
+    if "e2e" not in args.skip:
+        print("end-to-end /generate...", file=sys.stderr)
+        results.update(end_to_end(args.requests, args.concurrency))
+    if "memory" not in args.skip:
+        print("peak memory...", file=sys.stderr)
+        results.update(memory_benchmarks())
+
+    run = {"meta": metadata(), "results": results}
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(run, f, indent=2, sort_keys=True)
+    print(f"results written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        return 1 if compare(load_results(args.compare), run, args.threshold / 100) else 0
+    for name, result in results.items():
+        print(f"{name:<52} {result['value']:>12.6g} {result['unit']}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+"""
+Precompiles the static SVG assets into a single bundle loaded at startup.
+
+Every selectable asset is parsed and normalized (viewBox fixed, scaled to the size the
+builders use) once, and the results are pickled to one file. The app loads it in a
+single read instead of parsing each asset (see ASSET_BUNDLE in app.py). Run it as a
+build step, e.g. when building the container image; assets changed afterwards are
+parsed again at runtime.
+
+Usage: python build_assets.py [-o assets.bundle]
+"""
+import argparse
+from modules.assets import cache as asset_cache
+from modules.coin import preload_assets
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precompile the static SVG assets into a bundle.")
+    parser.add_argument("-o", "--output", default="assets.bundle", help="bundle file (default: assets.bundle)")
+    args = parser.parse_args(argv)
+
+    preload_assets()
+    count = asset_cache.save_bundle(args.output)
+    print(f"{count} assets written to {args.output}")
+
+if __name__ == "__main__":
+    main()
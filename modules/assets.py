@@ -0,0 +1,196 @@
+import copy
+import os
+import pickle
+import threading
+import modules.metrics as metrics
+import modules.utils as utils
+
+# Bumped when the layout of the cache entries changes, older bundles are then ignored
+BUNDLE_VERSION = 1
+
+class AssetCache:
+    """Parse-once cache for the static SVG components (crowns, shields, icons, laurels)."""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _stamp(path):
+        """
+        Returns a cheap fingerprint of a file, used to detect changes on disk.
+
+        Args:
+            path (str): Path to the SVG file.
+
+        Returns:
+            tuple: (mtime in ns, size in bytes).
+        """
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def version(self, path):
+        """
+        Returns the fingerprint the cache compares to detect changes of a file.
+
+        Args:
+            path (str): Path to the SVG file.
+
+        Returns:
+            tuple: (mtime in ns, size in bytes), changing whenever the file is edited.
+        """
+        return self._stamp(path)
+
+    def _entry(self, path, target_size=None):
+        """
+        Returns the cached (stamp, root, scale) entry for a file, parsing it if needed.
+
+        Args:
+            path (str): Path to the SVG file.
+            target_size (tuple, optional): If given, the root is normalized with
+                ensure_viewbox/scale_svg for this size before being cached.
+
+        Returns:
+            tuple: (stamp, root element, scale or None).
+        """
+        key = (path, target_size)
+        stamp = self._stamp(path)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is not None and entry[0] == stamp:
+            return entry
+
+        # A scaled version is made from the parsed file when it is cached already (e.g. a
+        # large upload), parsing is only needed when an asset is missing from the bundle or
+        # changed since it was built
+        with self._lock:
+            parsed = self._entries.get((path, None)) if target_size is not None else None
+        with metrics.stage("parse"):
+            if parsed is not None and parsed[0] == stamp:
+                svg_root = copy.deepcopy(parsed[1])
+            else:
+                from defusedxml.ElementTree import parse as safe_parse
+                svg_root = safe_parse(path).getroot()
+            scale = None
+            if target_size is not None:
+                utils.ensure_viewbox(svg_root)
+                scale = utils.scale_svg(svg_root, target_size)
+
+        entry = (stamp, svg_root, scale)
+        with self._lock:
+            self._entries[key] = entry
+        return entry
+
+    def put(self, path, svg_root):
+        """
+        Caches an SVG file already parsed by the caller, e.g. right after writing it.
+
+        Args:
+            path (str): Path to the SVG file, which must exist.
+            svg_root (ET.Element): Its parsed root element, owned by the cache from then on.
+        """
+        entry = (self._stamp(path), svg_root, None)
+        with self._lock:
+            self._entries[(path, None)] = entry
+
+    def get(self, path):
+        """
+        Returns a private copy of a parsed SVG file.
+
+        Args:
+            path (str): Path to the SVG file.
+
+        Returns:
+            ET.Element: Copy of the SVG root element, safe to modify.
+        """
+        _, svg_root, _ = self._entry(path)
+        return copy.deepcopy(svg_root)
+
+    def get_shared(self, path):
+        """
+        Returns the cached SVG root itself, without copying it.
+
+        Args:
+            path (str): Path to the SVG file.
+
+        Returns:
+            ET.Element: The shared SVG root element, which must not be modified.
+        """
+        _, svg_root, _ = self._entry(path)
+        return svg_root
+
+    def get_scaled(self, path, target_size):
+        """
+        Returns a private copy of a parsed SVG file, with viewBox and size already fixed.
+
+        Args:
+            path (str): Path to the SVG file.
+            target_size (tuple): Target (width, height) passed to scale_svg.
+
+        Returns:
+            tuple: (ET.Element copy of the SVG root, scale factor).
+        """
+        _, svg_root, scale = self._entry(path, tuple(target_size))
+        return copy.deepcopy(svg_root), scale
+
+    def preload(self, paths, target_size=None):
+        """
+        Parses a list of SVG files ahead of time (e.g. at startup).
+
+        Args:
+            paths (list[str]): Paths to the SVG files, "none" entries are skipped.
+            target_size (tuple, optional): Target size to prepare scaled versions for.
+        """
+        for path in paths:
+            if path == "none":
+                continue
+            self._entry(path, tuple(target_size) if target_size else None)
+
+    def save_bundle(self, path):
+        """
+        Writes every cached asset to a single file, loaded back by load_bundle.
+
+        Args:
+            path (str): Path to the bundle file.
+
+        Returns:
+            int: Number of assets written.
+        """
+        with self._lock:
+            entries = dict(self._entries)
+        bundle = {"version": BUNDLE_VERSION, "entries": entries}
+        utils.write_atomic(path, pickle.dumps(bundle, protocol=pickle.HIGHEST_PROTOCOL))
+        return len(entries)
+
+    def load_bundle(self, path):
+        """
+        Fills the cache from a bundle written by save_bundle, in one read instead of a parse per asset.
+
+        Assets changed on disk since the bundle was built are still parsed again on use,
+        their fingerprint no longer matches. The bundle is unpickled, it must come from a
+        trusted build step.
+
+        Args:
+            path (str): Path to the bundle file.
+
+        Returns:
+            int: Number of assets loaded, 0 if the bundle is missing or from another version.
+        """
+        try:
+            with open(path, "rb") as f:
+                bundle = pickle.load(f)
+        except FileNotFoundError:
+            return 0
+        if bundle.get("version") != BUNDLE_VERSION:
+            return 0
+        with self._lock:
+            self._entries.update(bundle["entries"])
+        return len(bundle["entries"])
+
+    def clear(self):
+        """Drops every cached asset."""
+        with self._lock:
+            self._entries.clear()
+
+# Shared cache used by the builders
+cache = AssetCache()
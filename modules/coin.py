@@ -0,0 +1,352 @@
+import itertools
+import math
+import modules.elements as elements
+from modules.assets import cache as asset_cache
+from modules.registry import NONE, SLOTS, registry
+from modules.rendercache import config_key
+
+# Assets the UI offers in each option category, in display order, with their label
+choices = {
+    "crowns": [("none", "None"), ("crown1", "Crown 1"), ("crown2", "Crown 2"), ("crown3", "Crown 3")],
+    "shields": [("shield1", "Shield 1"), ("shield2", "Shield 2"), ("shield3", "Shield 3")],
+    "icons": [("icon1", "Lego brick"), ("icon2", "Diamond"), ("icon3", "Speeding truck"), ("icon4-2", "Horse"),
+              ("icon5", "Truck"), ("icon6", "Turned Lego brick"), ("icon11", "Lion"), ("icon12", "Sword and Axe")],
+    "icons_alternate": [("icon7", "3D printer 1"), ("icon8", "3D printer 2"), ("icon9", "Skull 1"), ("icon10", "Skull 2")],
+    "sides": [("none", "Text"), ("laurels1", "Laurels")],
+}
+
+# Option category of each asset field of the form, with the asset categories it accepts
+# (any registered asset of these categories is valid, not only those offered by the UI)
+ASSET_FIELDS = {
+    "crown-heads": ("crowns", ("crown", NONE)),
+    "icon-heads": ("icons_alternate", ("icon",)),
+    "sides-heads": ("sides", ("laurels", NONE)),
+    "crown-tails": ("crowns", ("crown", NONE)),
+    "shield-tails": ("shields", ("shield",)),
+    "sides-tails": ("sides", ("laurels", NONE)),
+    "upperleft-tails": ("icons", ("icon",)),
+    "upperright-tails": ("icons", ("icon",)),
+    "downleft-tails": ("icons", ("icon",)),
+    "downright-tails": ("icons", ("icon",)),
+}
+
+DEFAULTS = {
+    "crown-heads": "crown1",
+    "icon-heads": "icon9",
+    "sides-heads": "laurels1",
+    "crown-tails": "crown1",
+    "shield-tails": "shield2",
+    "sides-tails": "none",
+    "upperleft-tails": "icon1",
+    "upperright-tails": "icon1",
+    "downleft-tails": "icon1",
+    "downright-tails": "icon1",
+    "text-heads-line1": "DARK ▾ VADA",
+    "text-heads-line2": "VADA ▾ COIN",
+    "text-tails-line1": "DARK ▾ VADA",
+    "text-tails-line2": "VADA ▾ COIN",
+}
+
+class InvalidConfig(ValueError):
+    """Raised when a submitted configuration or catalogue refers to an unknown asset or side."""
+
+SIDES = ("heads", "tails")
+
+# Configuration fields each side is drawn from, besides the RENDER_FIELDS shared by both
+SIDE_FIELDS = {
+    "heads": ("crown-heads", "icon-heads", "sides-heads", "text-heads-line1", "text-heads-line2"),
+    "tails": ("crown-tails", "shield-tails", "sides-tails", "text-tails-line1", "text-tails-line2",
+              "upperleft-tails", "upperright-tails", "downleft-tails", "downright-tails"),
+}
+RENDER_FIELDS = ("debug", "symbols", "minify", "precision", "outline")
+
+# Decimals kept on coordinates by the geometry stage, a tenth of a unit on an 850 units coin
+DEFAULT_PRECISION = 1
+
+def options():
+    """
+    Returns the choices of each asset field of the form, as the template renders them.
+
+    Returns:
+        dict: Form field to a list of {"value", "img", "alt", "checked"} choices.
+    """
+    return {
+        field: [{"value": asset_id, "img": registry.get(asset_id).path, "alt": label, "checked": asset_id == DEFAULTS[field]}
+                for asset_id, label in choices[category]]
+        for field, (category, _) in ASSET_FIELDS.items()
+    }
+
+def field_values(field):
+    """
+    Returns every value the UI offers for a form field.
+
+    Args:
+        field (str): Form field name (e.g. "crown-tails").
+
+    Returns:
+        list[str]: The possible values.
+    """
+    category, _ = ASSET_FIELDS[field]
+    return [asset_id for asset_id, _ in choices[category]]
+
+def default_config():
+    """
+    Returns the configuration the UI starts with.
+
+    Returns:
+        dict: Form fields set to their default value.
+    """
+    return dict(DEFAULTS)
+
+def preload_assets(bundle=None):
+    """
+    Indexes the static assets and parses each once, in the shape the builders use it.
+
+    Args:
+        bundle (str, optional): Asset bundle written by build_assets.py. Assets found in it
+            are not parsed again.
+    """
+    if bundle:
+        asset_cache.load_bundle(bundle)
+    registry.scan()
+    # Crowns and central assets are used scaled to their slot, icons in quarters are scaled
+    # by a transform and laurels as they are
+    for category, slot in (("crown", "crown"), ("shield", "center"), ("icon", "center")):
+        asset_cache.preload([asset.path for asset in registry.category(category)], SLOTS[slot])
+
+def read_asset(form, field):
+    """
+    Reads and validates an asset field of the form.
+
+    Args:
+        form (Mapping): The submitted form.
+        field (str): Asset field name (e.g. "crown-tails").
+
+    Returns:
+        str: The asset ID, or NONE.
+
+    Raises:
+        InvalidConfig: If the value is not a registered asset of a category the field accepts.
+    """
+    value = form[field]
+    asset = registry.find(value) if isinstance(value, str) else None
+    if asset is None or asset.category not in ASSET_FIELDS[field][1]:
+        raise InvalidConfig(f"Invalid {field}: {value!r}")
+    return asset.id
+
+def read_precision(value):
+    """
+    Reads the number of decimals kept on coordinates.
+
+    Args:
+        value (str | int): Submitted value.
+
+    Returns:
+        int: Precision between 0 and 6, DEFAULT_PRECISION if the value is not a number.
+    """
+    try:
+        return min(max(int(value), 0), 6)
+    except (TypeError, ValueError):
+        return DEFAULT_PRECISION
+
+def read_config(form):
+    """
+    Reads and normalizes the coin configuration posted by the UI.
+
+    Assets are referred to by their ID, paths of registered files are accepted too. Text
+    lines are dropped for a side using laurels, since they are not rendered, so that
+    equivalent configurations share the same cache key.
+
+    Args:
+        form (Mapping): The submitted form (or any mapping with the same fields).
+
+    Returns:
+        dict: The normalized configuration.
+
+    Raises:
+        InvalidConfig: If an asset field does not refer to a registered asset it accepts.
+    """
+    config = {
+        "crown-heads": read_asset(form, "crown-heads"),
+        "icon-heads": read_asset(form, "icon-heads"),
+        "sides-heads": read_asset(form, "sides-heads"),
+        "text-heads-line1": form["text-heads-line1"],
+        "text-heads-line2": form["text-heads-line2"],
+        "crown-tails": read_asset(form, "crown-tails"),
+        "shield-tails": read_asset(form, "shield-tails"),
+        "sides-tails": read_asset(form, "sides-tails"),
+        "text-tails-line1": form["text-tails-line1"],
+        "text-tails-line2": form["text-tails-line2"],
+        "upperleft-tails": read_asset(form, "upperleft-tails"),
+        "upperright-tails": read_asset(form, "upperright-tails"),
+        "downleft-tails": read_asset(form, "downleft-tails"),
+        "downright-tails": read_asset(form, "downright-tails"),
+        "debug": form.get("debug", False) in ("on", True),
+        # Shared <symbol>/<use> output unless explicitly turned off
+        "symbols": form.get("symbols", "on") in ("on", True),
+        # Transform baking and coordinate rounding, see modules/geometry.py
+        "minify": form.get("minify", "on") in ("on", True),
+        "precision": read_precision(form.get("precision", DEFAULT_PRECISION)),
+        # Text drawn as glyph outlines of the bundled font, see modules/outline.py
+        "outline": form.get("outline", "on") in ("on", True),
+    }
+    for side in ("heads", "tails"):
+        if config[f"sides-{side}"] != "none":
+            config[f"text-{side}-line1"] = ""
+            config[f"text-{side}-line2"] = ""
+    return config
+
+def read_sides(value):
+    """
+    Reads the sides of a catalogue.
+
+    Args:
+        value (str | list): A side, or a list of sides.
+
+    Returns:
+        tuple: The sides, in SIDES order.
+
+    Raises:
+        InvalidConfig: If a value is not a side, or no side is given.
+    """
+    values = [value] if isinstance(value, str) else value
+    if not isinstance(values, (list, tuple)) or not values:
+        raise InvalidConfig(f"Invalid sides: {value!r}, expected a side or a list of {', '.join(SIDES)}")
+    unknown = [side for side in values if side not in SIDES]
+    if unknown:
+        raise InvalidConfig(f"Invalid sides: {', '.join(map(repr, unknown))}, expected {', '.join(SIDES)}")
+    return tuple(side for side in SIDES if side in values)
+
+def expand_catalogue(catalogue):
+    """
+    Lists the configurations of a catalogue, lazily.
+
+    A catalogue is a mapping with optional "base" (fields overriding the UI defaults),
+    "matrix" (cartesian product of field values, "*" being every UI value) and "configs"
+    (explicit configurations merged over base) keys, see batch.py.
+
+    Every value is validated upfront, so that a bad catalogue fails before the first coin,
+    with one error per invalid entry.
+
+    Args:
+        catalogue (dict): The catalogue.
+
+    Returns:
+        tuple: (number of configurations, iterator over normalized configurations).
+
+    Raises:
+        InvalidConfig: If the catalogue is malformed, or configurations or matrix values refer
+            to unknown assets. Its message lists every invalid entry, one per line.
+    """
+    base, configs, matrix = catalogue.get("base", {}), catalogue.get("configs", []), catalogue.get("matrix", {})
+    if not isinstance(base, dict) or not isinstance(configs, list) or not isinstance(matrix, dict):
+        raise InvalidConfig("Expected a mapping for base and matrix, and a list for configs")
+    base = dict(default_config(), **base)
+    matrix = {field: field_values(field) if choices == "*" else [choices] if isinstance(choices, str) else choices
+              for field, choices in matrix.items()}
+
+    # Fields are read independently, values valid on their own are valid in any combination
+    errors = []
+    for index, config in enumerate(configs):
+        try:
+            if not isinstance(config, dict):
+                raise InvalidConfig(f"Expected a mapping, got {config!r}")
+            read_config(dict(base, **config))
+        except InvalidConfig as e:
+            errors.append(f"configs[{index}]: {e}")
+    for field, values in matrix.items():
+        if not isinstance(values, list):
+            errors.append(f"matrix.{field}: Expected \"*\", a value or a list, got {values!r}")
+            continue
+        for value in values:
+            try:
+                read_config(dict(base, **{field: value}))
+            except InvalidConfig as e:
+                errors.append(f"matrix.{field}: {e}")
+    if errors:
+        raise InvalidConfig("\n".join(errors))
+
+    count = len(configs) + (math.prod(len(choices) for choices in matrix.values()) if matrix else 0)
+
+    def generate():
+        for config in configs:
+            yield read_config(dict(base, **config))
+        if matrix:
+            fields = list(matrix)
+            for combination in itertools.product(*matrix.values()):
+                yield read_config(dict(base, **dict(zip(fields, combination))))
+
+    return count, generate()
+
+def asset_hashes(config, fields):
+    """
+    Returns the content hash of the assets some fields of a configuration refer to.
+
+    Args:
+        config (dict): Configuration returned by read_config.
+        fields (iterable): Configuration fields.
+
+    Returns:
+        dict: Asset field to content hash.
+    """
+    return {field: registry.content_hash(config[field]) for field in fields if field in ASSET_FIELDS}
+
+def coin_key(config):
+    """
+    Computes the hash of a configuration, which changes when an asset it uses is edited.
+
+    Args:
+        config (dict): Configuration returned by read_config.
+
+    Returns:
+        str: Hex digest identifying the rendered coin.
+    """
+    return config_key(dict(config, assets=asset_hashes(config, config)))
+
+def side_key(config, side):
+    """
+    Computes the hash of the part of a configuration one side depends on.
+
+    Two configurations with the same side key render that side identically, whatever
+    their other side looks like.
+
+    Args:
+        config (dict): Configuration returned by read_config.
+        side (str): "heads" or "tails".
+
+    Returns:
+        str: Hex digest identifying the side.
+    """
+    fields = {field: config[field] for field in SIDE_FIELDS[side] + RENDER_FIELDS}
+    return config_key(dict(fields, side=side, assets=asset_hashes(config, SIDE_FIELDS[side])))
+
+def render_coin(config, sides=SIDES):
+    """
+    Renders the sides of a coin.
+
+    Args:
+        config (dict): Configuration returned by read_config.
+        sides (tuple, optional): Sides to render (default: both).
+
+    Returns:
+        dict: The SVG document of each rendered side ("heads", "tails").
+    """
+    is_debug = config["debug"]
+    symbols = config["symbols"]
+    outline = config["outline"]
+    precision = config["precision"] if config["minify"] else None
+    coin = {}
+
+    path = {field: registry.path(config[field]) for field in ASSET_FIELDS}
+
+    # Built from memoized fragments, minified and serialized once each, see elements.compose_coin
+    if "heads" in sides:
+        # Heads always have a single SVG as "head"
+        coin["heads"] = elements.compose_coin(path["icon-heads"], path["crown-heads"], path["sides-heads"], config["text-heads-line1"], config["text-heads-line2"], is_debug, True, symbols, outline, precision)
+
+    if "tails" in sides:
+        # Tails always have a coat of arms, built from the shield and the four icons
+        coat_of_arms = (path["shield-tails"], path["upperleft-tails"], path["upperright-tails"], path["downleft-tails"], path["downright-tails"])
+        coin["tails"] = elements.compose_coin(coat_of_arms, path["crown-tails"], path["sides-tails"], config["text-tails-line1"], config["text-tails-line2"], is_debug, True, symbols, outline, precision)
+
+    return coin
@@ -0,0 +1,109 @@
+import gzip
+import os
+import modules.metrics as metrics
+import modules.utils as utils
+
+# Brotli is optional, responses fall back to gzip without it
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Content codings we can produce, preferred first
+ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+EXTENSIONS = {"br": ".br", "gzip": ".gz"}
+# gzip levels go from 1 to 9, brotli qualities from 0 to 11
+DEFAULT_LEVELS = {"gzip": 6, "br": 5}
+# Bytes read from a file at once when compressing it
+CHUNK_SIZE = 256 * 1024
+
+def negotiate(accept_encodings):
+    """
+    Picks the content coding of a response.
+
+    Args:
+        accept_encodings (werkzeug.datastructures.Accept): Parsed Accept-Encoding header.
+
+    Returns:
+        str | None: "br" or "gzip", None to send the body as is.
+    """
+    return accept_encodings.best_match(ENCODINGS)
+
+def compress(data, encoding, level=None):
+    """
+    Compresses a body.
+
+    Args:
+        data (bytes): Uncompressed body.
+        encoding (str): "br" or "gzip".
+        level (int, optional): Compression level (default: DEFAULT_LEVELS).
+
+    Returns:
+        bytes: The compressed body.
+    """
+    level = DEFAULT_LEVELS[encoding] if level is None else level
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    # mtime=0 keeps the output identical between runs, hence cacheable
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+def decompress(data, encoding):
+    """
+    Decompresses a body produced by compress.
+
+    Args:
+        data (bytes): Compressed body.
+        encoding (str): "br" or "gzip".
+
+    Returns:
+        bytes: The uncompressed body.
+    """
+    if encoding == "br":
+        return brotli.decompress(data)
+    return gzip.decompress(data)
+
+def compress_file(source, target, encoding, level=None):
+    """
+    Compresses a file into another one, CHUNK_SIZE bytes at a time.
+
+    Args:
+        source (file): Binary file object to read.
+        target (file): Binary file object to write.
+        encoding (str): "br" or "gzip".
+        level (int, optional): Compression level (default: DEFAULT_LEVELS).
+    """
+    level = DEFAULT_LEVELS[encoding] if level is None else level
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=level)
+        while chunk := source.read(CHUNK_SIZE):
+            target.write(compressor.process(chunk))
+        target.write(compressor.finish())
+        return
+    # Without a file name and with mtime=0, the output only depends on the content
+    with gzip.GzipFile(filename="", mode="wb", compresslevel=level, fileobj=target, mtime=0) as f:
+        while chunk := source.read(CHUNK_SIZE):
+            f.write(chunk)
+
+def precompressed(path, encoding, level=None):
+    """
+    Returns a compressed copy of a file, kept next to it and built on first use.
+
+    The level is part of the copy's name, so changing it builds a new copy instead of
+    serving the one made at the former level.
+
+    Args:
+        path (str): Path to the uncompressed file.
+        encoding (str): "br" or "gzip".
+        level (int, optional): Compression level (default: DEFAULT_LEVELS).
+
+    Returns:
+        str: Path to the compressed file, path + ".br" or ".gz" followed by the level, e.g. ".gz6".
+    """
+    level = DEFAULT_LEVELS[encoding] if level is None else level
+    compressed_path = f"{path}{EXTENSIONS[encoding]}{level}"
+    # The copy is only trusted if it is newer than the file it was made from
+    if not os.path.exists(compressed_path) or os.path.getmtime(compressed_path) < os.path.getmtime(path):
+        # Streamed, STL meshes can be hundreds of megabytes
+        with metrics.stage("compress"), open(path, "rb") as source, utils.open_atomic(compressed_path) as target:
+            compress_file(source, target, encoding, level)
+    return compressed_path
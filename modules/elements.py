@@ -1,106 +1,276 @@
+import functools
 import xml.etree.ElementTree as ET
-from defusedxml.ElementTree import parse as safe_parse
+import modules.metrics as metrics
 import modules.utils as utils
 import modules.svgbuilder as svgbuilder
+from modules.assets import cache as asset_cache
+from modules.registry import registry
 
-def create_coat_of_arms(output_file, shield_path, ul_path, ur_path, dl_path, dr_path):
+def create_coat_of_arms(shield_path, ul_path, ur_path, dl_path, dr_path, output_file=None, symbols=False):
     """
     Creates a coat of arms SVG by overlaying a shield and placing icons in fixed positions.
 
     Args:
-        output_file (str): Path to the output SVG file.
         shield_path (str): Path to the shield SVG file.
         ul_path (str): Path to the upper left SVG icon file.
         ur_path (str): Path to the upper right SVG icon file.
         dl_path (str): Path to the down left SVG icon file.
         dr_path (str): Path to the down right SVG icon file.
+        output_file (str, optional): Also write the SVG to this path.
+        symbols (bool, optional): Define each distinct icon once and place it with `<use>`.
+
+    Returns:
+        ET.Element: The coat of arms SVG element, already scaled for create_coin.
     """
-    svg_tree = safe_parse(shield_path)
-    svg_root = svg_tree.getroot()
-
-    # Ensure the svg SVG has a proper viewBox
-    utils.ensure_viewbox(svg_root)
-
-    # Fix scale issues
-    scale = utils.scale_svg(svg_root, (512, 512))
-
-    # Wrap the svg elements in a <g> tag with scale transformation
-    svg_group = ET.Element("g", {"transform": f"scale({scale})"})
-    for element in list(svg_root):  # Use list to avoid modifying the root during iteration
-        svg_group.append(element)
-        svg_root.remove(element)
-    svg_root.append(svg_group)
-
-    # Positions and target size for icons
-    positions = [(80, 60),
-                 (285, 60),
-                 (80, 260),
-                 (285, 260)]
-    target_size = (145, 145)
-
-    icon_paths = [
-        ul_path,
-        ur_path,
-        dl_path,
-        dr_path,
-    ]
-    for pos, icon_file in zip(positions, icon_paths):
-        icon_tree = safe_parse(icon_file)
-        icon_root = icon_tree.getroot()
-
-        viewbox = icon_root.attrib.get("viewBox", "0 0 100 100")
-        scale = utils.get_viewbox_scale(viewbox, target_size)
-
-        # Create a group for each icon and append it
-        svgbuilder.SVGBuilder.add_group_with_transform(svg_root, f"translate({pos[0]},{pos[1]}) scale({scale})", icon_root)
-
-    # Write the final SVG
-    tree = ET.ElementTree(svg_root)
-    utils.write_clean_svg(tree, output_file)
-
-
-def create_coin(output_file, single_svg_path, crown_path, laurels_path, left_line="", right_line="", already_scaled=False, debug=False, background=True):
+    with metrics.stage("compose"):
+        # Parsed once, with viewBox and scale already fixed
+        svg_root, scale = asset_cache.get_scaled(shield_path, (512, 512))
+
+        # Wrap the svg elements in a <g> tag with scale transformation
+        svg_group = ET.Element("g", {"transform": f"scale({scale})"})
+        for element in list(svg_root):  # Use list to avoid modifying the root during iteration
+            svg_group.append(element)
+            svg_root.remove(element)
+        svg_root.append(svg_group)
+
+        # Positions of the icons, scaled to the "quarter" slot of the registry
+        positions = [(80, 60),
+                     (285, 60),
+                     (80, 260),
+                     (285, 260)]
+
+        icon_paths = [
+            ul_path,
+            ur_path,
+            dl_path,
+            dr_path,
+        ]
+        for pos, icon_file in zip(positions, icon_paths):
+            # Precomputed by the registry from the intrinsic size of the icon
+            scale = registry.find(icon_file).scales["quarter"]
+
+            # Create a group (or a reference to a shared symbol) for each icon and append it
+            svgbuilder.SVGBuilder.add_asset(svg_root, f"translate({pos[0]},{pos[1]}) scale({scale})", icon_file, lambda: asset_cache.get(icon_file), symbols)
+
+    # Write the final SVG if asked to
+    if output_file:
+        utils.write_clean_svg(ET.ElementTree(svg_root), output_file)
+    return svg_root
+
+
+def create_coin(single_svg, crown_path, laurels_path, left_line="", right_line="", already_scaled=False, debug=False, background=True, output_file=None, symbols=False, outline=False):
     """
     Creates a complete SVG coin borders, a central icon or coat of arms, crown, and text or laurels at the sides.
 
     Args:
-        output_file (str): Path to the output SVG file.
-        single_svg_path (str): Path to the central SVG file.
+        single_svg (str | ET.Element): Path to the central SVG file, or an SVG element (e.g. from create_coat_of_arms).
         crown_path (str): path for the crown SVG file, "none" is no crown.
         laurels_path (str): path for the laurels SVG file, "none" is no laurels (and replaced by text).
         left_line (str): if there is text instead of laurels, the text of the left side
         right_line (str): if there is text instead of laurels, the text of the right side
         already_scaled (bool): is the central SVG file already scaled properly.
         debug (bool): enable / disable debug.
+        background (bool): add a white background.
+        output_file (str, optional): Also write the SVG to this path.
+        symbols (bool, optional): Define the crown and laurels in `<defs>` and place them with `<use>`.
+        outline (bool, optional): Draw the text as glyph outlines from the bundled font instead of `<text>`.
+
+    Returns:
+        ET.ElementTree: The coin SVG tree.
     """
-    svg_element = svgbuilder.SVGBuilder.create_svg(850, 850, "0 0 850 850")
+    with metrics.stage("compose"):
+        svg_element = svgbuilder.SVGBuilder.create_svg(850, 850, "0 0 850 850")
 
-    # Add a white background if necessary (TODO add condition)
-    if background:
-        utils.add_white_background(svg_element)
+        # Add a white background if necessary (TODO add condition)
+        if background:
+            utils.add_white_background(svg_element)
 
-    # Add concentric circles to materialize the coin
-    svgbuilder.SVGBuilder.add_circle(svg_element, 420, 425, "black")
-    svgbuilder.SVGBuilder.add_circle(svg_element, 400, 425, "#555555")
+        # Add concentric circles to materialize the coin
+        svgbuilder.SVGBuilder.add_circle(svg_element, 420, 425, "black")
+        svgbuilder.SVGBuilder.add_circle(svg_element, 400, 425, "#555555")
 
-    # Add coat of arms with a crown on top (or not)
-    if crown_path != "none":
-        svgbuilder.SVGBuilder.add_single_svg(svg_element, single_svg_path, already_scaled, True)
-        svgbuilder.SVGBuilder.add_crown(svg_element, crown_path)
-    else:
-        svgbuilder.SVGBuilder.add_single_svg(svg_element, single_svg_path, already_scaled, False)
+        # Add coat of arms with a crown on top (or not)
+        if crown_path != "none":
+            svgbuilder.SVGBuilder.add_single_svg(svg_element, single_svg, already_scaled, True)
+            svgbuilder.SVGBuilder.add_crown(svg_element, crown_path, symbols)
+        else:
+            svgbuilder.SVGBuilder.add_single_svg(svg_element, single_svg, already_scaled, False)
+
+        # Add laurels OR text
+        if laurels_path != "none":
+            svgbuilder.SVGBuilder.add_laurels(svg_element, laurels_path, symbols)
+        elif outline:
+            # Same layout as the textPath below, drawn with paths
+            svgbuilder.SVGBuilder.add_outlined_text_on_circle(svg_element, 315, 425, 57.75, left_line)
+            svgbuilder.SVGBuilder.add_outlined_text_on_circle(svg_element, 315, 425, 8.40, right_line)
+        else:
+            # Add circular text around a textPath, inside the coin
+            svgbuilder.SVGBuilder.add_textpath_circle(svg_element, 315, 425, "circlePath")
+            svgbuilder.SVGBuilder.add_text_on_circle(svg_element, 57.75, left_line, "circlePath")
+            svgbuilder.SVGBuilder.add_text_on_circle(svg_element, 8.40, right_line, "circlePath")
+
+        if debug:
+            svgbuilder.SVGBuilder.add_center_lines(svg_element, 850, 850)
+
+    tree = ET.ElementTree(svg_element)
+    if output_file:
+        utils.write_clean_svg(tree, output_file)
+    return tree
+
+
+# Coins are drawn on an 850x850 canvas, see create_coin
+COIN_SIZE = 850
+
+def _add_skeleton(root, background):
+    """Fragment builder: the background and the two concentric circles of the coin."""
+    with metrics.stage("compose"):
+        if background:
+            utils.add_white_background(root)
+        svgbuilder.SVGBuilder.add_circle(root, 420, 425, "black")
+        svgbuilder.SVGBuilder.add_circle(root, 400, 425, "#555555")
+
+def _add_icon(root, icon_path, crown):
+    """Fragment builder: a single icon in the middle of the coin, lower when there is no crown."""
+    with metrics.stage("compose"):
+        svgbuilder.SVGBuilder.add_single_svg(root, icon_path, False, crown)
+
+def _add_coat_of_arms(root, paths, symbols, crown):
+    """Fragment builder: a coat of arms in the middle of the coin, lower when there is no crown."""
+    coat_of_arms = create_coat_of_arms(*paths, symbols=symbols)
+    with metrics.stage("compose"):
+        svgbuilder.SVGBuilder.add_single_svg(root, coat_of_arms, True, crown)
+
+def _add_crown(root, crown_path, symbols):
+    """Fragment builder: the crown, and its symbol in symbols mode."""
+    with metrics.stage("compose"):
+        svgbuilder.SVGBuilder.add_crown(root, crown_path, symbols)
+
+def _add_laurels(root, laurels_path, symbols):
+    """Fragment builder: the laurels, and their symbol in symbols mode."""
+    with metrics.stage("compose"):
+        svgbuilder.SVGBuilder.add_laurels(root, laurels_path, symbols)
+
+def _add_text(root, left_line, right_line, outline):
+    """Fragment builder: the two lines of text around the coin, with their path if drawn with `<textPath>`."""
+    with metrics.stage("compose"):
+        if outline:
+            # Same layout as the textPath below, drawn with paths
+            svgbuilder.SVGBuilder.add_outlined_text_on_circle(root, 315, 425, 57.75, left_line)
+            svgbuilder.SVGBuilder.add_outlined_text_on_circle(root, 315, 425, 8.40, right_line)
+        else:
+            svgbuilder.SVGBuilder.add_textpath_circle(root, 315, 425, "circlePath")
+            svgbuilder.SVGBuilder.add_text_on_circle(root, 57.75, left_line, "circlePath")
+            svgbuilder.SVGBuilder.add_text_on_circle(root, 8.40, right_line, "circlePath")
+
+def _add_center_lines(root):
+    """Fragment builder: the debug lines."""
+    with metrics.stage("compose"):
+        svgbuilder.SVGBuilder.add_center_lines(root, COIN_SIZE, COIN_SIZE)
 
-    # Add laurels OR text
+@functools.lru_cache(maxsize=512)
+def _fragment(build, args, versions, precision):
+    """
+    Builds, minifies and serializes a fragment of a coin, once per set of inputs.
+
+    The fragment is built on an empty coin root and minified on its own: its elements
+    are at the top level of the coin, where minify handles each independently.
+
+    Args:
+        build (callable): Fragment builder, adds the elements of the fragment to the root.
+        args (tuple): Arguments of the builder after the root.
+        versions (tuple): Fingerprints of the asset files used, a changed file builds the fragment again.
+        precision (int | None): Decimals kept by geometry.minify, None to leave the fragment as built.
+
+    Returns:
+        tuple: (symbols, markup): (id, markup) of each `<symbol>` the fragment defines in the
+            `<defs>` of the coin, and the markup of its other elements.
+    """
+    root = svgbuilder.SVGBuilder.create_svg(COIN_SIZE, COIN_SIZE, f"0 0 {COIN_SIZE} {COIN_SIZE}")
+    build(root, *args)
+    # The <defs> of the coin itself, minify may splice other ones (e.g. of a coat of arms) to the top level
+    defs = root.find("defs")
+    if precision is not None:
+        # Imported on first use, numpy makes it the slowest module to import
+        import modules.geometry as geometry
+        with metrics.stage("minify"):
+            geometry.minify(root, precision)
+    symbols = []
+    markup = []
+    for child in root:
+        if child is defs:
+            symbols.extend((symbol.get("id"), utils.to_clean_svg(symbol)) for symbol in child)
+        else:
+            markup.append(utils.to_clean_svg(child))
+    return tuple(symbols), "".join(markup)
+
+@functools.lru_cache(maxsize=None)
+def _open_tag():
+    """Returns the start tag of the root of every coin."""
+    root = svgbuilder.SVGBuilder.create_svg(COIN_SIZE, COIN_SIZE, f"0 0 {COIN_SIZE} {COIN_SIZE}")
+    # Serialized empty, "<svg .../>"
+    return utils.to_clean_svg(root)[:-2] + ">"
+
+def compose_coin(center, crown_path, laurels_path, left_line="", right_line="", debug=False, background=True, symbols=False, outline=False, precision=None):
+    """
+    Renders a coin to an SVG document, like create_coin followed by geometry.minify and
+    utils.to_clean_svg, from memoized fragments.
+
+    The skeleton, the central icon or coat of arms, the crown, the laurels and the text are
+    each built, minified and serialized once per set of inputs they depend on, then spliced
+    together. Coins differing only in text or crown reuse their other fragments.
+
+    Args:
+        center (str | tuple): Path to the central SVG file, or the paths of the shield and of
+            the four icons of a coat of arms (see create_coat_of_arms).
+        crown_path (str): Path to the crown SVG file, "none" is no crown.
+        laurels_path (str): Path to the laurels SVG file, "none" is no laurels (and replaced by text).
+        left_line (str, optional): If there is text instead of laurels, the text of the left side.
+        right_line (str, optional): If there is text instead of laurels, the text of the right side.
+        debug (bool, optional): Add the center lines.
+        background (bool, optional): Add a white background.
+        symbols (bool, optional): Define assets in `<defs>` and place them with `<use>`.
+        outline (bool, optional): Draw the text as glyph outlines from the bundled font instead of `<text>`.
+        precision (int, optional): Decimals kept by geometry.minify (default: not minified).
+
+    Returns:
+        str: The SVG document.
+    """
+    crown = crown_path != "none"
+    # (builder, arguments, asset files) of each fragment, in document order
+    if isinstance(center, str):
+        fragments = [(_add_skeleton, (background,), ()), (_add_icon, (center, crown), (center,))]
+    else:
+        center = tuple(center)
+        fragments = [(_add_skeleton, (background,), ()), (_add_coat_of_arms, (center, symbols, crown), center)]
+    if crown:
+        fragments.append((_add_crown, (crown_path, symbols), (crown_path,)))
     if laurels_path != "none":
-        svgbuilder.SVGBuilder.add_laurels(svg_element, laurels_path)
+        fragments.append((_add_laurels, (laurels_path, symbols), (laurels_path,)))
     else:
-        # Add circular text around a textPath, inside the coin
-        svgbuilder.SVGBuilder.add_textpath_circle(svg_element, 315, 425, "circlePath")
-        svgbuilder.SVGBuilder.add_text_on_circle(svg_element, 57.75, left_line, "circlePath")
-        svgbuilder.SVGBuilder.add_text_on_circle(svg_element, 8.40, right_line, "circlePath")
-
+        fragments.append((_add_text, (left_line, right_line, outline), ()))
     if debug:
-        svgbuilder.SVGBuilder.add_center_lines(svg_element, 850, 850)
+        fragments.append((_add_center_lines, (), ()))
 
-    tree = ET.ElementTree(svg_element)
-    utils.write_clean_svg(tree, output_file)
+    definitions = {}
+    markup = []
+    for build, args, paths in fragments:
+        fragment_symbols, fragment_markup = _fragment(build, args, tuple(asset_cache.version(path) for path in paths), precision)
+        # A symbol is defined once, however many fragments place it
+        for symbol_id, symbol in fragment_symbols:
+            definitions.setdefault(symbol_id, symbol)
+        markup.append(fragment_markup)
+    defs = "<defs>" + "".join(definitions.values()) + "</defs>" if definitions else ""
+    return _open_tag() + defs + "".join(markup) + "</svg>"
+
+def cache_info():
+    """
+    Returns the statistics of the fragment cache.
+
+    Returns:
+        functools._CacheInfo: Hits, misses, maximum and current size.
+    """
+    return _fragment.cache_info()
+
+def cache_clear():
+    """Empties the fragment cache."""
+    _fragment.cache_clear()
@@ -0,0 +1,80 @@
+import os
+import time
+import zipfile
+
+# Bytes read from a member file at once, and sent to the client at once
+CHUNK_SIZE = 64 * 1024
+
+class _Pipe:
+    """Write-only, unseekable file object collecting what the ZIP writer produces until it is sent."""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """
+        Takes what was written since the last call.
+
+        Returns:
+            bytes: The written data, possibly empty.
+        """
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        self.size = 0
+        return data
+
+def stream_zip(members, level=None):
+    """
+    Writes a ZIP archive as a stream of chunks, member by member.
+
+    Nothing is seeked back: each member is followed by a data descriptor holding its
+    sizes and CRC, and the central directory comes last. Members are only read (or
+    produced) as the archive reaches them and sent once written, large files every
+    CHUNK_SIZE bytes, so the memory used does not depend on the size of the members.
+    It still grows with their number: the ZIP writer keeps the entry of each member,
+    about a kilobyte, until it writes the central directory.
+
+    Args:
+        members (iterable): (name, content) pairs, in archive order. Content is bytes, or
+            the path of a file copied in chunks, skipped if it no longer exists.
+        level (int, optional): Deflate level (default: zlib's).
+
+    Yields:
+        bytes: Consecutive, non-empty parts of the archive.
+    """
+    pipe = _Pipe()
+    with zipfile.ZipFile(pipe, "w", zipfile.ZIP_DEFLATED, compresslevel=level) as archive:
+        for name, content in members:
+            info = zipfile.ZipInfo(name, time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            if isinstance(content, bytes):
+                archive.writestr(info, content)
+            else:
+                try:
+                    source = open(content, "rb")
+                except FileNotFoundError:
+                    continue
+                with source:
+                    # Known upfront, so that members over 2 GiB get ZIP64 headers
+                    info.file_size = os.fstat(source.fileno()).st_size
+                    with archive.open(info, "w") as target:
+                        while chunk := source.read(CHUNK_SIZE):
+                            target.write(chunk)
+                            if pipe.size >= CHUNK_SIZE:
+                                yield pipe.drain()
+            # Sent as soon as each member is complete
+            data = pipe.drain()
+            if data:
+                yield data
+    data = pipe.drain()
+    if data:
+        yield data
@@ -0,0 +1,576 @@
+import functools
+import math
+import re
+import numpy as np
+import modules.utils as utils
+
+# Elements only useful to editors
+DROPPED_TAGS = {"metadata", "title", "desc"}
+# Elements whose content is only drawn where it is referenced, not where it is defined
+REFERENCED_TAGS = {"defs", "clipPath", "mask", "pattern", "marker", "linearGradient", "radialGradient", "filter", "style"}
+SHAPE_TAGS = {"path", "rect", "circle", "ellipse", "line", "polyline", "polygon"}
+GROUP_TAGS = {"g", "a"}
+# Attributes that tie an element to its own coordinate system
+UNBAKEABLE_ATTRIBUTES = ("class", "clip-path", "mask", "filter", "stroke-dasharray", "vector-effect")
+
+_RUN = re.compile(r"([MmZzLlHhVvCcSsQqTtAa])([^MmZzLlHhVvCcSsQqTtAa]*)")
+# Number in path data, points and transforms, shared with the STL export
+NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+_ARC_ARGUMENTS = re.compile(
+    r"[\s,]*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)[\s,]*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)"
+    r"[\s,]*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)[\s,]*([01])[\s,]*([01])"
+    r"[\s,]*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)[\s,]*([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)")
+_REFERENCE = re.compile(r"#([^\s)\"']+)")
+_TRAILING_ZERO = re.compile(r"\.0(?=,|$)")
+_LEADING_ZERO = re.compile(r"(?<![\d.])0\.")
+_TRANSFORM = re.compile(r"(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)")
+
+# Number of coordinate pairs in one segment of each command
+_POINTS = {"M": 1, "L": 1, "T": 1, "C": 3, "S": 2, "Q": 2, "A": 1}
+_ARGUMENTS = {"M": 2, "L": 2, "T": 2, "H": 1, "V": 1, "C": 6, "S": 4, "Q": 4, "A": 7}
+
+def parse_transform(transform):
+    """
+    Parses an SVG transform attribute.
+
+    Args:
+        transform (str): Transform list, e.g. "translate(31, 60) scale(0.615)".
+
+    Returns:
+        np.ndarray: 3x3 affine matrix.
+    """
+    matrix = np.identity(3)
+    for name, args in _TRANSFORM.findall(transform or ""):
+        values = [float(v) for v in NUMBER.findall(args)]
+        step = np.identity(3)
+        if name == "matrix" and len(values) == 6:
+            a, b, c, d, e, f = values
+            step[:2] = [[a, c, e], [b, d, f]]
+        elif name == "translate" and values:
+            step[0, 2] = values[0]
+            step[1, 2] = values[1] if len(values) > 1 else 0.0
+        elif name == "scale" and values:
+            step[0, 0] = values[0]
+            step[1, 1] = values[1] if len(values) > 1 else values[0]
+        elif name == "rotate" and values:
+            angle = math.radians(values[0])
+            cos, sin = math.cos(angle), math.sin(angle)
+            step[:2, :2] = [[cos, -sin], [sin, cos]]
+            if len(values) == 3:
+                cx, cy = values[1], values[2]
+                step[:2, 2] = [cx - cos * cx + sin * cy, cy - sin * cx - cos * cy]
+        elif name == "skewX" and values:
+            step[0, 1] = math.tan(math.radians(values[0]))
+        elif name == "skewY" and values:
+            step[1, 0] = math.tan(math.radians(values[0]))
+        matrix = matrix @ step
+    return matrix
+
+def is_similarity(matrix):
+    """
+    Tells whether a transform only translates, rotates, mirrors and scales uniformly.
+
+    Args:
+        matrix (np.ndarray): 3x3 affine matrix.
+
+    Returns:
+        bool: True if circles stay circles and stroke widths scale by a single factor.
+    """
+    a, c = matrix[0, 0], matrix[0, 1]
+    b, d = matrix[1, 0], matrix[1, 1]
+    return math.isclose(a * a + b * b, c * c + d * d, rel_tol=1e-6) and abs(a * c + b * d) <= 1e-9 * max(1.0, a * a + b * b)
+
+def format_numbers(values, precision):
+    """
+    Formats coordinates compactly.
+
+    Args:
+        values (np.ndarray): Numbers, already rounded.
+        precision (int): Number of decimals.
+
+    Returns:
+        list[str]: Strings without trailing zeros ("12.5", "-3", ".25").
+    """
+    values = np.where(values == 0, 0.0, np.asarray(values, dtype=float)).ravel()
+    if not len(values):
+        return []
+    if precision <= 4:
+        # Rounded to a few decimals, the shortest repr of a float never uses an exponent
+        # and is much faster to get for a whole list than formatting each number
+        text = _TRAILING_ZERO.sub("", repr(values.tolist())[1:-1])
+        return _LEADING_ZERO.sub(".", text).split(", ")
+    strings = np.char.mod(f"%.{precision}f", values)
+    strings = np.char.rstrip(np.char.rstrip(strings, "0"), ".")
+    strings = np.char.replace(strings, "-0.", "-.")
+    return np.where(np.char.startswith(strings, "0."), np.char.lstrip(strings, "0"), strings).tolist()
+
+def parse_path_data(data):
+    """
+    Parses path data into a flat array of absolute points.
+
+    Args:
+        data (str): The `d` attribute of a path.
+
+    Returns:
+        tuple: (commands, points, arcs). commands lists (command, segment count) runs with
+            absolute "M", "L", "C", "S", "Q", "T", "A" or "Z" commands (H and V become L),
+            points is a (points, 2) array of every coordinate in order, and arcs a (arcs, 5)
+            array of rx, ry, rotation, large arc and sweep flags.
+    """
+    commands = []
+    numbers = []
+    arcs = []
+    sizes = []      # Points in each segment
+    modes = []      # Whether each segment is relative, per axis
+    moves = []      # Segments starting a subpath
+    restarts = []   # Segments following a closepath
+    for letter, arguments in _RUN.findall(data or ""):
+        command = letter.upper()
+        relative = letter != command
+        if command == "Z":
+            commands.append(("Z", 0))
+            restarts.append(len(sizes))
+            continue
+
+        if command == "A":
+            groups = _ARC_ARGUMENTS.findall(arguments)
+            for group in groups:
+                arcs.append(group[:5])
+                numbers.extend(group[5:])
+            count = len(groups)
+        else:
+            found = NUMBER.findall(arguments)
+            width = _ARGUMENTS[command]
+            count = len(found) // width
+            found = found[:count * width]
+            # H and V keep the other axis where it is: a relative move by 0
+            if command == "H":
+                numbers.extend(value for x in found for value in (x, 0))
+            elif command == "V":
+                numbers.extend(value for y in found for value in (0, y))
+            else:
+                numbers.extend(found)
+        if not count:
+            continue
+
+        mode = (relative or command == "V", relative or command == "H")
+        if command in ("H", "V"):
+            command = "L"
+        if command == "M":
+            moves.append(len(sizes))
+            commands.append(("M", 1))
+            if count > 1:
+                # Extra pairs after a moveto are linetos
+                commands.append(("L", count - 1))
+            command = "M"
+        else:
+            commands.append((command, count))
+        sizes.extend([_POINTS.get(command, 1)] * count)
+        modes.extend([mode] * count)
+
+    raw = np.array(numbers, dtype=float).reshape(-1, 2)
+    if not sizes:
+        return commands, raw, np.zeros((0, 5))
+    sizes = np.array(sizes)
+    modes = np.array(modes)
+    last = np.cumsum(sizes) - 1
+
+    # Segment ends follow e[i] = raw[i] + e[i - 1] on relative axes and e[i] = raw[i] on
+    # absolute ones, which is a cumulative sum restarted at every absolute value. A
+    # closepath goes back to the subpath start, so each closed subpath is solved in turn.
+    ends = np.zeros((len(sizes), 2))
+    previous = np.zeros((len(sizes), 2))
+    base = np.zeros(2)
+    bounds = [0] + [index for index in restarts if 0 < index < len(sizes)] + [len(sizes)]
+    for first, stop in zip(bounds[:-1], bounds[1:]):
+        if first == stop:
+            continue
+        values = np.vstack([base, raw[last[first:stop]]])
+        absolute = np.vstack([[True, True], ~modes[first:stop]])
+        resets = np.maximum.accumulate(np.where(absolute, np.arange(len(values))[:, None], 0), axis=0)
+        total = np.cumsum(values, axis=0)
+        solved = (np.take_along_axis(values, resets, axis=0) + total
+                  - np.take_along_axis(total, resets, axis=0))
+        ends[first:stop] = solved[1:]
+        previous[first:stop] = solved[:-1]
+        opened = [index for index in moves if index < stop]
+        base = ends[opened[-1]] if opened else np.zeros(2)
+
+    points = raw + np.repeat(previous * modes, sizes, axis=0)
+    return commands, points, np.array(arcs, dtype=float).reshape(-1, 5)
+
+def transform_path(path, matrix, precision):
+    """
+    Applies a transform to every coordinate of a path at once and rounds them.
+
+    Args:
+        path (tuple): (commands, points, arcs) from parse_path_data.
+        matrix (np.ndarray): 3x3 affine matrix.
+        precision (int): Number of decimals kept.
+
+    Returns:
+        tuple: The transformed path.
+    """
+    commands, points, arcs = path
+    points = np.round(points @ matrix[:2, :2].T + matrix[:2, 2], precision)
+    if len(arcs):
+        determinant = np.linalg.det(matrix[:2, :2])
+        rotation = math.degrees(math.atan2(matrix[1, 0], matrix[0, 0]))
+        arcs = arcs.copy()
+        arcs[:, :2] = np.round(arcs[:, :2] * math.sqrt(abs(determinant)), precision)
+        # A mirror reverses the ellipse rotation and the sweep direction
+        arcs[:, 2] = np.round(rotation + (arcs[:, 2] if determinant > 0 else -arcs[:, 2]), precision)
+        if determinant < 0:
+            arcs[:, 4] = 1 - arcs[:, 4]
+    return commands, points, arcs
+
+def format_path_data(path, precision):
+    """
+    Writes a path back as compact path data, relative except for movetos.
+
+    Args:
+        path (tuple): (commands, points, arcs) from parse_path_data or transform_path.
+        precision (int): Number of decimals.
+
+    Returns:
+        str: The `d` attribute.
+    """
+    commands, points, arcs = path
+    if not len(points):
+        return ""
+
+    # Each segment is written relative to the end of the one before it, movetos being
+    # absolute and closepaths going back to the start of their subpath
+    sizes, bases = [], []
+    segment, move = 0, -1
+    closed = False
+    for command, count in commands:
+        if command == "Z":
+            closed = True
+            continue
+        sizes.extend([_POINTS[command]] * count)
+        if command == "M":
+            move = segment
+            bases.append(-1)
+        else:
+            bases.append(move if closed else segment - 1)
+            bases.extend(range(segment, segment + count - 1))
+        closed = False
+        segment += count
+    sizes = np.array(sizes)
+    ends = np.vstack([points[np.cumsum(sizes) - 1], np.zeros(2)])
+    relative = np.round(points - np.repeat(ends[bases], sizes, axis=0), precision)
+
+    strings = format_numbers(relative, precision)
+    arc_strings = format_numbers(arcs, precision)
+    parts = []
+    position = arc_position = 0
+    previous = None
+    for command, count in commands:
+        if command == "Z":
+            parts.append("z")
+            previous = None
+            continue
+        length = count * _POINTS[command] * 2
+        # A command repeating the previous one is implicit
+        letter = " " if command == previous and command != "M" else command if command == "M" else command.lower()
+        if command == "A":
+            for index in range(count):
+                offset = position + index * 2
+                parts.append((letter if not index else " ")
+                             + " ".join(arc_strings[arc_position:arc_position + 5] + strings[offset:offset + 2]))
+                arc_position += 5
+        else:
+            parts.append(letter + " ".join(strings[position:position + length]))
+        position += length
+        previous = command
+    return "".join(parts).replace(" -", "-")
+
+def _style(element):
+    style = {}
+    for declaration in (element.get("style") or "").split(";"):
+        if ":" in declaration:
+            name, value = declaration.split(":", 1)
+            style[name.strip()] = value.strip()
+    return style
+
+def _property(element, name, style=None):
+    style = _style(element) if style is None else style
+    return style.get(name, element.get(name))
+
+def _set_property(element, name, value):
+    style = element.get("style")
+    if style and re.search(rf"(^|;)\s*{name}\s*:", style):
+        element.set("style", re.sub(rf"((?:^|;)\s*{name}\s*:)[^;]*", rf"\g<1>{value}", style))
+    else:
+        element.set(name, value)
+
+def _length(value, default=0.0):
+    try:
+        return float(re.sub(r"[^\d.eE+-]+", "", value or "")) if value else default
+    except ValueError:
+        return default
+
+def _matrix_attribute(matrix):
+    values = [matrix[0, 0], matrix[1, 0], matrix[0, 1], matrix[1, 1], matrix[0, 2], matrix[1, 2]]
+    return "matrix(" + " ".join(format_numbers(np.round(values, 6), 6)) + ")"
+
+def _attributes_length(attributes):
+    """Returns the length of attributes once serialized."""
+    return sum(len(name) + len(value) + 4 for name, value in attributes.items())
+
+@functools.lru_cache(maxsize=1024)
+def _transform_attribute(matrix):
+    """
+    Returns the transform attribute of a matrix. Cached, as the same asset placements come
+    back in every render.
+
+    Args:
+        matrix (tuple): The first two rows of the 3x3 matrix, flattened.
+
+    Returns:
+        str | None: The attribute, None for the identity.
+    """
+    matrix = np.vstack([np.reshape(matrix, (2, 3)), [0, 0, 1]])
+    return None if np.allclose(matrix, np.identity(3)) else _matrix_attribute(matrix)
+
+def _keep_transform(element, matrix):
+    """Leaves the accumulated transform on an element that cannot be baked."""
+    attribute = _transform_attribute(tuple(matrix[:2].ravel()))
+    if attribute is None:
+        element.attrib.pop("transform", None)
+    else:
+        element.set("transform", attribute)
+
+@functools.lru_cache(maxsize=1024)
+def _bake_path_data(data, matrix, precision, stroked):
+    """
+    Bakes a transform into path data. Cached, as the same asset paths come back in every render.
+
+    Args:
+        data (str): The `d` attribute.
+        matrix (tuple): The first two rows of the 3x3 matrix, flattened.
+        precision (int): Number of decimals kept.
+        stroked (bool): Whether the path is stroked, its stroke width then being scaled too.
+
+    Returns:
+        tuple | None: (path data, transform attribute or None), None if the path cannot be baked.
+    """
+    matrix = np.vstack([np.reshape(matrix, (2, 3)), [0, 0, 1]])
+    similar = is_similarity(matrix)
+    path = parse_path_data(data)
+    if not similar and len(path[2]):
+        return None
+    baked = format_path_data(transform_path(path, matrix, precision), precision)
+    scale = math.sqrt(abs(np.linalg.det(matrix[:2, :2])))
+    if not stroked and similar and scale > 0 and not np.allclose(matrix, np.identity(3)):
+        # Small integer coordinates under a scale (potrace output) are shorter left as they are
+        local_precision = max(0, precision + math.ceil(-math.log10(scale)))
+        local = format_path_data(transform_path(path, np.identity(3), local_precision), local_precision)
+        attribute = _matrix_attribute(matrix)
+        if len(local) + len(attribute) + 13 < len(baked):
+            return local, attribute
+    return baked, None
+
+def cache_info():
+    """
+    Returns the statistics of the baked path data cache.
+
+    Returns:
+        functools._CacheInfo: Hits, misses, maximum and current size.
+    """
+    return _bake_path_data.cache_info()
+
+def _bake_shape(element, tag, matrix, stroke, precision):
+    """
+    Moves the accumulated transform into the coordinates of a shape.
+
+    Returns:
+        bool: False if the shape has to keep a transform attribute.
+    """
+    similar = is_similarity(matrix)
+    if stroke and not similar:
+        return False
+    fmt = lambda value: format_numbers(np.round([value], precision), precision)[0]
+
+    if tag == "path":
+        baked = _bake_path_data(element.get("d") or "", tuple(matrix[:2].ravel()), precision, bool(stroke))
+        if baked is None:
+            return False
+        element.set("d", baked[0])
+        if baked[1]:
+            element.set("transform", baked[1])
+            return True
+    elif tag in ("polyline", "polygon"):
+        values = np.array(NUMBER.findall(element.get("points", "")), dtype=float)
+        points = values[:len(values) // 2 * 2].reshape(-1, 2)
+        points = np.round(points @ matrix[:2, :2].T + matrix[:2, 2], precision)
+        element.set("points", " ".join(format_numbers(points, precision)))
+    elif tag == "line":
+        points = np.array([[_length(element.get("x1")), _length(element.get("y1"))],
+                           [_length(element.get("x2")), _length(element.get("y2"))]])
+        points = points @ matrix[:2, :2].T + matrix[:2, 2]
+        for name, value in zip(("x1", "y1", "x2", "y2"), points.ravel()):
+            element.set(name, fmt(value))
+    else:
+        # Circles, ellipses and rects stay axis-aligned only without rotation or skew
+        if abs(matrix[0, 1]) > 1e-12 or abs(matrix[1, 0]) > 1e-12:
+            return False
+        sx, sy = matrix[0, 0], matrix[1, 1]
+        if tag == "circle":
+            if not math.isclose(abs(sx), abs(sy), rel_tol=1e-9):
+                return False
+            element.set("cx", fmt(_length(element.get("cx")) * sx + matrix[0, 2]))
+            element.set("cy", fmt(_length(element.get("cy")) * sy + matrix[1, 2]))
+            element.set("r", fmt(_length(element.get("r")) * abs(sx)))
+        elif tag == "ellipse":
+            element.set("cx", fmt(_length(element.get("cx")) * sx + matrix[0, 2]))
+            element.set("cy", fmt(_length(element.get("cy")) * sy + matrix[1, 2]))
+            element.set("rx", fmt(_length(element.get("rx")) * abs(sx)))
+            element.set("ry", fmt(_length(element.get("ry")) * abs(sy)))
+        elif tag == "rect":
+            if element.get("rx") or element.get("ry"):
+                if not math.isclose(abs(sx), abs(sy), rel_tol=1e-9):
+                    return False
+                for name in ("rx", "ry"):
+                    if element.get(name):
+                        element.set(name, fmt(_length(element.get(name)) * abs(sx)))
+            x, y = _length(element.get("x")), _length(element.get("y"))
+            width, height = _length(element.get("width")) * sx, _length(element.get("height")) * sy
+            x, y = x * sx + matrix[0, 2], y * sy + matrix[1, 2]
+            element.set("x", fmt(min(x, x + width)))
+            element.set("y", fmt(min(y, y + height)))
+            element.set("width", fmt(abs(width)))
+            element.set("height", fmt(abs(height)))
+
+    if stroke:
+        scale = math.sqrt(abs(np.linalg.det(matrix[:2, :2])))
+        _set_property(element, "stroke-width", fmt(stroke * scale))
+    element.attrib.pop("transform", None)
+    return True
+
+def _bake_if_shorter(element, tag, matrix, stroke, precision):
+    """
+    Bakes a shape like _bake_shape, unless its baked coordinates are longer than its original
+    ones under a matrix attribute, e.g. integer coordinates under a scale.
+
+    Returns:
+        bool: False if the shape has to keep a transform attribute, it is then left as it was.
+    """
+    original = dict(element.attrib)
+    if not _bake_shape(element, tag, matrix, stroke, precision):
+        return False
+    kept = {name: value for name, value in original.items() if name != "transform"}
+    baked_length = _attributes_length(element.attrib)
+    # Mostly decided without formatting the matrix, which costs more than the comparison
+    if baked_length <= _attributes_length(kept):
+        return True
+    attribute = _transform_attribute(tuple(matrix[:2].ravel()))
+    if attribute is not None:
+        kept["transform"] = attribute
+    if baked_length <= _attributes_length(kept):
+        return True
+    element.attrib.clear()
+    element.attrib.update(original)
+    return False
+
+def _minify_children(parent, matrix, stroke, referenced, precision):
+    """
+    Bakes transforms and strips metadata below an element.
+
+    Args:
+        parent (ET.Element): Element whose children are processed.
+        matrix (np.ndarray): Transform accumulated down to parent, not yet written anywhere.
+        stroke (tuple): Inherited (stroke enabled, stroke width, width attribute removed above).
+        referenced (set): Ids used by href or url() references.
+        precision (int): Number of decimals kept.
+    """
+    for child in list(parent):
+        tag = utils.local_name(child.tag)
+        if tag in DROPPED_TAGS:
+            parent.remove(child)
+            continue
+
+        # Editor attributes (sodipodi:*, inkscape:*, ...) and ids nobody points to
+        for name in list(child.attrib):
+            if (name.startswith("{") and not name.startswith("{http://www.w3.org/XML/1998/namespace}")
+                    and "xlink" not in name):
+                del child.attrib[name]
+        if child.get("id") and child.get("id") not in referenced:
+            del child.attrib["id"]
+        if tag not in ("text", "textPath", "tspan") and child.text and not child.text.strip():
+            child.text = None
+        if child.tail and not child.tail.strip():
+            child.tail = None
+
+        if tag in REFERENCED_TAGS:
+            # Content referenced from elsewhere: only symbols below are minified
+            if tag == "defs":
+                for symbol in child:
+                    if utils.local_name(symbol.tag) == "symbol":
+                        _minify_children(symbol, np.identity(3), (False, 1.0, False), referenced, precision)
+            continue
+
+        full = matrix @ parse_transform(child.get("transform"))
+        style = _style(child)
+        enabled, width, moved = stroke
+        if _property(child, "stroke", style) is not None:
+            enabled = _property(child, "stroke", style) != "none"
+        own_width = _property(child, "stroke-width", style)
+        if own_width is not None:
+            width, moved = _length(own_width, 1.0), False
+        url = any("url(" in value for value in child.attrib.values())
+        unbakeable = url or any(child.get(name) for name in UNBAKEABLE_ATTRIBUTES)
+
+        if tag in GROUP_TAGS and not unbakeable and (not enabled or is_similarity(full)):
+            child.attrib.pop("transform", None)
+            # Stroke widths are rewritten, scaled, on each shape below the group
+            if child.attrib.pop("stroke-width", None) is not None:
+                moved = True
+            _minify_children(child, full, (enabled, width, moved), referenced, precision)
+            if not len(child) and not child.get("id"):
+                parent.remove(child)
+            elif not child.attrib:
+                # No-op group: splice its children in its place
+                index = list(parent).index(child)
+                parent.remove(child)
+                for offset, grandchild in enumerate(list(child)):
+                    parent.insert(index + offset, grandchild)
+        elif tag in SHAPE_TAGS and not unbakeable and _bake_if_shorter(child, tag, full, width if enabled else None, precision):
+            continue
+        else:
+            _keep_transform(child, full)
+            if moved and own_width is None:
+                child.set("stroke-width", format_numbers([width], 6)[0])
+            if tag in GROUP_TAGS or tag == "svg":
+                _minify_children(child, np.identity(3), (enabled, width, False), referenced, precision)
+            elif tag == "path":
+                data = child.get("d") or ""
+                rounded = _bake_path_data(data, (1.0, 0.0, 0.0, 0.0, 1.0, 0.0), precision, True)[0]
+                if len(rounded) < len(data):
+                    child.set("d", rounded)
+
+def minify(root, precision=2):
+    """
+    Flattens an SVG: bakes nested transforms into coordinates, rounds them and drops metadata.
+
+    Groups left without attributes are removed, their children taking their place.
+    Elements that cannot be baked exactly (text, use, clipped or classed elements, strokes
+    under non-uniform scales), or whose baked coordinates would be longer, keep their
+    accumulated transform as a single matrix.
+
+    Args:
+        root (ET.Element): Root SVG element, modified in place.
+        precision (int, optional): Number of decimals kept for coordinates (default: 2).
+
+    Returns:
+        ET.Element: The root element.
+    """
+    referenced = set()
+    for element in root.iter():
+        for value in element.attrib.values():
+            if "#" in value:
+                referenced.update(_REFERENCE.findall(value))
+    stroke = (_property(root, "stroke") not in (None, "none"), _length(_property(root, "stroke-width"), 1.0), False)
+    _minify_children(root, np.identity(3), stroke, referenced, precision)
+    return root
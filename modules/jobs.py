@@ -0,0 +1,328 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+import modules.metrics as metrics
+from modules.coin import SIDES
+
+def side_file(side):
+    """
+    Returns the name of the file holding one side of a coin in the store.
+
+    Args:
+        side (str): "heads" or "tails".
+
+    Returns:
+        str: File name.
+    """
+    return f"coin-{side}.svg"
+
+class Busy(Exception):
+    """Raised when too many renders are already queued or running."""
+
+class Job:
+    """A single coin render, identified by its coin key and kept in the render store."""
+
+    def __init__(self, job_id, key, output_dir):
+        self.id = job_id
+        self.key = key
+        self.output_dir = output_dir
+        self.status = "queued"
+        self.progress = 0.0
+        self.error = None
+        self.exception = None
+        # Render function and configuration, to render the coin again if the store evicts
+        # it, unknown for jobs restored from the store
+        self.render = None
+        self.config = None
+        self.created = time.time()
+        self.finished = None
+        # Last time the job was handed out, expiry counts from there
+        self.used = self.created
+        # Seconds spent in each render stage
+        self.timings = {}
+        self.done = threading.Event()
+        # concurrent.futures.Future of the run, for callers waiting asynchronously
+        self.future = None
+        # Clients whose latest request is this job, and whether anyone else waits for it
+        self.clients = set()
+        self.pinned = False
+
+    def path(self, side):
+        """
+        Returns the output file of one side of the coin.
+
+        Args:
+            side (str): "heads" or "tails".
+
+        Returns:
+            str: Path to the SVG file.
+        """
+        return os.path.join(self.output_dir, side_file(side))
+
+    def to_dict(self):
+        """
+        Returns the public state of the job.
+
+        Returns:
+            dict: Job id, status, progress and error if any.
+        """
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "progress": self.progress,
+            "error": self.error,
+        }
+
+class JobManager:
+    """Runs coin renders on a bounded worker pool and keeps their results for a while."""
+
+    def __init__(self, store, max_workers=4, ttl=600, max_pending=None):
+        """
+        Args:
+            store (RenderStore): Store the sides of each coin are written to and read back from.
+            max_workers (int, optional): Renders running at once.
+            ttl (int, optional): Seconds a finished job is kept in memory after its last use.
+            max_pending (int, optional): Renders queued or running above which new ones are
+                refused with Busy (default: no limit).
+        """
+        self.store = store
+        self.ttl = ttl
+        self.max_pending = max_pending
+        # Jobs by id, which is their coin key: any process sharing the store can serve them
+        self._jobs = {}
+        self._by_client = {}
+        self.queued = 0
+        self.running = 0
+        self.rejected = 0
+        self.coalesced = 0
+        self.superseded = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="render")
+
+    def submit(self, render, config, key, client=None):
+        """
+        Queues a render, or returns the live job of the same configuration.
+
+        Concurrent requests for one configuration share a single render, and a coin already
+        in the store, rendered by any process, is read back instead of rendered. A client
+        submitting a new render supersedes its previous one: if that one is still queued and
+        nobody else waits for it, it is cancelled.
+
+        Args:
+            render (callable): Called with config, returns {"heads": svg, "tails": svg}.
+            config (dict): Coin configuration.
+            key (str): Coin key (configuration and asset hashes), the job id and store key.
+            client (str, optional): Identifies the client, for supersession (default: the
+                job is never cancelled).
+
+        Returns:
+            Job: The queued, running or finished job.
+
+        Raises:
+            Busy: If max_pending renders are already queued or running.
+        """
+        self.cleanup()
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is not None and job.status not in ("failed", "cancelled"):
+                job.used = time.time()
+                if job.config is None:
+                    job.render, job.config = render, config
+                if not job.done.is_set():
+                    self.coalesced += 1
+            else:
+                job = self._create(render, config, key)
+            self._follow(job, client)
+        return job
+
+    def _create(self, render, config, key):
+        """Queues a new job, with the lock held."""
+        if self.max_pending is not None and self.queued + self.running >= self.max_pending:
+            self.rejected += 1
+            raise Busy(f"{self.queued + self.running} renders already pending")
+        job = Job(key, key, self.store.directory(key))
+        job.render, job.config = render, config
+        self._jobs[key] = job
+        self.queued += 1
+        # Submitted under the lock, so a concurrent submit never reuses a job without its future
+        job.future = self._executor.submit(self._run, job, render, config)
+        return job
+
+    def _follow(self, job, client):
+        """Records job as the latest one of client, cancelling the one it supersedes, with the lock held."""
+        if client is None:
+            job.pinned = True
+            return
+        previous = self._by_client.get(client)
+        self._by_client[client] = job
+        job.clients.add(client)
+        if previous is None or previous is job:
+            return
+        previous.clients.discard(client)
+        # A job that started is left to finish, its sides go to the render cache. A cancelled
+        # one stays known to its client until a new job of the same key replaces it.
+        if not previous.clients and not previous.pinned and previous.future.cancel():
+            self.queued -= 1
+            self.superseded += 1
+            previous.status = "cancelled"
+            previous.finished = previous.used = time.time()
+            previous.done.set()
+
+    def _run(self, job, render, config):
+        """
+        Renders a job and writes both sides to the store, unless it already has them.
+
+        The sides are not kept in memory: they are read back from the store by result.
+
+        Args:
+            job (Job): The job to run.
+            render (callable): Render function given to submit.
+            config (dict): Coin configuration.
+        """
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+        job.status = "running"
+        try:
+            with metrics.collect() as timings:
+                if not self.store.has(job.key, [side_file(side) for side in SIDES]):
+                    self._write(job.key, render(config), job)
+            job.timings = timings
+            job.progress = 1.0
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.exception = e
+            job.status = "failed"
+        finally:
+            with self._lock:
+                self.running -= 1
+            job.finished = job.used = time.time()
+            job.done.set()
+
+    def _write(self, key, coin, job=None):
+        """
+        Writes the sides of a coin to the store.
+
+        Args:
+            key (str): Coin key.
+            coin (dict): The "heads" and "tails" SVG documents.
+            job (Job, optional): Job whose progress is updated.
+        """
+        if job is not None:
+            job.progress = 0.5
+        with metrics.stage("write"):
+            for side in SIDES:
+                self.store.write(key, side_file(side), coin[side])
+                if job is not None:
+                    job.progress += 0.25
+
+    def _load(self, key):
+        """
+        Reads the sides of a coin from the store.
+
+        Args:
+            key (str): Coin key.
+
+        Returns:
+            dict | None: The "heads" and "tails" SVG documents, None if the store lacks one.
+        """
+        if not self.store.has(key, [side_file(side) for side in SIDES]):
+            return None
+        with metrics.stage("store"):
+            coin = {side: self.store.read(key, side_file(side)) for side in SIDES}
+        # Evicted between the check and the read
+        if None in coin.values():
+            return None
+        return {side: svg.decode("utf-8") for side, svg in coin.items()}
+
+    def get(self, job_id):
+        """
+        Looks up a job, restoring it from the store if this process does not know it.
+
+        Jobs rendered by another process, or before a restart, are found as long as the
+        store keeps their coin.
+
+        Args:
+            job_id (str): Job identifier.
+
+        Returns:
+            Job | None: The job, or None if unknown.
+        """
+        if not self.store.is_key(job_id):
+            return None
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            if not self.store.has(job_id, [side_file(side) for side in SIDES]):
+                return None
+            job = Job(job_id, job_id, self.store.directory(job_id))
+            job.status = "done"
+            job.progress = 1.0
+            job.finished = job.created
+            job.future = Future()
+            job.future.set_result(None)
+            job.done.set()
+            with self._lock:
+                job = self._jobs.setdefault(job_id, job)
+        job.used = time.time()
+        return job
+
+    def result(self, job):
+        """
+        Reads the sides of a finished job from the store, rendering them again if they were
+        evicted meanwhile.
+
+        Args:
+            job (Job): A job whose status is "done".
+
+        Returns:
+            dict | None: The "heads" and "tails" SVG documents, None if they were evicted
+            and the job, restored from the store, cannot render them again.
+        """
+        coin = self._load(job.key)
+        if coin is None and job.config is not None:
+            coin = job.render(job.config)
+            self._write(job.key, coin)
+        return coin
+
+    def ensure_files(self, job):
+        """
+        Makes sure the sides of a finished job are in the store, rendering them again if
+        they were evicted meanwhile.
+
+        Args:
+            job (Job): A job whose status is "done".
+
+        Returns:
+            bool: False if they were evicted and cannot be rendered again (see result).
+        """
+        return self.store.has(job.key, [side_file(side) for side in SIDES]) or self.result(job) is not None
+
+    def stats(self):
+        """
+        Returns job counters.
+
+        Returns:
+            dict: Jobs kept, queued and running, requests that shared a pending render, renders
+            refused because of max_pending and cancelled because their client moved on.
+        """
+        with self._lock:
+            return {"jobs": len(self._jobs), "queued": self.queued, "running": self.running, "coalesced": self.coalesced,
+                    "rejected": self.rejected, "superseded": self.superseded}
+
+    def cleanup(self):
+        """
+        Forgets finished jobs unused for longer than the TTL.
+
+        Their files stay in the store, which evicts them by size, so get restores them.
+        """
+        limit = time.time() - self.ttl
+        with self._lock:
+            expired = [job for job in self._jobs.values() if job.finished and job.used < limit]
+            for job in expired:
+                del self._jobs[job.id]
+            if expired:
+                for client in [client for client, job in self._by_client.items() if self._jobs.get(job.id) is not job]:
+                    del self._by_client[client]
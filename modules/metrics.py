@@ -0,0 +1,229 @@
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+
+# Instrumentation switch, stages cost a single check when off
+enabled = True
+
+# Stage durations of the render running in the current thread or request, if collected
+_timings = contextvars.ContextVar("timings", default=None)
+# Innermost stage being timed, which the stages nested in it are subtracted from
+_active = contextvars.ContextVar("stage", default=None)
+_NOOP = contextlib.nullcontext()
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = tuple(1024 * 4 ** power for power in range(8))  # 1 KiB to 16 MiB
+
+class _Stage:
+    """Adds the time spent in a with block, minus the stages nested in it, to the collected timings."""
+
+    __slots__ = ("name", "timings", "start", "nested", "token")
+
+    def __init__(self, name, timings):
+        self.name = name
+        self.timings = timings
+        self.nested = 0.0
+
+    def __enter__(self):
+        self.token = _active.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        _active.reset(self.token)
+        parent = _active.get()
+        if parent is not None:
+            parent.nested += elapsed
+        own = elapsed - self.nested
+        self.timings[self.name] = self.timings.get(self.name, 0.0) + own
+        STAGE_SECONDS.observe(own, stage=self.name)
+
+def stage(name):
+    """
+    Times a stage of a render, when timings are being collected.
+
+    Stages are exclusive: the time of a stage nested in another one, e.g. an asset parsed
+    while composing, is only counted for the nested stage.
+
+    Args:
+        name (str): Stage name ("parse", "compose", "minify", "serialize", "write", ...).
+
+    Returns:
+        context manager: Records the duration of its block.
+    """
+    if not enabled:
+        return _NOOP
+    timings = _timings.get()
+    if timings is None:
+        return _NOOP
+    return _Stage(name, timings)
+
+@contextlib.contextmanager
+def collect():
+    """
+    Collects the stage timings of the code run in the with block.
+
+    Yields:
+        dict: Stage name to total seconds, filled as stages complete.
+    """
+    timings = {}
+    token = _timings.set(timings if enabled else None)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+def start():
+    """
+    Starts collecting stage timings until stop is called, for hooks that cannot use a with block.
+
+    Returns:
+        tuple: (timings dict, token to give to stop).
+    """
+    timings = {}
+    return timings, _timings.set(timings)
+
+def stop(token):
+    """
+    Stops collecting stage timings.
+
+    Args:
+        token (contextvars.Token): Token returned by start.
+    """
+    _timings.reset(token)
+
+def merge(timings, observe=False):
+    """
+    Adds timings collected elsewhere (e.g. on a worker thread) to the current ones.
+
+    Args:
+        timings (dict): Stage name to seconds.
+        observe (bool, optional): Also record them in the stage histogram, for timings
+            collected in another process (default: False).
+    """
+    if observe and enabled:
+        for name, seconds in timings.items():
+            STAGE_SECONDS.observe(seconds, stage=name)
+    current = _timings.get()
+    if current is None:
+        return
+    for name, seconds in timings.items():
+        current[name] = current.get(name, 0.0) + seconds
+
+def server_timing(timings):
+    """
+    Formats timings as a Server-Timing header value.
+
+    Args:
+        timings (dict): Stage name to seconds.
+
+    Returns:
+        str: E.g. "compose;dur=1.234, serialize;dur=0.456" (milliseconds).
+    """
+    return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in timings.items())
+
+def _labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f"{name}=\"{value}\"" for (name, _), value in zip(pairs, escaped)) + "}"
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Histogram:
+    """Prometheus histogram with a fixed set of label names."""
+
+    def __init__(self, name, documentation, buckets, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        """
+        Records a value.
+
+        Args:
+            value (float): Observed value.
+            **labels: One value per label name.
+        """
+        if not enabled:
+            return
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def expose(self):
+        """Returns the metric in Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: ([*counts], total, count) for key, (counts, total, count) in self._series.items()}
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, ('le', _number(float(bound))))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return "\n".join(lines)
+
+class Callback:
+    """Counter or gauge read from elsewhere (e.g. cache statistics) when metrics are exposed."""
+
+    def __init__(self, name, kind, documentation, read, labelnames=()):
+        """
+        Args:
+            name (str): Metric name.
+            kind (str): "counter" or "gauge".
+            documentation (str): Help text.
+            read (callable): Returns the value, or a dict of label value tuples to values.
+            labelnames (tuple, optional): Label names when read returns a dict.
+        """
+        self.name = name
+        self.kind = kind
+        self.documentation = documentation
+        self.read = read
+        self.labelnames = tuple(labelnames)
+        REGISTRY.append(self)
+
+    def expose(self):
+        """Returns the metric in Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        values = self.read()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(value)}")
+        return "\n".join(lines)
+
+# Every metric, in exposition order
+REGISTRY = []
+
+STAGE_SECONDS = Histogram("coin_render_stage_seconds", "Time spent in each render stage.", LATENCY_BUCKETS, ("stage",))
+
+def expose():
+    """
+    Returns every registered metric.
+
+    Returns:
+        str: Prometheus text exposition format (version 0.0.4).
+    """
+    return "\n".join(metric.expose() for metric in REGISTRY) + "\n"
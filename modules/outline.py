@@ -0,0 +1,109 @@
+import functools
+import io
+import math
+import os
+import threading
+import numpy as np
+
+# Bold sans font covering Latin, Greek, Cyrillic and common symbols (▾ included), see static/fonts/LICENSE
+FONT_PATH = os.path.join("static", "fonts", "DejaVuSans-Bold.ttf")
+
+# fontTools loads the tables of the font lazily, which is not thread safe
+_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=None)
+def _font(path):
+    """
+    Loads a font file.
+
+    The file is read at once and closed, the cached font parses its tables from memory.
+
+    Args:
+        path (str): Path to a TrueType or OpenType font.
+
+    Returns:
+        tuple: (TTFont, glyph set, cmap of code points to glyph names, units per em).
+    """
+    # Imported on first use, like the font itself
+    from fontTools.ttLib import TTFont
+    with open(path, "rb") as f:
+        data = f.read()
+    with _lock:
+        # Tables are still parsed lazily, most of them are never used
+        font = TTFont(io.BytesIO(data), lazy=True)
+        return font, font.getGlyphSet(), font.getBestCmap(), font["head"].unitsPerEm
+
+@functools.lru_cache(maxsize=4096)
+def glyph(char, path=FONT_PATH):
+    """
+    Returns the outline and advance width of a character, cached per character.
+
+    Args:
+        char (str): A single character, drawn as the font's missing glyph box if the font lacks it.
+        path (str, optional): Font file (default: FONT_PATH).
+
+    Returns:
+        tuple: (SVG path data in font units with y up, empty for blanks; advance width in em).
+    """
+    from fontTools.pens.svgPathPen import SVGPathPen
+    _, glyph_set, cmap, units_per_em = _font(path)
+    with _lock:
+        outline = glyph_set[cmap.get(ord(char), ".notdef")]
+        pen = SVGPathPen(glyph_set)
+        outline.draw(pen)
+        return pen.getCommands(), outline.width / units_per_em
+
+@functools.lru_cache(maxsize=256)
+def layout_on_circle(text, radius, center, pos, font_size, path=FONT_PATH):
+    """
+    Lays a line of text out along a circle, like a `<textPath>` following add_textpath_circle.
+
+    The circle starts at its top and runs clockwise, each glyph is rotated to the tangent at
+    its middle, baseline on the circle. Glyphs whose middle falls past the end of the circle
+    are dropped, as SVG viewers do.
+
+    Args:
+        text (str): The line of text.
+        radius (float): Circle radius.
+        center (float): Center position (`cx`, `cy`) of the circle.
+        pos (float): Start of the text, in percent of the circumference (startOffset).
+        font_size (float): Font size in user units.
+        path (str, optional): Font file (default: FONT_PATH).
+
+    Returns:
+        tuple: (path data in font units, SVG transform) of each visible glyph.
+    """
+    glyphs = [glyph(char, path) for char in text]
+    if not glyphs:
+        return ()
+    _, _, _, units_per_em = _font(path)
+    scale = font_size / units_per_em
+    advances = np.array([advance for _, advance in glyphs]) * font_size
+    circumference = 2 * math.pi * radius
+
+    # Arc length of the middle of each glyph, then the point and tangent there
+    middles = circumference * pos / 100 + np.cumsum(advances) - advances / 2
+    angles = middles / radius
+    cos, sin = np.cos(angles), np.sin(angles)
+    x = center + radius * sin - advances / 2 * cos
+    y = center - radius * cos - advances / 2 * sin
+
+    # Font units, y up, to the rotated glyph position: matrix(a b c d e f)
+    matrices = np.round(np.stack([scale * cos, scale * sin, scale * sin, -scale * cos], axis=1), 6)
+    offsets = np.round(np.stack([x, y], axis=1), 3)
+    placed = []
+    for (data, _), middle, matrix, offset in zip(glyphs, middles.tolist(), matrices.tolist(), offsets.tolist()):
+        if middle > circumference:
+            break
+        if data:
+            placed.append((data, "matrix({:g} {:g} {:g} {:g} {:g} {:g})".format(*matrix, *offset)))
+    return tuple(placed)
+
+def cache_info():
+    """
+    Returns the statistics of the glyph cache.
+
+    Returns:
+        functools._CacheInfo: Hits, misses and size of the cache.
+    """
+    return glyph.cache_info()
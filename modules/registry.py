@@ -0,0 +1,299 @@
+import copy
+import hashlib
+import os
+import re
+import threading
+import time
+import warnings
+import modules.utils as utils
+from modules.assets import cache as asset_cache
+
+# Form value of the "no asset" choice, also the ID of the image the UI shows for it
+NONE = "none"
+
+# Size each slot of a coin scales its asset to
+SLOTS = {
+    "crown": (320, 320),
+    "center": (512, 512),
+    "quarter": (145, 145),
+}
+# Drawing area of files with neither a viewBox nor a size
+DEFAULT_VIEWBOX = "0 0 100 100"
+
+# Slots an asset can be placed in, by category
+CATEGORY_SLOTS = {
+    "crown": ("crown",),
+    "shield": ("center",),
+    "icon": ("center", "quarter"),
+    "laurels": (),
+    "none": (),
+}
+
+# The category is the file name up to the first digit or dash, e.g. "icon" for icon4-2.svg
+_CATEGORY = re.compile(r"[a-z]+")
+# Asset IDs that may name a file, looked up in the added directories
+_ID = re.compile(r"[a-z]+[A-Za-z0-9_-]*")
+
+class Asset:
+    """Metadata of a registered SVG asset."""
+
+    __slots__ = ("id", "category", "path", "view_box", "size", "scales", "hash", "stamp", "checked")
+
+    def __init__(self, asset_id, category, path, view_box, scales, content_hash, stamp=None):
+        """
+        Args:
+            asset_id (str): Short ID used in forms and configurations (e.g. "crown1").
+            category (str): "crown", "shield", "icon", "laurels" or "none".
+            path (str): Path to the SVG file.
+            view_box (tuple): (min x, min y, width, height) of the SVG.
+            scales (dict): Scale factor fitting the asset in each slot of its category.
+            content_hash (str): Hash of the file content.
+            stamp (tuple, optional): Version of the file described (see AssetCache.version).
+        """
+        self.id = asset_id
+        self.category = category
+        self.path = path
+        self.view_box = view_box
+        self.size = view_box[2:]
+        self.scales = scales
+        self.hash = content_hash
+        self.stamp = stamp
+        # Monotonic time the stamp was last compared to the file
+        self.checked = time.monotonic()
+
+    def to_dict(self):
+        """Returns the asset metadata as a JSON-serializable dict."""
+        return {"id": self.id, "category": self.category, "viewBox": list(self.view_box), "size": list(self.size),
+                "scales": self.scales, "hash": self.hash}
+
+class AssetRegistry:
+    """
+    Index of the SVG assets of a directory, keyed by short asset ID.
+
+    The directory is scanned once. Form values are then validated and resolved with
+    dict lookups. The file of an asset looked up is stat-ed at most once per check_interval:
+    an edited file is described again, so its hash, and the keys of the coins using it,
+    follow the edit the way the asset cache does. Directories added later (uploads) are
+    not scanned: their files are registered when added by this process, or on the first
+    lookup of their ID, as other processes may add them.
+    """
+
+    def __init__(self, directory="static", check_interval=1.0):
+        """
+        Args:
+            directory (str, optional): Directory of the built-in assets.
+            check_interval (float, optional): Seconds during which an asset is used without
+                checking its file for changes.
+        """
+        self.directory = directory
+        self.check_interval = check_interval
+        self.added_directories = []
+        self._assets = None
+        self._by_path = {}
+        self._lock = threading.Lock()
+
+    def _describe(self, path):
+        """
+        Reads the metadata of an SVG file.
+
+        Args:
+            path (str): Path to the SVG file.
+
+        Returns:
+            Asset: Its metadata.
+
+        Raises:
+            ValueError: If the file name is not a valid asset ID, which starts with its category.
+        """
+        asset_id = os.path.splitext(os.path.basename(path))[0]
+        if not _ID.fullmatch(asset_id):
+            raise ValueError(f"{path}: asset file names start with their lowercase category, e.g. icon4-2.svg")
+        category = _CATEGORY.match(asset_id).group()
+        # Taken first, an edit made while the file is read is seen by the next lookup
+        stamp = asset_cache.version(path)
+        with open(path, "rb") as f:
+            content_hash = hashlib.sha256(f.read()).hexdigest()[:16]
+        # Shallow copy, ensure_viewbox sets the attribute on the shared root otherwise
+        view_box = utils.ensure_viewbox(copy.copy(asset_cache.get_shared(path))) or DEFAULT_VIEWBOX
+        scales = {slot: utils.get_viewbox_scale(view_box, SLOTS[slot]) for slot in CATEGORY_SLOTS.get(category, ())}
+        return Asset(asset_id, category, path, tuple(float(value) for value in view_box.split()), scales, content_hash, stamp)
+
+    def _fresh(self, asset):
+        """
+        Returns a registered asset as its file is now.
+
+        Args:
+            asset (Asset): Registered asset.
+
+        Returns:
+            Asset | None: The asset, described again and registered if its file changed, None
+            if the file was removed.
+        """
+        now = time.monotonic()
+        if now - asset.checked < self.check_interval:
+            return asset
+        asset.checked = now
+        try:
+            stamp = asset_cache.version(asset.path)
+        except FileNotFoundError:
+            # Checked again on every lookup, until a file takes its place
+            asset.checked = float("-inf")
+            return None
+        return asset if stamp == asset.stamp else self.add(asset.path)
+
+    def scan(self):
+        """
+        Indexes every SVG file of the directory, replacing the previous index.
+
+        Files whose name is not a valid asset ID (e.g. Crown.svg) are skipped with a warning.
+
+        Returns:
+            int: Number of registered assets.
+        """
+        assets = {}
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith(".svg"):
+                try:
+                    asset = self._describe(os.path.join(self.directory, name))
+                except ValueError as e:
+                    warnings.warn(f"Skipping {e}", stacklevel=2)
+                    continue
+                assets[asset.id] = asset
+        with self._lock:
+            self._assets = assets
+            self._by_path = {asset.path: asset for asset in assets.values()}
+        return len(assets)
+
+    def _index(self):
+        if self._assets is None:
+            self.scan()
+        return self._assets
+
+    def add_directory(self, directory):
+        """
+        Looks up asset IDs missing from the index in a directory too, e.g. of uploaded assets.
+
+        Args:
+            directory (str): Directory of SVG files named after their asset ID.
+        """
+        if directory not in self.added_directories:
+            self.added_directories.append(directory)
+
+    def add(self, path):
+        """
+        Registers an SVG file, replacing the asset of the same ID if any.
+
+        Args:
+            path (str): Path to the SVG file.
+
+        Returns:
+            Asset: Its metadata.
+
+        Raises:
+            ValueError: If the file name is not a valid asset ID.
+        """
+        asset = self._describe(path)
+        self._index()
+        with self._lock:
+            # Copied, lookups and listings of other threads go on with the previous index
+            self._assets = {**self._assets, asset.id: asset}
+            self._by_path = {**self._by_path, asset.path: asset}
+        return asset
+
+    def _discover(self, asset_id):
+        """Registers the file of an asset ID found in an added directory, None if there is none."""
+        if not self.added_directories or not _ID.fullmatch(asset_id):
+            return None
+        for directory in self.added_directories:
+            path = os.path.join(directory, asset_id + ".svg")
+            if os.path.isfile(path):
+                return self.add(path)
+        return None
+
+    def get(self, asset_id):
+        """
+        Returns a registered asset.
+
+        Args:
+            asset_id (str): Asset ID.
+
+        Returns:
+            Asset | None: The asset, None if no asset has this ID.
+        """
+        asset = self._index().get(asset_id)
+        return self._fresh(asset) if asset is not None else self._discover(asset_id)
+
+    def find(self, value):
+        """
+        Returns the asset an asset ID or the path of a registered file refers to.
+
+        Paths are accepted for configurations written before asset IDs existed.
+
+        Args:
+            value (str): Asset ID or path (e.g. "crown1" or "static/crown1.svg").
+
+        Returns:
+            Asset | None: The asset, None if it is not registered.
+        """
+        asset = self.get(value)
+        if asset is None and value in self._by_path:
+            asset = self._fresh(self._by_path[value])
+        if asset is None and os.path.dirname(value) in self.added_directories and value.endswith(".svg"):
+            asset = self._discover(os.path.basename(value)[:-len(".svg")])
+        return asset
+
+    def ids(self):
+        """
+        Returns the ID of every registered asset.
+
+        Returns:
+            list[str]: The IDs, sorted.
+        """
+        return sorted(self._index())
+
+    def category(self, category):
+        """
+        Returns the registered assets of a category.
+
+        Args:
+            category (str): E.g. "icon".
+
+        Returns:
+            list[Asset]: The assets, sorted by ID.
+        """
+        assets = [self._fresh(asset) for asset in self._index().values() if asset.category == category]
+        return [asset for asset in assets if asset is not None]
+
+    def path(self, value):
+        """
+        Returns the file of an asset, as passed to the builders.
+
+        Args:
+            value (str): Asset ID, or NONE.
+
+        Returns:
+            str: Path to the SVG file, NONE for NONE.
+        """
+        return NONE if value == NONE else self._require(value).path
+
+    def content_hash(self, value):
+        """
+        Returns the content hash of an asset, for cache keys that follow edits of the file.
+
+        Args:
+            value (str): Asset ID, or NONE.
+
+        Returns:
+            str: Hash of the file content, NONE for NONE.
+        """
+        return NONE if value == NONE else self._require(value).hash
+
+    def _require(self, asset_id):
+        """Returns a registered asset, raising KeyError if no asset has this ID."""
+        asset = self.get(asset_id)
+        if asset is None:
+            raise KeyError(asset_id)
+        return asset
+
+# Shared registry of the static assets
+registry = AssetRegistry()
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+import modules.compression as compression
+
+def config_key(config):
+    """
+    Computes a canonical hash for a coin configuration.
+
+    Args:
+        config (dict): Normalized form fields (see app.read_config).
+
+    Returns:
+        str: Hex digest identifying the configuration.
+    """
+    canonical = json.dumps(config, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class RenderCache:
+    """
+    Bounded LRU cache of rendered coins, limited by the total size of the stored SVGs.
+
+    SVGs are stored compressed by default, which fits several times more coins in the
+    same budget for a fraction of a millisecond per hit.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, encoding="gzip", level=None):
+        self.max_bytes = max_bytes
+        self.encoding = encoding
+        self.level = level
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _pack(self, value):
+        """
+        Converts a render to its stored form.
+
+        Args:
+            value (dict): Mapping of side name to SVG string.
+
+        Returns:
+            dict: Mapping of side name to SVG bytes, compressed unless encoding is None.
+        """
+        packed = {side: svg.encode("utf-8") for side, svg in value.items()}
+        if self.encoding is None:
+            return packed
+        return {side: compression.compress(data, self.encoding, self.level) for side, data in packed.items()}
+
+    def _unpack(self, packed):
+        """
+        Converts a stored render back to SVG strings.
+
+        Args:
+            packed (dict): Value returned by _pack.
+
+        Returns:
+            dict: Mapping of side name to SVG string.
+        """
+        if self.encoding is not None:
+            packed = {side: compression.decompress(data, self.encoding) for side, data in packed.items()}
+        return {side: data.decode("utf-8") for side, data in packed.items()}
+
+    def get(self, key):
+        """
+        Looks up a render and marks it as recently used.
+
+        Args:
+            key (str): Configuration hash.
+
+        Returns:
+            dict | None: The cached {"heads": ..., "tails": ...} or None on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return self._unpack(entry[0])
+
+    def put(self, key, value):
+        """
+        Stores a render, evicting the least recently used ones to stay under budget.
+
+        Args:
+            key (str): Configuration hash.
+            value (dict): Mapping of side name to SVG string.
+        """
+        packed = self._pack(value)
+        size = sum(len(data) for data in packed.values())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+            self._entries[key] = (packed, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+    def stats(self):
+        """
+        Returns cache statistics.
+
+        Returns:
+            dict: Entry count, byte usage and hit/miss counters.
+        """
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "encoding": self.encoding,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def clear(self):
+        """Drops every cached render."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
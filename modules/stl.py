@@ -0,0 +1,617 @@
+import math
+import re
+import struct
+import xml.etree.ElementTree as ET
+import numpy as np
+import modules.utils as utils
+from modules.geometry import NUMBER, parse_transform
+
+# Coin layout from elements.create_coin: outer circle r=420 (+ half of its 5px stroke) around (425, 425)
+COIN_CENTER = 425.0
+COIN_RADIUS = 422.5
+
+# Elements that are never painted directly
+SKIPPED_TAGS = {"defs", "symbol", "title", "desc", "metadata", "style", "clipPath", "mask",
+                "pattern", "marker", "linearGradient", "radialGradient", "filter", "text", "image"}
+
+NAMED_COLORS = {
+    "black": (0, 0, 0), "white": (255, 255, 255), "red": (255, 0, 0), "green": (0, 128, 0),
+    "blue": (0, 0, 255), "yellow": (255, 255, 0), "gray": (128, 128, 128), "grey": (128, 128, 128),
+    "silver": (192, 192, 192), "darkgray": (169, 169, 169), "darkgrey": (169, 169, 169),
+    "lightgray": (211, 211, 211), "lightgrey": (211, 211, 211), "orange": (255, 165, 0),
+    "brown": (165, 42, 42), "gold": (255, 215, 0), "navy": (0, 0, 128), "purple": (128, 0, 128),
+}
+
+# Binary STL facet: normal, three vertices, attribute byte count
+FACET_DTYPE = np.dtype([("normal", "<f4", (3,)), ("vertices", "<f4", (3, 3)), ("attr", "<u2")])
+
+_SEPARATORS = re.compile(r"[\s,]*")
+
+def parse_opacity(value):
+    """
+    Converts an SVG opacity to a factor.
+
+    Args:
+        value (str | float | None): Opacity such as "0.5" or "50%".
+
+    Returns:
+        float: Opacity between 0 and 1, 1 for missing or unparsable values.
+    """
+    if value is None:
+        return 1.0
+    try:
+        value = str(value).strip()
+        opacity = float(value[:-1]) / 100 if value.endswith("%") else float(value)
+    except ValueError:
+        return 1.0
+    return min(1.0, max(0.0, opacity)) if math.isfinite(opacity) else 1.0
+
+def parse_luminance(color):
+    """
+    Converts an SVG color to a gray level.
+
+    Args:
+        color (str): Color such as "black", "#555555", "#fff" or "rgb(10, 20, 30)".
+
+    Returns:
+        float | None: Luminance between 0 (black) and 1 (white), None for "none".
+    """
+    color = color.strip().lower()
+    if color in ("none", "transparent"):
+        return None
+    rgb = None
+    if color.startswith("#"):
+        digits = color[1:]
+        if len(digits) in (3, 4):
+            rgb = [int(c * 2, 16) for c in digits[:3]]
+        elif len(digits) in (6, 8):
+            rgb = [int(digits[i:i + 2], 16) for i in (0, 2, 4)]
+    elif color.startswith("rgb"):
+        parts = re.findall(r"[-+]?[\d.]+%?", color)[:3]
+        rgb = [float(p[:-1]) * 2.55 if p.endswith("%") else float(p) for p in parts]
+    else:
+        rgb = NAMED_COLORS.get(color)
+    if not rgb or len(rgb) != 3:
+        # Gradients, currentColor and unknown names are drawn as black
+        return 0.0
+    r, g, b = rgb
+    return min(1.0, max(0.0, (0.2126 * r + 0.7152 * g + 0.0722 * b) / 255))
+
+class _PathScanner:
+    """Reads commands, numbers and arc flags from path data."""
+
+    def __init__(self, data):
+        self.data = data
+        self.pos = 0
+
+    def _skip(self):
+        self.pos = _SEPARATORS.match(self.data, self.pos).end()
+
+    def command(self):
+        self._skip()
+        if self.pos < len(self.data) and self.data[self.pos].isalpha():
+            self.pos += 1
+            return self.data[self.pos - 1]
+        return None
+
+    def has_number(self):
+        self._skip()
+        return NUMBER.match(self.data, self.pos) is not None
+
+    def number(self):
+        self._skip()
+        match = NUMBER.match(self.data, self.pos)
+        if match is None:
+            raise ValueError(f"Invalid path data at {self.pos}: {self.data[self.pos:self.pos + 20]!r}")
+        self.pos = match.end()
+        return float(match.group())
+
+    def flag(self):
+        # Arc flags are single digits that may be written without separators ("a1 1 0 011 1")
+        self._skip()
+        if self.pos < len(self.data) and self.data[self.pos] in "01":
+            self.pos += 1
+            return self.data[self.pos - 1] == "1"
+        raise ValueError(f"Invalid arc flag at {self.pos}")
+
+_CUBIC_T = np.linspace(0, 1, 17)[1:, None]
+_QUADRATIC_T = np.linspace(0, 1, 13)[1:, None]
+
+def _cubic(p0, p1, p2, p3):
+    t = _CUBIC_T
+    u = 1 - t
+    return u ** 3 * p0 + 3 * u * u * t * p1 + 3 * u * t * t * p2 + t ** 3 * p3
+
+def _quadratic(p0, p1, p2):
+    t = _QUADRATIC_T
+    u = 1 - t
+    return u * u * p0 + 2 * u * t * p1 + t * t * p2
+
+def _arc(p0, rx, ry, angle, large, sweep, p1):
+    """Samples an elliptical arc given in SVG endpoint parameterization."""
+    if rx == 0 or ry == 0 or np.allclose(p0, p1):
+        return p1[None, :]
+    rx, ry = abs(rx), abs(ry)
+    phi = math.radians(angle)
+    cos, sin = math.cos(phi), math.sin(phi)
+    dx, dy = (p0 - p1) / 2
+    x1 = cos * dx + sin * dy
+    y1 = -sin * dx + cos * dy
+    # Scale up radii too small to reach the end point
+    scale = (x1 / rx) ** 2 + (y1 / ry) ** 2
+    if scale > 1:
+        rx, ry = rx * math.sqrt(scale), ry * math.sqrt(scale)
+    num = rx * rx * ry * ry - rx * rx * y1 * y1 - ry * ry * x1 * x1
+    den = rx * rx * y1 * y1 + ry * ry * x1 * x1
+    factor = math.sqrt(max(0.0, num / den)) if den else 0.0
+    if large == sweep:
+        factor = -factor
+    cx1, cy1 = factor * rx * y1 / ry, -factor * ry * x1 / rx
+    center = np.array([cos * cx1 - sin * cy1, sin * cx1 + cos * cy1]) + (p0 + p1) / 2
+    theta1 = math.atan2((y1 - cy1) / ry, (x1 - cx1) / rx)
+    theta2 = math.atan2((-y1 - cy1) / ry, (-x1 - cx1) / rx)
+    delta = theta2 - theta1
+    if sweep and delta < 0:
+        delta += 2 * math.pi
+    elif not sweep and delta > 0:
+        delta -= 2 * math.pi
+    steps = max(4, int(math.ceil(abs(delta) / math.radians(6))))
+    thetas = theta1 + delta * np.linspace(0, 1, steps + 1)[1:]
+    xs, ys = rx * np.cos(thetas), ry * np.sin(thetas)
+    points = np.column_stack([cos * xs - sin * ys, sin * xs + cos * ys]) + center
+    points[-1] = p1
+    return points
+
+def parse_path(data):
+    """
+    Flattens SVG path data into polylines.
+
+    Args:
+        data (str): The `d` attribute of a path.
+
+    Returns:
+        list[tuple[np.ndarray, bool]]: (N x 2 points, closed) for each subpath.
+    """
+    scanner = _PathScanner(data or "")
+    subpaths = []
+    chunks = []
+    current = np.zeros(2)
+    start = np.zeros(2)
+    last_control = None
+    last_command = None
+
+    def finish(closed):
+        if chunks:
+            points = np.vstack(chunks)
+            if len(points) > 1:
+                subpaths.append((points, closed))
+        chunks.clear()
+
+    command = scanner.command()
+    while command is not None:
+        relative = command.islower()
+        upper = command.upper()
+        if upper == "Z":
+            finish(True)
+            current = start.copy()
+            last_control, last_command = None, upper
+            command = scanner.command()
+            continue
+        first = True
+        while first or scanner.has_number():
+            offset = current if relative else np.zeros(2)
+            if upper == "M":
+                point = np.array([scanner.number(), scanner.number()]) + offset
+                if first:
+                    finish(False)
+                    start = point
+                    chunks.append(point[None, :])
+                else:
+                    # Extra coordinate pairs after a moveto are linetos
+                    chunks.append(point[None, :])
+                current = point
+                last_control = None
+            elif upper == "L":
+                current = np.array([scanner.number(), scanner.number()]) + offset
+                chunks.append(current[None, :])
+                last_control = None
+            elif upper == "H":
+                current = np.array([scanner.number() + (current[0] if relative else 0), current[1]])
+                chunks.append(current[None, :])
+                last_control = None
+            elif upper == "V":
+                current = np.array([current[0], scanner.number() + (current[1] if relative else 0)])
+                chunks.append(current[None, :])
+                last_control = None
+            elif upper in ("C", "S"):
+                if upper == "C":
+                    c1 = np.array([scanner.number(), scanner.number()]) + offset
+                elif last_command in ("C", "S") and last_control is not None:
+                    c1 = 2 * current - last_control
+                else:
+                    c1 = current
+                c2 = np.array([scanner.number(), scanner.number()]) + offset
+                end = np.array([scanner.number(), scanner.number()]) + offset
+                chunks.append(_cubic(current, c1, c2, end))
+                current, last_control = end, c2
+            elif upper in ("Q", "T"):
+                if upper == "Q":
+                    c1 = np.array([scanner.number(), scanner.number()]) + offset
+                elif last_command in ("Q", "T") and last_control is not None:
+                    c1 = 2 * current - last_control
+                else:
+                    c1 = current
+                end = np.array([scanner.number(), scanner.number()]) + offset
+                chunks.append(_quadratic(current, c1, end))
+                current, last_control = end, c1
+            elif upper == "A":
+                rx, ry, angle = scanner.number(), scanner.number(), scanner.number()
+                large, sweep = scanner.flag(), scanner.flag()
+                end = np.array([scanner.number(), scanner.number()]) + offset
+                chunks.append(_arc(current, rx, ry, angle, large, sweep, end))
+                current = end
+                last_control = None
+            else:
+                raise ValueError(f"Unknown path command {command!r}")
+            last_command = upper if upper != "M" else "L"
+            first = False
+        command = scanner.command()
+    finish(False)
+    return subpaths
+
+def _ellipse(cx, cy, rx, ry, steps=96):
+    angles = np.linspace(0, 2 * math.pi, steps, endpoint=False)
+    return np.column_stack([cx + rx * np.cos(angles), cy + ry * np.sin(angles)])
+
+def _length(element, name):
+    return float(re.sub(r"[^\d.eE+-]+", "", element.get(name, "0")) or 0)
+
+def shape_geometry(element, tag):
+    """
+    Returns the outline of a basic shape.
+
+    Args:
+        element (ET.Element): The SVG element.
+        tag (str): Its tag without namespace.
+
+    Returns:
+        list[tuple[np.ndarray, bool]]: (N x 2 points, closed) polylines, in user units.
+    """
+    if tag == "path":
+        return parse_path(element.get("d"))
+    if tag == "rect":
+        x, y = _length(element, "x"), _length(element, "y")
+        w, h = _length(element, "width"), _length(element, "height")
+        if w <= 0 or h <= 0:
+            return []
+        return [(np.array([[x, y], [x + w, y], [x + w, y + h], [x, y + h]]), True)]
+    if tag == "circle":
+        r = _length(element, "r")
+        return [(_ellipse(_length(element, "cx"), _length(element, "cy"), r, r), True)] if r > 0 else []
+    if tag == "ellipse":
+        rx, ry = _length(element, "rx"), _length(element, "ry")
+        return [(_ellipse(_length(element, "cx"), _length(element, "cy"), rx, ry), True)] if rx > 0 and ry > 0 else []
+    if tag == "line":
+        points = np.array([[_length(element, "x1"), _length(element, "y1")],
+                           [_length(element, "x2"), _length(element, "y2")]])
+        return [(points, False)]
+    if tag in ("polyline", "polygon"):
+        values = [float(v) for v in NUMBER.findall(element.get("points", ""))]
+        if len(values) < 4:
+            return []
+        return [(np.array(values[:len(values) // 2 * 2]).reshape(-1, 2), tag == "polygon")]
+    return []
+
+def fill_mask(rings, shape, evenodd=False):
+    """
+    Scanline-fills polygons on a sample grid, all edges at once.
+
+    Sample (row, col) sits at coordinates (col, row).
+
+    Args:
+        rings (list[np.ndarray]): Closed polygons (N x 2 points) in sample coordinates.
+        shape (tuple): (rows, cols) of the grid.
+        evenodd (bool, optional): Use the even-odd fill rule instead of nonzero.
+
+    Returns:
+        tuple: (mask, row offset, col offset), the boolean mask covering the polygons' bounding box,
+            or None if nothing is covered.
+    """
+    rings = [ring for ring in rings if len(ring) >= 3]
+    if not rings:
+        return None
+    starts = np.vstack(rings)
+    ends = np.vstack([np.roll(ring, -1, axis=0) for ring in rings])
+    x0, y0 = starts[:, 0], starts[:, 1]
+    x1, y1 = ends[:, 0], ends[:, 1]
+
+    rows, cols = shape
+    top = max(0, int(math.ceil(starts[:, 1].min())))
+    bottom = min(rows - 1, int(math.ceil(starts[:, 1].max())) - 1)
+    left = max(0, int(math.ceil(starts[:, 0].min())))
+    right = min(cols - 1, int(math.floor(starts[:, 0].max())))
+    if top > bottom or left > right:
+        return None
+
+    # Every (edge, sample row) crossing, with half-open [ymin, ymax) rows so vertices count once
+    dy = y1 - y0
+    keep = dy != 0
+    x0, y0, x1, y1, dy = x0[keep], y0[keep], x1[keep], y1[keep], dy[keep]
+    first = np.maximum(np.ceil(np.minimum(y0, y1)), top).astype(np.int64)
+    last = np.minimum(np.ceil(np.maximum(y0, y1)) - 1, bottom).astype(np.int64)
+    counts = np.maximum(last - first + 1, 0)
+    total = int(counts.sum())
+    if total == 0:
+        return None
+    edge = np.repeat(np.arange(len(counts)), counts)
+    row = first[edge] + (np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts))
+    x = x0[edge] + (row - y0[edge]) * (x1[edge] - x0[edge]) / dy[edge]
+
+    # Each crossing toggles (or winds) every sample to its right
+    width = right - left + 1
+    col = np.clip(np.ceil(x).astype(np.int64) - left, 0, width)
+    winding = np.zeros((bottom - top + 1, width + 1), dtype=np.int32)
+    np.add.at(winding, (row - top, col), 1 if evenodd else np.sign(dy[edge]).astype(np.int32))
+    winding = np.cumsum(winding[:, :width], axis=1)
+    mask = (winding & 1).astype(bool) if evenodd else winding != 0
+    return mask, top, left
+
+def stroke_rings(polyline, closed, half_width):
+    """
+    Outlines each segment of a polyline as a quad, all with the same orientation.
+
+    Args:
+        polyline (np.ndarray): N x 2 points in sample coordinates.
+        closed (bool): Also stroke the closing segment.
+        half_width (float): Half of the stroke width, in samples.
+
+    Returns:
+        list[np.ndarray]: 4 x 2 quads, filled with the nonzero rule their union is the stroke.
+    """
+    starts = polyline if closed else polyline[:-1]
+    ends = np.roll(polyline, -1, axis=0) if closed else polyline[1:]
+    direction = ends - starts
+    length = np.hypot(direction[:, 0], direction[:, 1])
+    keep = length > 1e-9
+    starts, ends, direction, length = starts[keep], ends[keep], direction[keep], length[keep]
+    normal = np.column_stack([-direction[:, 1], direction[:, 0]]) / length[:, None] * half_width
+    # Extend each segment by half the width so that joins have no gaps
+    along = direction / length[:, None] * half_width
+    a, b = starts - along, ends + along
+    quads = np.stack([a + normal, b + normal, b - normal, a - normal], axis=1)
+    return list(quads)
+
+def _parse_style(element):
+    style = {}
+    for name in ("fill", "stroke", "stroke-width", "fill-rule", "display", "visibility", "opacity", "fill-opacity", "stroke-opacity"):
+        if element.get(name) is not None:
+            style[name] = element.get(name)
+    for declaration in (element.get("style") or "").split(";"):
+        if ":" in declaration:
+            name, value = declaration.split(":", 1)
+            style[name.strip()] = value.strip()
+    return style
+
+def _paint(image, mask_info, luminance, alpha):
+    if mask_info is None or luminance is None or alpha <= 0:
+        return
+    mask, top, left = mask_info
+    region = image[top:top + mask.shape[0], left:left + mask.shape[1]]
+    if alpha >= 1:
+        region[mask] = luminance
+    else:
+        region[mask] = region[mask] * (1 - alpha) + luminance * alpha
+
+def _draw(image, element, matrix, style, ids, depth=0):
+    tag = utils.local_name(element.tag)
+    if tag in SKIPPED_TAGS or depth > 32:
+        return
+    own = _parse_style(element)
+    # Opacity multiplies down the tree, other properties are simply inherited
+    opacity = parse_opacity(style.get("opacity")) * parse_opacity(own.pop("opacity", None))
+    style = {**style, **own, "opacity": opacity}
+    if style.get("display") == "none":
+        return
+    matrix = matrix @ parse_transform(element.get("transform"))
+
+    if tag in ("svg", "g", "a", "switch"):
+        for child in element:
+            _draw(image, child, matrix, style, ids, depth + 1)
+        return
+    if tag == "use":
+        href = element.get("href") or element.get("{http://www.w3.org/1999/xlink}href") or ""
+        target = ids.get(href.lstrip("#"))
+        if target is None:
+            return
+        offset = np.identity(3)
+        offset[:2, 2] = [_length(element, "x"), _length(element, "y")]
+        children = list(target) if utils.local_name(target.tag) == "symbol" else [target]
+        for child in children:
+            _draw(image, child, matrix @ offset, style, ids, depth + 1)
+        return
+    if style.get("visibility") == "hidden":
+        return
+
+    outlines = shape_geometry(element, tag)
+    if not outlines:
+        return
+    transformed = [(points @ matrix[:2, :2].T + matrix[:2, 2], closed) for points, closed in outlines]
+
+    if tag not in ("line", "polyline"):
+        fill = parse_luminance(style.get("fill", "black"))
+        evenodd = style.get("fill-rule", "nonzero") == "evenodd"
+        rings = [points for points, _ in transformed]
+        _paint(image, fill_mask(rings, image.shape, evenodd), fill, opacity * parse_opacity(style.get("fill-opacity")))
+
+    stroke = parse_luminance(style.get("stroke", "none"))
+    if stroke is not None:
+        width = float(re.sub(r"[^\d.eE+-]+", "", style.get("stroke-width", "1")) or 1)
+        half_width = width * math.sqrt(abs(np.linalg.det(matrix[:2, :2]))) / 2
+        quads = []
+        for points, closed in transformed:
+            quads.extend(stroke_rings(points, closed, half_width))
+        _paint(image, fill_mask(quads, image.shape), stroke, opacity * parse_opacity(style.get("stroke-opacity")))
+
+def rasterize(svg, resolution=400):
+    """
+    Renders a coin SVG to a grayscale image.
+
+    Text is not rendered, it relies on fonts of the viewer.
+
+    Args:
+        svg (ET.ElementTree | ET.Element): Coin from elements.create_coin (or a parsed coin SVG).
+        resolution (int, optional): Number of samples across the coin canvas (default: 400).
+
+    Returns:
+        np.ndarray: resolution x resolution luminance (0 is black, 1 is white), float32.
+    """
+    root = svg.getroot() if isinstance(svg, ET.ElementTree) else svg
+    viewbox = utils.ensure_viewbox(root) or "0 0 850 850"
+    min_x, min_y, vb_width, vb_height = map(float, viewbox.replace(",", " ").split())
+    step = max(vb_width, vb_height) / resolution
+
+    # Map user units to sample coordinates, samples sit at pixel centers
+    canvas = np.identity(3)
+    canvas[0, 0] = canvas[1, 1] = 1 / step
+    canvas[:2, 2] = [-min_x / step - 0.5, -min_y / step - 0.5]
+
+    ids = {element.get("id"): element for element in root.iter() if element.get("id")}
+    image = np.ones((resolution, resolution), dtype=np.float32)
+    _draw(image, root, canvas, {"fill": "black"}, ids)
+    return image
+
+def heightmap(luminance, relief=1.0, base=2.0, invert=True):
+    """
+    Turns a grayscale image into heights.
+
+    Args:
+        luminance (np.ndarray): Image from rasterize.
+        relief (float, optional): Height in mm of black above white (default: 1.0).
+        base (float, optional): Thickness in mm of the coin under the relief (default: 2.0).
+        invert (bool, optional): White is void and black is material (default: True),
+            like the "Invert Output" option of image-to-STL converters.
+
+    Returns:
+        np.ndarray: Heights in mm, float32.
+    """
+    depth = 1 - luminance if invert else luminance
+    return (base + relief * depth).astype(np.float32)
+
+def _facets(triangles):
+    """Packs (N, 3, 3) triangles into binary STL records."""
+    records = np.zeros(len(triangles), dtype=FACET_DTYPE)
+    normals = np.cross(triangles[:, 1] - triangles[:, 0], triangles[:, 2] - triangles[:, 0])
+    norms = np.linalg.norm(normals, axis=1, keepdims=True)
+    records["normal"] = np.divide(normals, norms, out=np.zeros_like(normals), where=norms > 0)
+    records["vertices"] = triangles
+    return records
+
+def write_stl(out, heights, diameter=40.0, chunk_rows=64):
+    """
+    Streams a watertight relief mesh on a coin-shaped base as binary STL.
+
+    Each sample of the heightmap is a vertex of the top surface, the base is flat at z=0
+    and clipped to the coin disc. Facets are produced and written a band of rows at a time.
+
+    Args:
+        out (file): Binary file object.
+        heights (np.ndarray): Square heightmap from heightmap(), covering the 850x850 coin canvas.
+        diameter (float, optional): Coin diameter in mm (default: 40).
+        chunk_rows (int, optional): Rows of cells turned into facets at once.
+
+    Returns:
+        int: Number of facets written.
+    """
+    samples = heights.shape[0]
+    step = 850.0 / samples
+    mm = diameter / (2 * COIN_RADIUS)
+
+    # Vertex coordinates in mm, centered on the coin, y pointing up
+    centers = (np.arange(samples) + 0.5) * step
+    xs = ((centers - COIN_CENTER) * mm).astype(np.float32)
+    ys = ((COIN_CENTER - centers) * mm).astype(np.float32)
+
+    # Cells between 4 samples that lie inside the coin disc
+    cell_centers = (np.arange(samples - 1) + 1) * step
+    distance = np.hypot(cell_centers[None, :] - COIN_CENTER, cell_centers[:, None] - COIN_CENTER)
+    inside = distance <= COIN_RADIUS
+    padded = np.pad(inside, 1)
+    # Edges between a cell inside and a cell outside, as (rows of vertices, cells) grids
+    h_edges = padded[1:, 1:-1] != padded[:-1, 1:-1]
+    h_inside_below = padded[1:, 1:-1]
+    v_edges = padded[1:-1, 1:] != padded[1:-1, :-1]
+    v_inside_right = padded[1:-1, 1:]
+
+    count = 4 * int(inside.sum()) + 2 * int(h_edges.sum()) + 2 * int(v_edges.sum())
+    out.write(b"beautiful_coin relief".ljust(80, b" "))
+    out.write(struct.pack("<I", count))
+
+    def vertex(i, j, z):
+        return np.stack([xs[j], ys[i], z], axis=-1)
+
+    written = 0
+    for r0 in range(0, samples - 1, chunk_rows):
+        r1 = min(r0 + chunk_rows, samples - 1)
+        triangles = []
+
+        i, j = np.nonzero(inside[r0:r1])
+        i = i + r0
+        if len(i):
+            top = [vertex(i, j, heights[i, j]), vertex(i, j + 1, heights[i, j + 1]),
+                   vertex(i + 1, j, heights[i + 1, j]), vertex(i + 1, j + 1, heights[i + 1, j + 1])]
+            zero = np.zeros(len(i), dtype=np.float32)
+            bottom = [vertex(i, j, zero), vertex(i, j + 1, zero), vertex(i + 1, j, zero), vertex(i + 1, j + 1, zero)]
+            v00, v01, v10, v11 = top
+            triangles += [np.stack([v10, v11, v01], axis=1), np.stack([v10, v01, v00], axis=1)]
+            v00, v01, v10, v11 = bottom
+            triangles += [np.stack([v10, v01, v11], axis=1), np.stack([v10, v00, v01], axis=1)]
+
+        # Walls along vertex rows (the last band also takes the bottom row)
+        rows_end = r1 + 1 if r1 == samples - 1 else r1
+        i, j = np.nonzero(h_edges[r0:rows_end])
+        i = i + r0
+        if len(i):
+            zero = np.zeros(len(i), dtype=np.float32)
+            a0, b0 = vertex(i, j, zero), vertex(i, j + 1, zero)
+            a1, b1 = vertex(i, j, heights[i, j]), vertex(i, j + 1, heights[i, j + 1])
+            facing_up = h_inside_below[i, j][:, None, None]
+            triangles += [np.where(facing_up, np.stack([a0, a1, b1], axis=1), np.stack([a0, b1, a1], axis=1)),
+                          np.where(facing_up, np.stack([a0, b1, b0], axis=1), np.stack([a0, b0, b1], axis=1))]
+
+        # Walls along vertex columns
+        i, j = np.nonzero(v_edges[r0:r1])
+        i = i + r0
+        if len(i):
+            zero = np.zeros(len(i), dtype=np.float32)
+            a0, b0 = vertex(i, j, zero), vertex(i + 1, j, zero)
+            a1, b1 = vertex(i, j, heights[i, j]), vertex(i + 1, j, heights[i + 1, j])
+            facing_left = v_inside_right[i, j][:, None, None]
+            triangles += [np.where(facing_left, np.stack([a0, b1, a1], axis=1), np.stack([a0, a1, b1], axis=1)),
+                          np.where(facing_left, np.stack([a0, b0, b1], axis=1), np.stack([a0, b1, b0], axis=1))]
+
+        if triangles:
+            records = _facets(np.concatenate(triangles).astype(np.float32))
+            out.write(records.tobytes())
+            written += len(records)
+
+    assert written == count, f"STL facet count mismatch: {written} != {count}"
+    return written
+
+def coin_to_stl(svg, out, resolution=400, diameter=40.0, relief=1.0, base=2.0, invert=True):
+    """
+    Converts a coin to a binary STL relief.
+
+    Args:
+        svg (ET.ElementTree | ET.Element): Coin from elements.create_coin (or a parsed coin SVG).
+        out (file): Binary file object.
+        resolution (int, optional): Samples across the coin (default: 400).
+        diameter (float, optional): Coin diameter in mm (default: 40).
+        relief (float, optional): Relief height in mm (default: 1.0).
+        base (float, optional): Base thickness in mm (default: 2.0).
+        invert (bool, optional): White is void (default: True).
+
+    Returns:
+        int: Number of facets written.
+    """
+    luminance = rasterize(svg, resolution)
+    return write_stl(out, heightmap(luminance, relief, base, invert), diameter)
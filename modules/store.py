@@ -0,0 +1,245 @@
+import contextlib
+import os
+import re
+import shutil
+import threading
+import time
+import modules.utils as utils
+
+# Keys are SHA-256 hex digests, anything else never reaches the filesystem
+_KEY = re.compile(r"[0-9a-f]{64}")
+
+class RenderStore:
+    """
+    Persistent, content-addressed store of rendered coins, shared by every process using the same root.
+
+    Each coin has a directory named after its key (configuration and asset content hashes),
+    sharded by the first two hex digits: root/ab/abcd.../. It holds the SVG of each side and
+    the files derived from them (response bodies, compressed copies, STL meshes). Files are
+    written with an atomic rename, so readers never see partial files and can be sent with
+    send_file as they are.
+
+    The modification time of a directory is its last use, users of the store touch it
+    whenever they read or send its files. When the store outgrows its size
+    cap, the least recently used directories are removed by a sweep of the whole tree. A
+    sweep runs once enough new data was written or enough time passed since the last one.
+    """
+
+    def __init__(self, root="output", max_bytes=512 * 1024 * 1024, sweep_interval=60):
+        """
+        Args:
+            root (str, optional): Directory of the store.
+            max_bytes (int, optional): Size cap of the store.
+            sweep_interval (float, optional): Seconds between sweeps while coins are written.
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.sweep_interval = sweep_interval
+        # Size found by the last sweep plus what this process wrote since, other processes
+        # sharing the store are only accounted for by sweeps
+        self.current_bytes = 0
+        self.written = 0
+        self.evictions = 0
+        self.last_sweep = 0.0
+        self._lock = threading.Lock()
+        self._sweeping = threading.Lock()
+
+    @staticmethod
+    def is_key(key):
+        """
+        Tells whether a string can be a key of the store.
+
+        Args:
+            key (str): Candidate key, e.g. a job id taken from a URL.
+
+        Returns:
+            bool: True for a 64 digits lowercase hex string.
+        """
+        return _KEY.fullmatch(key) is not None
+
+    def directory(self, key):
+        """
+        Returns the directory of a coin.
+
+        Args:
+            key (str): Coin key.
+
+        Returns:
+            str: Path of the directory, which may not exist.
+
+        Raises:
+            ValueError: If the key is not a valid key.
+        """
+        if not self.is_key(key):
+            raise ValueError(f"Invalid store key: {key!r}")
+        return os.path.join(self.root, key[:2], key)
+
+    def path(self, key, name):
+        """
+        Returns the path of a file of a coin.
+
+        Args:
+            key (str): Coin key.
+            name (str): File name, e.g. "coin-heads.svg".
+
+        Returns:
+            str: Path of the file, which may not exist.
+        """
+        return os.path.join(self.directory(key), name)
+
+    def has(self, key, names):
+        """
+        Tells whether a coin has all the given files, marking it as recently used if so.
+
+        Args:
+            key (str): Coin key.
+            names (iterable): File names.
+
+        Returns:
+            bool: True if every file exists.
+        """
+        if not all(os.path.exists(self.path(key, name)) for name in names):
+            return False
+        self.touch(key)
+        return True
+
+    def touch(self, key):
+        """
+        Marks a coin as recently used.
+
+        Args:
+            key (str): Coin key.
+        """
+        try:
+            os.utime(self.directory(key))
+        except FileNotFoundError:
+            pass
+
+    def read(self, key, name):
+        """
+        Reads a file of a coin.
+
+        Args:
+            key (str): Coin key.
+            name (str): File name.
+
+        Returns:
+            bytes | None: The content, None if the file does not exist.
+        """
+        try:
+            with open(self.path(key, name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write(self, key, name, data):
+        """
+        Writes a file of a coin atomically.
+
+        Args:
+            key (str): Coin key.
+            name (str): File name.
+            data (bytes | str): Content, strings are encoded as UTF-8.
+
+        Returns:
+            str: Path of the file.
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        path = self.path(key, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        utils.write_atomic(path, data)
+        self._added(len(data))
+        return path
+
+    @contextlib.contextmanager
+    def open(self, key, name):
+        """
+        Opens a file of a coin for writing, for content too large to build in memory.
+
+        The file is written under a temporary name and renamed when the block exits
+        without an exception, removed otherwise.
+
+        Args:
+            key (str): Coin key.
+            name (str): File name.
+
+        Yields:
+            file: Binary file object.
+        """
+        path = self.path(key, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with utils.open_atomic(path) as f:
+            yield f
+        self._added(os.path.getsize(path))
+
+    def _added(self, size):
+        """Accounts for a written file, sweeping the store when due."""
+        with self._lock:
+            self.written += size
+            self.current_bytes += size
+            due = (self.current_bytes > self.max_bytes or self.written > self.max_bytes // 16
+                   or time.time() - self.last_sweep > self.sweep_interval)
+        if due:
+            self.sweep()
+
+    def sweep(self):
+        """
+        Measures the store and removes the least recently used coins above the size cap.
+
+        Coins are removed until the store is back under 90% of the cap, so that sweeps do
+        not follow each other while it is full. Files of removed coins that are being sent
+        stay readable until closed.
+
+        Returns:
+            int: Number of coins removed.
+        """
+        # A single sweep at a time in this process, others skip it
+        if not self._sweeping.acquire(blocking=False):
+            return 0
+        try:
+            coins = []
+            total = 0
+            for shard in _scan(self.root):
+                for entry in _scan(shard.path):
+                    # Temporary files come and go while other processes write
+                    try:
+                        size = sum(file.stat().st_size for file in _scan(entry.path) if file.is_file())
+                        coins.append((entry.stat().st_mtime, size, entry.path))
+                    except FileNotFoundError:
+                        continue
+                    total += size
+            removed = 0
+            if total > self.max_bytes:
+                for _, size, path in sorted(coins):
+                    if total <= self.max_bytes * 0.9:
+                        break
+                    shutil.rmtree(path, ignore_errors=True)
+                    total -= size
+                    removed += 1
+            with self._lock:
+                self.current_bytes = total
+                self.written = 0
+                self.evictions += removed
+                self.last_sweep = time.time()
+            return removed
+        finally:
+            self._sweeping.release()
+
+    def stats(self):
+        """
+        Returns store statistics.
+
+        Returns:
+            dict: Estimated size, size cap and coins evicted by this process.
+        """
+        with self._lock:
+            return {"bytes": self.current_bytes, "max_bytes": self.max_bytes, "evictions": self.evictions}
+
+def _scan(path):
+    """Lists the subdirectories (and files) of a directory, nothing if it vanished meanwhile."""
+    try:
+        with os.scandir(path) as entries:
+            return list(entries)
+    except (FileNotFoundError, NotADirectoryError):
+        return []
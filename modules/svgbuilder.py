@@ -1,7 +1,8 @@
+import os
+import re
 import xml.etree.ElementTree as ET
-from defusedxml.ElementTree import parse as safe_parse
 import modules.utils as utils
-from lxml import etree
+from modules.assets import cache as asset_cache
 
 class SVGBuilder:
     """Utility class for simplifying SVG element manipulation."""
@@ -40,10 +41,8 @@ class SVGBuilder:
         Returns:
             str: XML string without namespace prefixes.
         """
-        tree = etree.fromstring(xml_string.encode('utf-8'))
-        for elem in tree.iter():
-            elem.tag = etree.QName(elem).localname
-        return etree.tostring(tree, encoding='unicode')
+        from defusedxml.ElementTree import fromstring as safe_fromstring
+        return utils.to_clean_svg(safe_fromstring(xml_string))
 
     @staticmethod
     def add_group_with_transform(parent, transform, elements):
@@ -64,6 +63,97 @@ class SVGBuilder:
         parent.append(group)
         return parent
 
+    @staticmethod
+    def symbol_id(asset_path):
+        """
+        Returns a stable identifier for the symbol of an asset file.
+
+        Args:
+            asset_path (str): Path to the SVG file.
+
+        Returns:
+            str: Identifier such as "sym-icon1", the same for every coin.
+        """
+        name = os.path.splitext(os.path.basename(asset_path))[0]
+        return "sym-" + re.sub(r"[^A-Za-z0-9_-]", "-", name)
+
+    @staticmethod
+    def add_symbol(root, symbol_id, elements):
+        """
+        Adds elements once, as a `<symbol>` in the `<defs>` of the document.
+
+        Args:
+            root (ET.Element): Root SVG element, the `<defs>` is created if needed.
+            symbol_id (str): Identifier of the symbol.
+            elements (list[ET.Element]): Content of the symbol.
+
+        Returns:
+            bool: False if the symbol was already defined (elements are then ignored).
+        """
+        defs = root.find("defs")
+        if defs is None:
+            defs = ET.Element("defs")
+            root.insert(0, defs)
+        elif any(symbol.get("id") == symbol_id for symbol in defs):
+            return False
+        # No viewBox and a visible overflow: the symbol draws like a plain <g>
+        symbol = ET.SubElement(defs, "symbol", attrib={"id": symbol_id, "overflow": "visible"})
+        symbol.extend(elements)
+        return True
+
+    @staticmethod
+    def has_symbol(root, symbol_id):
+        """
+        Tells whether a symbol is already defined in the document.
+
+        Args:
+            root (ET.Element): Root SVG element.
+            symbol_id (str): Identifier of the symbol.
+
+        Returns:
+            bool: True if the `<defs>` holds this symbol.
+        """
+        defs = root.find("defs")
+        return defs is not None and any(symbol.get("id") == symbol_id for symbol in defs)
+
+    @staticmethod
+    def add_use(parent, symbol_id, transform):
+        """
+        Places a symbol with a `<use>` reference.
+
+        Args:
+            parent (ET.Element): Parent SVG element.
+            symbol_id (str): Identifier of the symbol.
+            transform (str): SVG transformation of the placed copy.
+
+        Returns:
+            ET.Element: Updated parent element.
+        """
+        ET.SubElement(parent, "use", attrib={"href": f"#{symbol_id}", "transform": transform})
+        return parent
+
+    @staticmethod
+    def add_asset(parent, transform, asset_path, load, symbols=False):
+        """
+        Places an asset inline in a `<g>`, or as a `<use>` of a symbol shared in `<defs>`.
+
+        Args:
+            parent (ET.Element): Root SVG element.
+            transform (str): SVG transformation of the placed asset.
+            asset_path (str): Path to the asset SVG file, used to name its symbol.
+            load (callable): Returns the asset root element, only called if needed.
+            symbols (bool, optional): Use the `<symbol>`/`<use>` output mode (default: False).
+
+        Returns:
+            ET.Element: Updated parent element.
+        """
+        if not symbols:
+            return SVGBuilder.add_group_with_transform(parent, transform, load())
+        symbol_id = SVGBuilder.symbol_id(asset_path)
+        if not SVGBuilder.has_symbol(parent, symbol_id):
+            SVGBuilder.add_symbol(parent, symbol_id, load())
+        return SVGBuilder.add_use(parent, symbol_id, transform)
+
     @staticmethod
     def add_circle(parent, radius, center, color, stroke="black", stroke_width=5):
         """
@@ -152,60 +242,84 @@ class SVGBuilder:
         return parent
 
     @staticmethod
-    def add_crown(parent, crown_path):
+    def add_outlined_text_on_circle(parent, radius, center, pos, text, font_size=100, fill="black"):
         """
-        Adds a crown to an SVG element.
+        Adds text along a circle as glyph outlines, laid out like add_text_on_circle on the
+        path of add_textpath_circle, without depending on the fonts of the viewer.
 
         Args:
             parent (ET.Element): Parent SVG element.
-            crown_path (str): Path to the crown SVG file.
+            radius (int): Circle radius.
+            center (int): Center position (`cx`, `cy`) of the circle.
+            pos (float): Text position percentage (startOffset).
+            text (str): Text content.
+            font_size (int, optional): Font size (default: 100).
+            fill (str, optional): Text color (default: "black").
 
         Returns:
             ET.Element: Updated parent element.
         """
-        svg_tree = safe_parse(crown_path)
-        svg_root = svg_tree.getroot()
+        # Imported on first use, it loads the bundled font with fontTools
+        import modules.outline as outline
+        text_group = ET.Element("g", attrib={"fill": fill, "aria-label": text})
+        for data, transform in outline.layout_on_circle(text, radius, center, pos, font_size):
+            text_group.append(ET.Element("path", attrib={"transform": transform, "d": data}))
+        parent.append(text_group)
+        return parent
+
+    @staticmethod
+    def add_crown(parent, crown_path, symbols=False):
+        """
+        Adds a crown to an SVG element.
 
-        # Ensure the svg SVG has a proper viewBox
-        utils.ensure_viewbox(svg_root)
+        Args:
+            parent (ET.Element): Parent SVG element.
+            crown_path (str): Path to the crown SVG file.
+            symbols (bool, optional): Place it as a `<use>` of a shared symbol.
 
-        # Fix scale issues
-        scale = utils.scale_svg(svg_root, (320, 320))
+        Returns:
+            ET.Element: Updated parent element.
+        """
+        def load():
+            # Parsed once, with viewBox and scale already fixed
+            svg_root, scale = asset_cache.get_scaled(crown_path, (320, 320))
 
-        # Wrap the svg elements in a <g> tag with scale transformation
-        svg_group = ET.Element("g", {"transform": f"scale({scale})"})
-        for element in list(svg_root):  # Use list to avoid modifying the root during iteration
-            svg_group.append(element)
-            svg_root.remove(element)
-        svg_root.append(svg_group)
+            # Wrap the svg elements in a <g> tag with scale transformation
+            svg_group = ET.Element("g", {"transform": f"scale({scale})"})
+            for element in list(svg_root):  # Use list to avoid modifying the root during iteration
+                svg_group.append(element)
+                svg_root.remove(element)
+            svg_root.append(svg_group)
+            return svg_root
 
-        return SVGBuilder.add_group_with_transform(parent, "translate(264, -10)", svg_root)
+        return SVGBuilder.add_asset(parent, "translate(264, -10)", crown_path, load, symbols)
 
     @staticmethod
-    def add_single_svg(parent, single_svg_path, already_scaled, crown):
+    def add_single_svg(parent, single_svg, already_scaled, crown):
         """
         Adds a coat of arms to an SVG element.
 
         Args:
             parent (ET.Element): Parent SVG element.
-            single_svg_path (str): Path to the SVG file.
+            single_svg (str | ET.Element): Path to the SVG file, or an already built SVG element.
             already_scaled (bool): is SVG already scaled or not.
             crown (bool): add a crown or not
 
         Returns:
             ET.Element: Updated parent element.
         """
-        svg_tree = safe_parse(single_svg_path)
-        svg_root = svg_tree.getroot()
-
-        # Ensure the svg SVG has a proper viewBox
-        utils.ensure_viewbox(svg_root)
-
-        if already_scaled:
+        if not isinstance(single_svg, str):
+            svg_root = single_svg
+            utils.ensure_viewbox(svg_root)
+            scale = 1 if already_scaled else utils.scale_svg(svg_root, (512, 512))
+        elif already_scaled:
+            svg_root = asset_cache.get(single_svg)
+            # Ensure the svg SVG has a proper viewBox
+            utils.ensure_viewbox(svg_root)
             scale = 1
         else:
-            # Fix scale issues
-            scale = utils.scale_svg(svg_root, (512, 512))
+            # Parsed once, with viewBox and scale already fixed
+            svg_root, scale = asset_cache.get_scaled(single_svg, (512, 512))
 
         # Wrap the svg elements in a <g> tag with scale transformation
         svg_group = ET.Element("g", {"transform": f"scale({scale})"})
@@ -219,20 +333,20 @@ class SVGBuilder:
         return SVGBuilder.add_group_with_transform(parent, "translate(169, 200)", svg_root)
     
     @staticmethod
-    def add_laurels(parent, laurels_path):
+    def add_laurels(parent, laurels_path, symbols=False):
         """
         Adds laurels at the coin edge
 
         Args:
             parent (ET.Element): Parent SVG element.
             laurels_path (str): Path to the laurels SVG file.
+            symbols (bool, optional): Place them as a `<use>` of a shared symbol.
 
         Returns:
             ET.Element: Updated parent element.
         """
-        laurels_tree = safe_parse(laurels_path)
-        laurels_root = laurels_tree.getroot()
-        return SVGBuilder.add_group_with_transform(parent, "translate(31, 60) scale(0.615)", laurels_root)
+        return SVGBuilder.add_asset(parent, "translate(31, 60) scale(0.615)", laurels_path,
+                                    lambda: asset_cache.get(laurels_path), symbols)
 
     @staticmethod
     def add_center_lines(parent, width, height, color="red", stroke_width=1):
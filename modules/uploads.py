@@ -0,0 +1,307 @@
+import hashlib
+import math
+import os
+import re
+import xml.etree.ElementTree as ET
+import modules.metrics as metrics
+import modules.utils as utils
+from modules.assets import cache as asset_cache
+from modules.registry import CATEGORY_SLOTS, SLOTS, registry
+
+# Categories users can upload assets to
+CATEGORIES = ("crown", "shield", "icon")
+
+SVG_NS = "http://www.w3.org/2000/svg"
+XLINK_HREF = "{http://www.w3.org/1999/xlink}href"
+XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+# Elements kept in uploads, anything else is removed with its content. Coins are inlined in
+# pages, so scripts, styles, animations (which can set any attribute, links included) and
+# elements embedding other documents never make it through.
+SAFE_TAGS = frozenset({
+    "svg", "g", "defs", "symbol", "use", "switch", "title", "desc", "a",
+    "path", "rect", "circle", "ellipse", "line", "polyline", "polygon", "image",
+    "text", "tspan", "textPath",
+    "linearGradient", "radialGradient", "stop", "pattern", "clipPath", "mask", "marker",
+    "filter", "feBlend", "feColorMatrix", "feComponentTransfer", "feComposite", "feFlood",
+    "feFuncA", "feFuncB", "feFuncG", "feFuncR", "feGaussianBlur", "feMerge", "feMergeNode",
+    "feMorphology", "feOffset",
+})
+# Presentation attributes, also the properties kept in style attributes
+PRESENTATION_ATTRIBUTES = frozenset({
+    "fill", "fill-opacity", "fill-rule", "stroke", "stroke-width", "stroke-linecap",
+    "stroke-linejoin", "stroke-miterlimit", "stroke-dasharray", "stroke-dashoffset",
+    "stroke-opacity", "opacity", "color", "display", "visibility", "overflow",
+    "clip-path", "clip-rule", "mask", "filter", "marker-start", "marker-mid", "marker-end",
+    "stop-color", "stop-opacity", "flood-color", "flood-opacity", "color-interpolation-filters",
+    "font-family", "font-size", "font-style", "font-weight", "text-anchor",
+    "dominant-baseline", "letter-spacing", "vector-effect", "shape-rendering", "paint-order",
+})
+# Attributes kept in uploads, besides presentation attributes, style, xlink:href and xml:space
+SAFE_ATTRIBUTES = PRESENTATION_ATTRIBUTES | frozenset({
+    "id", "class", "version", "viewBox", "preserveAspectRatio", "transform", "href",
+    "x", "y", "x1", "y1", "x2", "y2", "cx", "cy", "r", "rx", "ry", "fx", "fy", "fr",
+    "width", "height", "d", "points", "pathLength", "offset", "dx", "dy", "rotate",
+    "startOffset", "textLength", "lengthAdjust",
+    "gradientUnits", "gradientTransform", "spreadMethod", "patternUnits",
+    "patternContentUnits", "patternTransform", "clipPathUnits", "maskUnits",
+    "maskContentUnits", "markerUnits", "markerWidth", "markerHeight", "refX", "refY",
+    "orient", "filterUnits", "primitiveUnits", "in", "in2", "result", "stdDeviation",
+    "mode", "operator", "k1", "k2", "k3", "k4", "type", "values", "tableValues", "slope",
+    "intercept", "amplitude", "exponent", "radius",
+})
+# CSS functions allowed in presentation values, url() only with a fragment of the document
+_SAFE_FUNCTIONS = {"url", "rgb", "rgba", "hsl", "hsla", "matrix", "translate", "scale", "rotate", "skewx", "skewy"}
+_FUNCTION = re.compile(r"([-\w]*)\s*\(\s*(['\"]?)\s*(.?)")
+# Fragment reference in a presentation value
+_URL_FRAGMENT = re.compile(r"url\(\s*(['\"]?)#([^\s)'\"]+)\1\s*\)")
+# Embedded raster images, the only documents an image can link to
+_DATA_IMAGE = re.compile(r"data:image/(png|jpeg|gif|webp)[;,]", re.IGNORECASE)
+
+class InvalidUpload(ValueError):
+    """Raised when an uploaded file is not an SVG the coins can use."""
+
+class UploadTooLarge(InvalidUpload):
+    """Raised when an uploaded file exceeds the size, element count or depth limits."""
+
+class _Limited:
+    """Binary file object reading from another one, refusing to go past a number of bytes."""
+
+    def __init__(self, source, max_bytes):
+        self.source = source
+        self.remaining = max_bytes
+        self.max_bytes = max_bytes
+
+    def read(self, size=-1):
+        data = self.source.read(self.remaining + 1 if size is None or size < 0 else min(size, self.remaining + 1))
+        self.remaining -= len(data)
+        if self.remaining < 0:
+            raise UploadTooLarge(f"Larger than {self.max_bytes} bytes")
+        return data
+
+def parse(source, max_bytes=16 * 1024 * 1024, max_elements=200000, max_depth=64):
+    """
+    Parses an uploaded SVG incrementally, refusing it as soon as it goes past a limit.
+
+    The file is read in chunks by a defused iterparse. Editors write DOCTYPEs, so they
+    are accepted, but entity declarations and external references are refused.
+
+    Args:
+        source (file): Binary file object, e.g. the stream of an uploaded file.
+        max_bytes (int, optional): Size limit of the file.
+        max_elements (int, optional): Element count limit.
+        max_depth (int, optional): Nesting depth limit.
+
+    Returns:
+        ET.Element: The root element.
+
+    Raises:
+        UploadTooLarge: If the file goes past a limit.
+        InvalidUpload: If it is not well-formed, uses a forbidden construct or is not an SVG.
+    """
+    from defusedxml import DefusedXmlException
+    from defusedxml.ElementTree import iterparse
+    root = None
+    depth = elements = 0
+    try:
+        for event, element in iterparse(_Limited(source, max_bytes), ("start", "end")):
+            if event == "end":
+                depth -= 1
+                continue
+            depth += 1
+            elements += 1
+            if depth > max_depth:
+                raise UploadTooLarge(f"Nested deeper than {max_depth} elements")
+            if elements > max_elements:
+                raise UploadTooLarge(f"More than {max_elements} elements")
+            if root is None:
+                root = element
+    except ET.ParseError as e:
+        raise InvalidUpload(f"Not well-formed XML: {e}") from None
+    except DefusedXmlException as e:
+        raise InvalidUpload(f"Forbidden XML construct: {type(e).__name__}") from None
+    if root is None or utils.local_name(root.tag) != "svg":
+        raise InvalidUpload("Not an SVG document")
+    return root
+
+def _safe_value(value):
+    """
+    Tells whether a presentation value loads nothing: no CSS escape, no comment, only
+    colour and transform functions, and url() only with a fragment of the document.
+
+    Args:
+        value (str): Attribute or property value.
+
+    Returns:
+        bool: Whether the value can be kept.
+    """
+    if "\\" in value or "/*" in value:
+        return False
+    for name, _, first in _FUNCTION.findall(value):
+        name = name.lower()
+        if name not in _SAFE_FUNCTIONS or (name == "url" and first != "#"):
+            return False
+    return True
+
+def _safe_style(style):
+    """
+    Keeps the safe presentation declarations of a style attribute.
+
+    Args:
+        style (str): Style attribute.
+
+    Returns:
+        str: The kept declarations, possibly empty.
+    """
+    kept = []
+    for declaration in style.split(";"):
+        name, _, value = declaration.partition(":")
+        name, value = name.strip().lower(), value.strip()
+        if name in PRESENTATION_ATTRIBUTES and value and _safe_value(value):
+            kept.append(f"{name}:{value}")
+    return ";".join(kept)
+
+def sanitize(element):
+    """
+    Reduces an SVG to allowed elements and attributes, in place.
+
+    Only SVG_NS elements of SAFE_TAGS are kept, and on them, SAFE_ATTRIBUTES with values
+    loading nothing external. Links only point to the document itself, besides embedded
+    raster images, and style attributes are reduced to presentation properties.
+
+    Args:
+        element (ET.Element): Root element.
+    """
+    tag = utils.local_name(element.tag)
+    for name in list(element.attrib):
+        value = element.attrib[name]
+        if name in (XLINK_HREF, "href"):
+            value = value.strip()
+            safe = value.startswith("#") or (tag == "image" and _DATA_IMAGE.match(value) is not None)
+        elif name == "style":
+            value = _safe_style(value)
+            safe = bool(value)
+        else:
+            safe = name == XML_SPACE or (name in SAFE_ATTRIBUTES and _safe_value(value))
+        if safe:
+            element.attrib[name] = value
+        else:
+            del element.attrib[name]
+    for child in list(element):
+        if not isinstance(child.tag, str) or child.tag[:1] == "{" and not child.tag.startswith("{" + SVG_NS + "}") \
+                or utils.local_name(child.tag) not in SAFE_TAGS:
+            element.remove(child)
+        else:
+            sanitize(child)
+
+def normalize(root, category):
+    """
+    Gives an uploaded SVG its viewBox, its size in its largest slot and minifies it, in place.
+
+    Coordinates are rounded relative to the size of the drawing, to a ten thousandth of
+    its largest side.
+
+    Args:
+        root (ET.Element): Root element.
+        category (str): Category the asset is uploaded to.
+
+    Raises:
+        InvalidUpload: If the SVG has neither a usable viewBox nor a width and height.
+    """
+    try:
+        view_box = utils.ensure_viewbox(root)
+        _, _, width, height = map(float, view_box.split()) if view_box else (0, 0, 0, 0)
+    except ValueError:
+        width = height = 0
+    if not (width > 0 and height > 0):
+        raise InvalidUpload("Needs a viewBox, or a width and a height")
+    slot = max(CATEGORY_SLOTS[category], key=lambda name: SLOTS[name][0])
+    utils.scale_svg(root, SLOTS[slot])
+
+    # Imported on first use, numpy makes it the slowest module to import
+    import modules.geometry as geometry
+    geometry.minify(root, max(0, math.ceil(math.log10(10000 / max(width, height)))))
+
+def prefix_ids(root, prefix):
+    """
+    Prefixes every id of an SVG, and every reference to one, in place.
+
+    Coins inline several assets in one document, ids must not clash between them or with
+    the ids of the coin itself. References to ids the asset lacks are prefixed too, so they
+    can never point outside of it.
+
+    Args:
+        root (ET.Element): Root element.
+        prefix (str): Prefix, the asset ID.
+    """
+    fragment = lambda match: f"url({match.group(1)}#{prefix}-{match.group(2)}{match.group(1)})"
+    for element in root.iter():
+        for name, value in element.attrib.items():
+            if name == "id":
+                element.attrib[name] = f"{prefix}-{value}"
+            elif name in (XLINK_HREF, "href"):
+                if value.startswith("#"):
+                    element.attrib[name] = f"#{prefix}-{value[1:]}"
+            elif "url(" in value:
+                element.attrib[name] = _URL_FRAGMENT.sub(fragment, value)
+
+def save(root, category, directory):
+    """
+    Writes a normalized asset under an ID made from its content, and registers it.
+
+    Its ids are prefixed with the asset ID (see prefix_ids), which is made from the content
+    before prefixing. The parsed asset goes to the asset cache, so renders using it never
+    parse it again in this process.
+
+    Args:
+        root (ET.Element): Normalized root element.
+        category (str): Category of the asset.
+        directory (str): Directory of the uploaded assets.
+
+    Returns:
+        Asset: The registered asset, the same one for identical uploads.
+    """
+    from defusedxml.ElementTree import fromstring as safe_fromstring
+    root.set("xmlns", SVG_NS)
+    data = utils.to_clean_svg(root).encode("utf-8")
+    asset_id = f"{category}-{hashlib.sha256(data).hexdigest()[:16]}"
+    asset = registry.get(asset_id)
+    if asset is not None:
+        return asset
+    prefix_ids(root, asset_id)
+    data = utils.to_clean_svg(root).encode("utf-8")
+    path = os.path.join(directory, asset_id + ".svg")
+    os.makedirs(directory, exist_ok=True)
+    utils.write_atomic(path, data)
+    # Parsed back as other processes will, from the normalized (and much smaller) document
+    asset_cache.put(path, safe_fromstring(data))
+    return registry.add(path)
+
+def upload(source, category, directory, max_bytes=16 * 1024 * 1024, max_elements=200000, max_depth=64):
+    """
+    Parses, sanitizes, normalizes and stores an uploaded SVG asset.
+
+    Args:
+        source (file): Binary file object of the upload.
+        category (str): One of CATEGORIES.
+        directory (str): Directory of the uploaded assets.
+        max_bytes (int, optional): Size limit of the file.
+        max_elements (int, optional): Element count limit.
+        max_depth (int, optional): Nesting depth limit.
+
+    Returns:
+        Asset: The registered asset, usable in configurations by its ID.
+
+    Raises:
+        UploadTooLarge: If the file goes past a limit.
+        InvalidUpload: If the category is unknown or the file is not a usable SVG.
+    """
+    if category not in CATEGORIES:
+        raise InvalidUpload(f"Unknown category {category!r}, expected one of {', '.join(CATEGORIES)}")
+    with metrics.stage("parse"):
+        root = parse(source, max_bytes, max_elements, max_depth)
+    with metrics.stage("minify"):
+        sanitize(root)
+        normalize(root, category)
+    with metrics.stage("write"):
+        return save(root, category, directory)
@@ -1,6 +1,10 @@
+import contextlib
+import io
+import os
+import threading
 import xml.etree.ElementTree as ET
-import modules.svgbuilder as svgbuilder
 import re
+import modules.metrics as metrics
 
 def ensure_viewbox(svg_element):
     def parse_dimension(value):
@@ -50,6 +54,87 @@ def add_white_background(parent):
     parent.append(background)
     return 
 
+_XML_NS = "{http://www.w3.org/XML/1998/namespace}"
+
+_TEXT_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", "\r": "&#13;"})
+_ATTRIB_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;", "\"": "&quot;",
+                                 "\n": "&#10;", "\r": "&#13;", "\t": "&#9;"})
+
+def local_name(name):
+    """
+    Strips the namespace from an ElementTree tag or attribute name.
+
+    Args:
+        name (str): Name such as "{http://www.w3.org/2000/svg}path".
+
+    Returns:
+        str: The local name ("path"), "xml:" names keep their prefix.
+    """
+    if name[:1] != "{":
+        return name
+    if name.startswith(_XML_NS):
+        return "xml:" + name[len(_XML_NS):]
+    return name[name.index("}") + 1:]
+
+def _serialize(element, write):
+    """
+    Writes an element and its children without namespaces, in a single pass.
+
+    Args:
+        element (ET.Element): Element to serialize.
+        write (callable): Receives the output, chunk by chunk.
+    """
+    tag = local_name(element.tag)
+    write("<" + tag)
+    for name, value in element.items():
+        write(f' {local_name(name)}="{value.translate(_ATTRIB_ESCAPES)}"')
+    if element.text or len(element):
+        write(">")
+        if element.text:
+            write(element.text.translate(_TEXT_ESCAPES))
+        for child in element:
+            _serialize(child, write)
+        write(f"</{tag}>")
+    else:
+        write("/>")
+    if element.tail:
+        write(element.tail.translate(_TEXT_ESCAPES))
+
+def write_svg(tree, out):
+    """
+    Streams an SVG tree without namespace prefixes to a file object.
+
+    Args:
+        tree (ET.ElementTree | ET.Element): The SVG element tree.
+        out (file): Text file object, or binary one (e.g. io.BytesIO) which receives UTF-8.
+    """
+    root = tree.getroot() if isinstance(tree, ET.ElementTree) else tree
+    if isinstance(out, io.TextIOBase):
+        _serialize(root, out.write)
+        return
+    text_out = io.TextIOWrapper(out, encoding="utf-8")
+    try:
+        _serialize(root, text_out.write)
+        text_out.flush()
+    finally:
+        text_out.detach()
+
+def to_clean_svg(tree):
+    """
+    Serializes an SVG tree to a string without namespace prefixes.
+
+    Args:
+        tree (ET.ElementTree | ET.Element): The SVG element tree.
+
+    Returns:
+        str: The SVG document.
+    """
+    root = tree.getroot() if isinstance(tree, ET.ElementTree) else tree
+    parts = []
+    with metrics.stage("serialize"):
+        _serialize(root, parts.append)
+        return "".join(parts)
+
 def write_clean_svg(tree, output_file):
     """
     Writes an SVG tree to a file without namespace prefixes.
@@ -58,10 +143,42 @@ def write_clean_svg(tree, output_file):
         tree (ET.ElementTree): The SVG element tree.
         output_file (str): Path to the output SVG file.
     """
-    # Convert the ElementTree to a string
-    rough_string = ET.tostring(tree.getroot(), encoding="unicode")
-    # Remove the namespaces
-    clean_string = svgbuilder.SVGBuilder.remove_namespace(rough_string)
-    # Write the clean string to the output file
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(clean_string)
\ No newline at end of file
+    # Serialization is streamed to the file, both count as writing
+    with metrics.stage("write"), open(output_file, "w", encoding="utf-8") as f:
+        write_svg(tree, f)
+
+@contextlib.contextmanager
+def open_atomic(path):
+    """
+    Opens a file for writing through a temporary file, renamed when the block exits
+    without an exception and removed otherwise, so readers never see it half written.
+
+    Args:
+        path (str): Path to the file.
+
+    Yields:
+        file: Binary file object.
+    """
+    # One temporary file per writer, concurrent writers of the same path must not collide
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp)
+        raise
+
+def write_atomic(path, data):
+    """
+    Writes a file through a temporary file and a rename, so readers never see it half written.
+
+    Args:
+        path (str): Path to the file.
+        data (bytes | str): Content, text being written as UTF-8.
+    """
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    with open_atomic(path) as f:
+        f.write(data)
@@ -0,0 +1,82 @@
+import concurrent.futures
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+import modules.metrics as metrics
+# Imported before the workers are forked, so they inherit numpy instead of each importing it
+import modules.geometry
+from modules.coin import default_config, preload_assets, read_config, render_coin
+
+class RenderTimeout(TimeoutError):
+    """Raised when a render takes longer than the pool timeout."""
+
+def _warm_up():
+    """Worker initializer: parses every asset and renders a coin once, so no request pays for it."""
+    preload_assets()
+    render_coin(read_config(default_config()))
+
+def _render(config, sides, collect):
+    """
+    Renders on a worker.
+
+    Returns:
+        tuple: (SVG document of each side, stage timings, empty if collect is False).
+    """
+    metrics.enabled = collect
+    with metrics.collect() as timings:
+        coin = render_coin(config, sides)
+    return coin, timings
+
+def _ready():
+    """No-op task, used to start the workers ahead of the first render."""
+    return os.getpid()
+
+class RenderPool:
+    """
+    Renders coins on worker processes, so rendering is not bound to the GIL of the web process.
+
+    Workers are forked and warmed up (assets parsed, caches filled) when the pool is created.
+    """
+
+    def __init__(self, processes=None, timeout=30):
+        """
+        Args:
+            processes (int, optional): Worker processes (default: one per core).
+            timeout (float, optional): Seconds a render may take before RenderTimeout is raised.
+        """
+        self.processes = processes or os.cpu_count()
+        self.timeout = timeout
+        # Forked workers start with the assets already parsed by the parent. The pool has
+        # to be created before the web server starts threads, which fork does not copy.
+        if "fork" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("fork")
+        else:
+            context = multiprocessing.get_context()
+        self._executor = ProcessPoolExecutor(self.processes, mp_context=context, initializer=_warm_up)
+        concurrent.futures.wait([self._executor.submit(_ready) for _ in range(self.processes)])
+
+    def render(self, config, sides):
+        """
+        Renders sides of a coin on a worker and waits for them.
+
+        Args:
+            config (dict): Configuration returned by read_config.
+            sides (tuple): Sides to render.
+
+        Returns:
+            dict: The SVG document of each rendered side.
+        """
+        future = self._executor.submit(_render, config, sides, metrics.enabled)
+        try:
+            coin, timings = future.result(self.timeout)
+        except concurrent.futures.TimeoutError:
+            # A render already running cannot be interrupted, it only gets its result dropped
+            future.cancel()
+            raise RenderTimeout(f"Render took more than {self.timeout}s") from None
+        # Stages ran in the worker, they are reported by this process
+        metrics.merge(timings, observe=True)
+        return coin
+
+    def shutdown(self):
+        """Stops the workers."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
@@ -14,42 +14,90 @@ document.querySelectorAll('.collapsible').forEach(button => {
     });
 });
 
+// Side keys of the SVGs currently displayed, so that only changed sides are sent back
+const shownKeys = {};
+
+// Identifies this page to the server, a newer render request then supersedes the pending one
+const clientId = crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random()}`;
+
+// Request in flight, aborted when the form changes again before it is answered
+let pendingRequest = null;
+
 // Fetch generated SVGs
 async function fetchGeneratedCoin() {
     const formData = new FormData(form);
+    for (const [side, key] of Object.entries(shownKeys)) {
+        formData.append(`known-${side}`, key);
+    }
+    if (pendingRequest) {
+        pendingRequest.abort();
+    }
+    const request = pendingRequest = new AbortController();
     try {
-        const response = await fetch('/generate', {
+        const response = await fetch('/generate/changes', {
             method: 'POST',
             body: formData,
+            headers: {'X-Client-Id': clientId},
+            signal: request.signal,
         });
+        if (request !== pendingRequest) {
+            return;
+        }
 
         if (response.ok) {
             const data = await response.json();
-            output.innerHTML = `
-                <div class="coin-container">
-                    <a href="/download/coin-heads.svg" download>
-                        <div>${data.heads}</div>
-                    </a>
-                </div>
-                <div class="coin-container">
-                    <a href="/download/coin-tails.svg" download>
-                        <div>${data.tails}</div>
-                    </a>
-                </div>
-            `;
+            if (!output.querySelector('.coin-container')) {
+                output.innerHTML = ['heads', 'tails'].map(side => `
+                    <div class="coin-container" id="coin-${side}">
+                        <a class="coin-svg" download></a>
+                        <a class="coin-stl" download>Download STL</a>
+                    </div>
+                `).join('');
+            }
+            for (const side of ['heads', 'tails']) {
+                const container = document.getElementById(`coin-${side}`);
+                container.querySelector('.coin-svg').href = `/download/${data.job_id}/${side}`;
+                container.querySelector('.coin-stl').href = `/download/${data.job_id}/${side}.stl`;
+                if (side in data) {
+                    container.querySelector('.coin-svg').innerHTML = `<div>${data[side]}</div>`;
+                    shownKeys[side] = data.keys[side];
+                }
+            }
         } else {
-            output.innerHTML = `<p>Error generating SVGs. Please try again.</p>`;
+            showError(`<p>Error generating SVGs. Please try again.</p>`);
         }
     } catch (error) {
-        output.innerHTML = `<p>Error connecting to the server. Please try again.</p>`;
+        if (error.name !== 'AbortError') {
+            showError(`<p>Error connecting to the server. Please try again.</p>`);
+        }
+    } finally {
+        if (request === pendingRequest) {
+            pendingRequest = null;
+        }
+    }
+}
+
+// Waits for the form to settle before asking for a render, e.g. while text is typed
+let debounceTimer = null;
+function scheduleGeneration() {
+    clearTimeout(debounceTimer);
+    debounceTimer = setTimeout(fetchGeneratedCoin, 250);
+}
+
+// Replace the coin with an error message, the next response then sends both sides again
+function showError(message) {
+    output.innerHTML = message;
+    for (const side of Object.keys(shownKeys)) {
+        delete shownKeys[side];
     }
 }
 
 // Trigger the generation on page load
 document.addEventListener('DOMContentLoaded', fetchGeneratedCoin);
 
-// Trigger the generation on form changes
-form.addEventListener('change', fetchGeneratedCoin);
+// Trigger the generation on form changes, text fields included while they are edited
+form.addEventListener('change', scheduleGeneration);
+form.addEventListener('input', scheduleGeneration);
 
 // Show text fields only when "none" (Text) is selected
 function toggleTextInputs(selectId, textInputId) {
@@ -0,0 +1,41 @@
+import asyncio
+import os
+import time
+
+os.environ.setdefault("FLASK_RENDER_PROCESSES", "0")
+import asgi
+
+async def call(application, path="/", body=b""):
+    scope = {"type": "http", "http_version": "1.1", "method": "POST" if body else "GET", "scheme": "http",
+             "path": path, "root_path": "", "query_string": b"", "server": ("localhost", 80),
+             "client": ("127.0.0.1", 1), "headers": [(b"content-length", str(len(body)).encode())]}
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop() if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+    await application(scope, receive, send)
+    return sent[0]["status"], b"".join(message.get("body", b"") for message in sent[1:])
+
+def test_answers_requests():
+    status, body = asyncio.run(call(asgi.application, "/assets"))
+    assert status == 200 and b"crown1" in body
+
+def test_answers_requests_concurrently():
+    def slow(environ, start_response):
+        time.sleep(0.2)
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return [environ["wsgi.input"].read()]
+
+    application = asgi.ThreadedWsgiToAsgi(slow, 8)
+
+    async def main():
+        return await asyncio.gather(*(call(application, body=str(index).encode()) for index in range(8)))
+
+    start = time.perf_counter()
+    responses = asyncio.run(main())
+    assert time.perf_counter() - start < 0.2 * 4
+    assert responses == [(200, str(index).encode()) for index in range(8)]
@@ -0,0 +1,29 @@
+import json
+import pytest
+import batch
+from modules.coin import InvalidConfig, expand_catalogue, read_sides
+
+@pytest.mark.parametrize("value, sides", [("tails", ("tails",)), (["tails", "heads"], ("heads", "tails"))])
+def test_read_sides(value, sides):
+    assert read_sides(value) == sides
+
+@pytest.mark.parametrize("value", ["edge", ["tails", "edge"], [], 5])
+def test_read_sides_rejects(value):
+    with pytest.raises(InvalidConfig):
+        read_sides(value)
+
+def test_expand_catalogue_reports_every_entry():
+    catalogue = {"configs": [{"crown-tails": "nope"}, 5, {"crown-tails": "crown1"}], "matrix": {"shield-tails": ["x"]}}
+    with pytest.raises(InvalidConfig) as error:
+        expand_catalogue(catalogue)
+    assert str(error.value).splitlines() == [
+        "configs[0]: Invalid crown-tails: 'nope'",
+        "configs[1]: Expected a mapping, got 5",
+        "matrix.shield-tails: Invalid shield-tails: 'x'",
+    ]
+
+def test_batch_exits_cleanly_on_invalid_catalogue(tmp_path, capsys):
+    path = tmp_path / "catalogue.json"
+    path.write_text(json.dumps({"sides": "edge"}))
+    assert batch.main([str(path), "-o", str(tmp_path / "out")]) == 2
+    assert capsys.readouterr().err == f"{path}: Invalid sides: 'edge', expected heads, tails\n"
@@ -0,0 +1,12 @@
+import gzip
+import modules.compression as compression
+
+def test_precompressed_copy_follows_the_level(tmp_path):
+    path = tmp_path / "coin.svg"
+    path.write_bytes(b"<svg>" + b"<g/>" * 5000 + b"</svg>")
+    fast = compression.precompressed(str(path), "gzip", 1)
+    best = compression.precompressed(str(path), "gzip", 9)
+    assert fast.endswith(".gz1") and best.endswith(".gz9")
+    with open(best, "rb") as f:
+        assert gzip.decompress(f.read()) == path.read_bytes()
+    assert compression.precompressed(str(path), "gzip") == str(path) + ".gz6"
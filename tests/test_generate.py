@@ -0,0 +1,66 @@
+import shutil
+import pytest
+import app as application
+from modules.coin import default_config
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(application.store, "root", str(tmp_path))
+    return application.app.test_client()
+
+def test_generate_survives_concurrent_sweep(client, monkeypatch):
+    send = application.send_precompressed
+    swept = []
+
+    def sweep_then_send(path, *args):
+        # The store evicts the coin between the body being written and being sent
+        if not swept:
+            swept.append(path)
+            shutil.rmtree(application.os.path.dirname(path))
+        return send(path, *args)
+
+    monkeypatch.setattr(application, "send_precompressed", sweep_then_send)
+    with client.post("/generate", data=default_config()) as response:
+        assert swept and response.status_code == 200
+        assert response.get_json()["tails"].startswith("<svg")
+
+@pytest.mark.parametrize("query", ["diameter=abc", "relief=nan", "base=-2", "resolution=x", "diameter=inf"])
+def test_stl_options_reject(query):
+    from werkzeug.datastructures import MultiDict
+    from urllib.parse import parse_qsl
+    with application.app.test_request_context(), pytest.raises(application.InvalidConfig):
+        application.stl_options(MultiDict(parse_qsl(query)))
+
+def test_stl_options_round():
+    from werkzeug.datastructures import MultiDict
+    with application.app.test_request_context():
+        options = application.stl_options(MultiDict({"resolution": "437", "diameter": "40.0001", "relief": "0.33"}))
+    assert options == {"resolution": 450, "diameter": 40.0, "relief": 0.3, "base": 2.0}
+
+def test_generate_revalidates_with_the_etag_it_sent(client):
+    headers = {"Accept-Encoding": "gzip"}
+    with client.post("/generate", data=default_config(), headers=headers) as response:
+        etag = response.headers["ETag"]
+    assert etag.endswith("-gzip6\"")
+    with client.post("/generate", data=default_config(), headers={**headers, "If-None-Match": etag}) as response:
+        assert response.status_code == 304
+
+def test_sent_coins_are_evicted_last(client, monkeypatch):
+    first, second = default_config(), {**default_config(), "shield-tails": "shield1"}
+    keys = []
+    for config in (first, second):
+        with client.post("/generate", data=config) as response:
+            keys.append(response.get_json()["job_id"])
+    for age, key in enumerate(keys):
+        application.os.utime(application.store.directory(key), (1000 + age, 1000 + age))
+    # The oldest coin is requested again, served from its stored body
+    with client.post("/generate", data=first) as response:
+        assert response.status_code == 200
+    directory = application.store.directory(keys[0])
+    size = sum(application.os.path.getsize(application.os.path.join(directory, name))
+               for name in application.os.listdir(directory))
+    # Room for the first coin only
+    monkeypatch.setattr(application.store, "max_bytes", int(size / 0.9) + 1)
+    application.store.sweep()
+    assert application.os.path.isdir(application.store.directory(keys[0]))
+    assert not application.os.path.isdir(application.store.directory(keys[1]))
@@ -0,0 +1,13 @@
+import time
+import modules.metrics as metrics
+
+def test_nested_stages_are_not_counted_twice():
+    with metrics.collect() as timings:
+        with metrics.stage("compose"):
+            time.sleep(0.02)
+            with metrics.stage("parse"):
+                time.sleep(0.05)
+            with metrics.stage("compose"):
+                time.sleep(0.02)
+    assert 0.05 <= timings["parse"] < 0.065
+    assert 0.04 <= timings["compose"] < 0.055
@@ -0,0 +1,47 @@
+import os
+import shutil
+import pytest
+from modules.registry import AssetRegistry
+
+@pytest.fixture
+def directory(tmp_path):
+    shutil.copy("static/crown1.svg", tmp_path)
+    return tmp_path
+
+@pytest.mark.parametrize("name", ["Crown.svg", "1icon.svg", "-icon.svg", "icon 2.svg"])
+def test_scan_skips_invalid_names(directory, name):
+    shutil.copy("static/icon1.svg", directory / name)
+    registry = AssetRegistry(str(directory))
+    with pytest.warns(UserWarning, match="lowercase category"):
+        assert registry.scan() == 1
+    assert registry.ids() == ["crown1"]
+    with pytest.raises(ValueError):
+        registry.add(str(directory / name))
+
+def test_lookup_follows_edits(directory):
+    registry = AssetRegistry(str(directory), check_interval=0)
+    before = registry.content_hash("crown1")
+    path = directory / "crown1.svg"
+    path.write_bytes(path.read_bytes() + b"\n")
+    assert registry.content_hash("crown1") != before
+    os.remove(path)
+    assert registry.get("crown1") is None
+    assert registry.get("crown1") is None
+
+def test_lookups_stat_once_per_interval(directory, monkeypatch):
+    import modules.registry
+    registry = AssetRegistry(str(directory), check_interval=60)
+    registry.scan()
+    stats = []
+    version = modules.registry.asset_cache.version
+    monkeypatch.setattr(modules.registry.asset_cache, "version", lambda path: stats.append(path) or version(path))
+    for _ in range(40):
+        registry.content_hash("crown1")
+    assert stats == []
+    registry.get("crown1").checked -= 60
+    registry.content_hash("crown1")
+    registry.content_hash("crown1")
+    assert len(stats) == 1
+
+def test_to_dict_hides_the_path(directory):
+    assert "path" not in AssetRegistry(str(directory)).get("crown1").to_dict()
@@ -0,0 +1,18 @@
+import io
+import pytest
+import modules.stl as stl
+from defusedxml.ElementTree import fromstring
+
+@pytest.mark.parametrize("value, opacity", [
+    (None, 1.0), ("0.5", 0.5), ("50%", 0.5), ("25%", 0.25), ("2", 1.0), ("-1", 0.0),
+    ("150%", 1.0), ("abc", 1.0), ("nan", 1.0), ("", 1.0), (0.3, 0.3),
+])
+def test_parse_opacity(value, opacity):
+    assert stl.parse_opacity(value) == pytest.approx(opacity)
+
+def test_percentage_opacities():
+    svg = fromstring(
+        '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 850 850"><g opacity="50%">'
+        '<rect x="100" y="100" width="600" height="600" fill="#000" fill-opacity="80%" style="stroke-opacity:50%"/>'
+        '</g></svg>')
+    assert stl.coin_to_stl(svg, io.BytesIO(), 60) > 0
@@ -0,0 +1,98 @@
+import io
+import pytest
+import modules.uploads as uploads
+import modules.utils as utils
+
+def clean(body, attributes=""):
+    document = f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" viewBox="0 0 10 10"{attributes}>{body}</svg>'
+    root = uploads.parse(io.BytesIO(document.encode()))
+    uploads.sanitize(root)
+    return utils.to_clean_svg(root)
+
+@pytest.mark.parametrize("body", [
+    '<a href="#p"><set attributeName="href" to="javascript:alert(document.cookie)"/></a>',
+    '<path id="p" d="M0 0H1"><animate attributeName="href" values="javascript:alert(1)"/></path>',
+    '<animateTransform attributeName="transform" type="rotate" from="0" to="360"/>',
+    '<style>@import url(https://evil.example/x.css); body{display:none}</style>',
+    '<script>alert(1)</script>',
+    '<foreignObject><div xmlns="http://www.w3.org/1999/xhtml">x</div></foreignObject>',
+])
+def test_removes_unsafe_elements(body):
+    svg = clean(body)
+    for token in ("set", "animate", "style", "script", "foreignObject", "javascript", "evil.example", "alert"):
+        assert token not in svg
+
+@pytest.mark.parametrize("body", [
+    '<path d="M0 0H1" style="fill:url(https://evil.example/track)"/>',
+    '<path d="M0 0H1" fill="url(https://evil.example/track)"/>',
+    '<path d="M0 0H1" fill="url(\'//evil.example/track\')"/>',
+    '<path d="M0 0H1" style="fill:u\\72l(https://evil.example/track)"/>',
+    '<path d="M0 0H1" style="background:image-set(\'https://evil.example/track\' 1x)"/>',
+    '<path d="M0 0H1" onclick="alert(1)"/>',
+    '<a href="javascript:alert(1)"><path d="M0 0H1"/></a>',
+    '<a xlink:href="javascript:alert(1)"><path d="M0 0H1"/></a>',
+    '<use href="https://evil.example/sprite.svg#p"/>',
+    '<image href="data:image/svg+xml;base64,PHN2Zy8+" width="1" height="1"/>',
+])
+def test_removes_unsafe_attributes(body):
+    svg = clean(body)
+    for token in ("evil.example", "alert", "image-set", "svg+xml", "onclick"):
+        assert token not in svg
+
+def test_keeps_drawing():
+    svg = clean(
+        '<defs><linearGradient id="g"><stop offset="0" stop-color="#fff"/></linearGradient></defs>'
+        '<a href="#p"><path id="p" d="M0 0H1" fill="url(#g)" style="stroke:rgb(1,2,3);cursor:url(x.cur);stroke-width:2"/></a>'
+        '<image href="data:image/png;base64,AAAA" width="1" height="1"/>'
+    )
+    assert 'fill="url(#g)"' in svg
+    assert 'style="stroke:rgb(1,2,3);stroke-width:2"' in svg
+    assert 'stop-color="#fff"' in svg
+    assert 'href="#p"' in svg
+    assert 'href="data:image/png;base64,AAAA"' in svg
+
+def test_upload_stores_sanitized_asset(tmp_path):
+    document = (
+        b'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100">'
+        b'<style>@import url(https://evil.example/x.css);</style>'
+        b'<path d="M10 10H90V90Z" style="fill:url(https://evil.example/track)" onload="alert(1)"/></svg>'
+    )
+    asset = uploads.upload(io.BytesIO(document), "icon", str(tmp_path))
+    with open(asset.path, encoding="utf-8") as f:
+        svg = f.read()
+    assert "<path" in svg
+    assert "evil.example" not in svg and "alert" not in svg and "style" not in svg
+
+def test_rejects_entities():
+    document = b'<!DOCTYPE svg [<!ENTITY x "y">]><svg xmlns="http://www.w3.org/2000/svg">&x;</svg>'
+    with pytest.raises(uploads.InvalidUpload):
+        uploads.parse(io.BytesIO(document))
+
+def test_prefix_ids():
+    root = uploads.parse(io.BytesIO(
+        b'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">'
+        b'<linearGradient id="g"/><path id="p" fill="url(#g)" style="stroke:url(\'#g\')"/>'
+        b'<use href="#p"/><use xlink:href="#circlePath"/></svg>'))
+    uploads.prefix_ids(root, "icon-1")
+    svg = utils.to_clean_svg(root)
+    assert 'id="icon-1-g"' in svg and 'id="icon-1-p"' in svg
+    assert 'fill="url(#icon-1-g)"' in svg and "stroke:url('#icon-1-g')" in svg
+    assert 'href="#icon-1-p"' in svg and 'href="#icon-1-circlePath"' in svg
+
+def test_uploads_in_one_coin_keep_their_gradients(tmp_path, monkeypatch):
+    import app as application
+    from modules.coin import default_config
+    ids = []
+    for color in ("#f00", "#00f"):
+        document = (
+            '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100"><defs><linearGradient id="g">'
+            f'<stop offset="0" stop-color="{color}"/></linearGradient></defs>'
+            '<path d="M10 10H90V90Z" fill="url(#g)"/></svg>'
+        )
+        ids.append(uploads.upload(io.BytesIO(document.encode()), "icon", str(tmp_path)).id)
+    monkeypatch.setattr(application.store, "root", str(tmp_path / "output"))
+    form = dict(default_config(), **{"upperleft-tails": ids[0], "upperright-tails": ids[1]})
+    with application.app.test_client().post("/generate", data=form) as response:
+        tails = response.get_json()["tails"]
+    for asset_id in ids:
+        assert f'id="{asset_id}-g"' in tails and f"url(#{asset_id}-g)" in tails